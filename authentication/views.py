@@ -441,11 +441,16 @@ def me_profile(request):
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def me_notifications(request):
-    prefs, _ = NotificationPreference.objects.get_or_create(user=request.user)
+    from notifications.preferences import get_notification_preferences
 
     if request.method == 'GET':
+        prefs = get_notification_preferences(request.user.pk)
+        if prefs is None:
+            prefs, _ = NotificationPreference.objects.get_or_create(user=request.user)
         return Response(NotificationPreferenceSerializer(prefs).data)
 
+    prefs, _ = NotificationPreference.objects.get_or_create(user=request.user)
+
     serializer = NotificationPreferenceSerializer(prefs, data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
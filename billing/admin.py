@@ -8,8 +8,11 @@ from .models import (
     Invoice,
     Payment,
     PropertyBillingNotificationSettings,
+    PropertyMonthlyFinancials,
     Receipt,
+    ReceiptNumberCounter,
     ReminderLog,
+    StripeWebhookEvent,
 )
 
 admin.site.register(BillingConfig)
@@ -21,3 +24,6 @@ admin.site.register(ReminderLog)
 admin.site.register(ChargeType)
 admin.site.register(AdditionalIncome)
 admin.site.register(Expense)
+admin.site.register(PropertyMonthlyFinancials)
+admin.site.register(ReceiptNumberCounter)
+admin.site.register(StripeWebhookEvent)
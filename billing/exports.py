@@ -0,0 +1,304 @@
+"""
+Streaming CSV / XLSX exports of receipts, invoices and expenses, and plain-text PDF documents.
+
+Rows are read with `values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)` and encoded
+one at a time into a `StreamingHttpResponse`, so memory stays flat however many rows
+there are and the first bytes go out as soon as the first chunk is fetched (under ASGI
+too: see `streaming_response`). XLSX is
+written with the standard library: a zip stream whose single worksheet uses inline
+strings, so no row has to be held back for a shared-strings table.
+"""
+import csv
+import itertools
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+# Pieces of a sync stream handed to the event loop per thread hop under ASGI.
+ASYNC_BATCH_SIZE = 200
+CSV = 'csv'
+XLSX = 'xlsx'
+PDF = 'pdf'
+FILE_FORMATS = (CSV, XLSX)
+CONTENT_TYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    PDF: 'application/pdf',
+}
+
+
+def _tenant_name(first, last):
+    return f'{first or ""} {last or ""}'.strip()
+
+
+# (header, values_list field(s), formatter) per column. A formatter takes the field values.
+RECEIPT_COLUMNS = (
+    ('Receipt number', ('receipt_number',), None),
+    ('Issued at', ('issued_at',), None),
+    ('Paid at', ('payment__paid_at',), None),
+    ('Amount', ('payment__amount',), None),
+    ('Fee', ('payment__fee_amount',), None),
+    ('Method', ('payment__payment_method',), None),
+    ('Reference', ('payment__transaction_reference', 'payment__stripe_charge_id'), lambda ref, charge: ref or charge or ''),
+    ('Invoice number', ('payment__invoice__invoice_number',), None),
+    ('Property', ('payment__invoice__lease__unit__property__name',), None),
+    ('Unit', ('payment__invoice__lease__unit__name',), None),
+    ('Tenant', ('payment__invoice__lease__tenant__first_name', 'payment__invoice__lease__tenant__last_name'), _tenant_name),
+    ('Tenant email', ('payment__invoice__lease__tenant__email',), None),
+)
+
+INVOICE_COLUMNS = (
+    ('Invoice number', ('invoice_number',), None),
+    ('Property', ('lease__unit__property__name',), None),
+    ('Unit', ('lease__unit__name',), None),
+    ('Tenant', ('lease__tenant__first_name', 'lease__tenant__last_name'), _tenant_name),
+    ('Period start', ('period_start',), None),
+    ('Period end', ('period_end',), None),
+    ('Due date', ('due_date',), None),
+    ('Rent', ('rent_amount',), None),
+    ('Late fee', ('late_fee_amount',), None),
+    ('Total', ('total_amount',), None),
+    ('Paid', ('amount_paid',), None),
+    ('Balance due', ('balance_due',), None),
+    ('Status', ('status',), None),
+)
+
+EXPENSE_COLUMNS = (
+    ('Date', ('date',), None),
+    ('Category', ('category',), None),
+    ('Amount', ('amount',), None),
+    ('Unit', ('unit__name',), None),
+    ('Description', ('description',), None),
+    ('Maintenance request', ('maintenance_request_id',), None),
+    ('Recorded at', ('created_at',), None),
+)
+
+
+def export_rows(queryset, columns):
+    """Formatted rows of `queryset`, fetched in server-side chunks (no model instances)."""
+    fields = [field for _, column_fields, _ in columns for field in column_fields]
+    for values in queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row, i = [], 0
+        for _, column_fields, formatter in columns:
+            args = values[i:i + len(column_fields)]
+            i += len(column_fields)
+            row.append(formatter(*args) if formatter else args[0])
+        yield row
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if timezone.is_aware(value) else value.isoformat(' ')
+    return str(value)
+
+
+class _Echo:
+    """File-like object whose write() returns the data, for csv.writer in a generator."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(header)  # BOM so Excel opens UTF-8 correctly
+    for row in rows:
+        yield writer.writerow([_cell_text(v) for v in row])
+
+
+class _Pipe:
+    """Write-only, non-seekable sink: zipfile writes into it, the generator drains it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, Decimal, float)) and not isinstance(value, bool):
+        return f'<c t="n"><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_cell_text(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(v) for v in values) + '</row>'
+
+
+def stream_xlsx(sheet_name, header, rows, flush_rows=500):
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, xml)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield pipe.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode())
+            for n, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode())
+                if n % flush_rows == 0:
+                    yield pipe.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield pipe.drain()
+
+
+def download_filename(filename, file_format):
+    return f'attachment; filename="{filename}-{timezone.localdate():%Y%m%d}.{file_format}"'
+
+
+async def _iterate_in_thread(content):
+    """
+    Async iterator over the sync iterator `content`, advanced ASYNC_BATCH_SIZE pieces at a
+    time in Django's sync thread (where its database cursor lives).
+    """
+    take = sync_to_async(lambda: list(itertools.islice(content, ASYNC_BATCH_SIZE)))
+    try:
+        while True:
+            pieces = await take()
+            if not pieces:
+                return
+            for piece in pieces:
+                yield piece
+    finally:
+        if hasattr(content, 'close'):
+            await sync_to_async(content.close)()
+
+
+def streaming_response(request, content, content_type):
+    """
+    `StreamingHttpResponse` of the sync iterator `content`. Under ASGI, Django 4.2 reads a
+    sync iterator into a list before sending anything, so it is wrapped in an async one.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _iterate_in_thread(iter(content))
+    return StreamingHttpResponse(content, content_type=content_type)
+
+
+def export_response(request, queryset, columns, *, file_format, filename):
+    """Streamed download of `queryset` as CSV or XLSX with a download filename (no extension)."""
+    header = [title for title, _, _ in columns]
+    rows = export_rows(queryset, columns)
+    if file_format == XLSX:
+        content = stream_xlsx(filename, header, rows)
+    else:
+        content = stream_csv(header, rows)
+    response = streaming_response(request, content, CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = download_filename(filename, file_format)
+    return response
+
+
+# A4 portrait in points, Courier so fixed-width columns line up.
+_PDF_PAGE_WIDTH, _PDF_PAGE_HEIGHT = 595, 842
+_PDF_MARGIN = 40
+_PDF_FONT_SIZE = 8
+_PDF_LEADING = 11
+PDF_LINE_WIDTH = int((_PDF_PAGE_WIDTH - 2 * _PDF_MARGIN) / (_PDF_FONT_SIZE * 0.6))
+PDF_LINES_PER_PAGE = (_PDF_PAGE_HEIGHT - 2 * _PDF_MARGIN) // _PDF_LEADING
+
+
+def _pdf_text(line):
+    text = line[:PDF_LINE_WIDTH].encode('latin-1', errors='replace')
+    return text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def render_text_pdf(lines):
+    """
+    A minimal PDF (standard Courier font, no dependencies) with one text line per entry of
+    `lines`, cut to PDF_LINE_WIDTH characters and paginated every PDF_LINES_PER_PAGE lines.
+    """
+    lines = list(lines) or ['']
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)]
+    # Objects: 1 catalog, 2 page tree, 3 font, then a (page, content stream) pair per page.
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % pid for pid in page_ids)
+        + b'] /Count %d >>' % len(pages),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    top = _PDF_PAGE_HEIGHT - _PDF_MARGIN - _PDF_FONT_SIZE
+    for pid, page in zip(page_ids, pages):
+        stream = b'BT /F1 %d Tf %d TL %d %d Td\n' % (_PDF_FONT_SIZE, _PDF_LEADING, _PDF_MARGIN, top)
+        stream += b''.join(b'(' + _pdf_text(line) + b') Tj T*\n' for line in page) + b'ET'
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> '
+            b'/Contents %d 0 R >>' % (_PDF_PAGE_WIDTH, _PDF_PAGE_HEIGHT, pid + 1)
+        )
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
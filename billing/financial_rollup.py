@@ -0,0 +1,304 @@
+"""Maintenance of the PropertyMonthlyFinancials rollup read by the financial report."""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from property.models import Property
+from property.occupancy import OccupancyTimeline
+from .models import AdditionalIncome, Expense, Invoice, Payment, PropertyMonthlyFinancials
+
+INVOICE_STATUSES = ('paid', 'pending', 'overdue', 'partial', 'cancelled')
+
+_UPDATE_FIELDS = [
+    'rent_invoiced', 'late_fees_invoiced', 'collected',
+    'additional_income', 'additional_income_by_type',
+    'expenses', 'expenses_by_category',
+    *(f'invoices_{s}' for s in INVOICE_STATUSES),
+    'occupied_units', 'total_units', 'updated_at',
+]
+
+
+def _money(value):
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def month_start(d):
+    return d.replace(day=1)
+
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def paid_at_month(paid_at):
+    """Month a payment counts towards (the active timezone's calendar, like `paid_at__month`)."""
+    return month_start(timezone.localtime(paid_at).date())
+
+
+def month_periods(months):
+    """Inclusive (first day, last day) occupancy periods for first-of-month dates."""
+    return [(month, next_month(month) - timedelta(days=1)) for month in months]
+
+
+def _aggregate(rows, property_ids, start, upper, by_month):
+    """
+    Add the money figures and invoice counts for [start, upper) to `rows`, keyed by property
+    id, or by (property id, first of month) when `by_month`; one grouped query per source
+    table. Figures whose key is not in `rows` are skipped.
+    """
+    def grouped(queryset, property_field, date_field, *fields):
+        if by_month:
+            return queryset.annotate(rollup_month=TruncMonth(date_field)).values(
+                property_field, 'rollup_month', *fields,
+            )
+        return queryset.values(property_field, *fields)
+
+    def row_for(item, property_field):
+        if not by_month:
+            return rows.get(item[property_field])
+        month = item['rollup_month']
+        if isinstance(month, datetime):
+            month = paid_at_month(month)
+        return rows.get((item[property_field], month))
+
+    invoices = grouped(
+        Invoice.objects.filter(
+            lease__unit__property_id__in=property_ids, period_start__gte=start, period_start__lt=upper,
+        ),
+        'lease__unit__property_id', 'period_start', 'status',
+    ).annotate(rent=Sum('rent_amount'), fees=Sum('late_fee_amount'), c=Count('id')).order_by()
+    for item in invoices:
+        row = row_for(item, 'lease__unit__property_id')
+        if row is None:
+            continue
+        row.rent_invoiced += item['rent']
+        row.late_fees_invoiced += item['fees']
+        if item['status'] in INVOICE_STATUSES:
+            setattr(row, f"invoices_{item['status']}", item['c'])
+
+    collected = grouped(
+        Payment.objects.filter(
+            status='completed', invoice__lease__unit__property_id__in=property_ids,
+            paid_at__date__gte=start, paid_at__date__lt=upper,
+        ),
+        'invoice__lease__unit__property_id', 'paid_at',
+    ).annotate(t=Sum('amount')).order_by()
+    for item in collected:
+        row = row_for(item, 'invoice__lease__unit__property_id')
+        if row is not None:
+            row.collected = item['t']
+
+    income = grouped(
+        AdditionalIncome.objects.filter(unit__property_id__in=property_ids, date__gte=start, date__lt=upper),
+        'unit__property_id', 'date', 'charge_type__name',
+    ).annotate(t=Sum('amount')).order_by()
+    for item in income:
+        row = row_for(item, 'unit__property_id')
+        if row is None:
+            continue
+        row.additional_income += item['t']
+        row.additional_income_by_type[item['charge_type__name']] = _money(item['t'])
+
+    expenses = grouped(
+        Expense.objects.filter(property_id__in=property_ids, date__gte=start, date__lt=upper),
+        'property_id', 'date', 'category',
+    ).annotate(t=Sum('amount')).order_by()
+    for item in expenses:
+        row = row_for(item, 'property_id')
+        if row is None:
+            continue
+        row.expenses += item['t']
+        row.expenses_by_category[item['category']] = _money(item['t'])
+    return rows
+
+
+def aggregate_financials(property_ids, start, upper):
+    """
+    {property_id: unsaved PropertyMonthlyFinancials} with the money figures and invoice
+    counts for [start, upper), one grouped query per source table for all properties.
+    Occupancy is left at zero; it is a per-period figure (see `property.occupancy`).
+    """
+    rows = {pid: PropertyMonthlyFinancials(property_id=pid, month=start) for pid in property_ids}
+    return _aggregate(rows, property_ids, start, upper, by_month=False)
+
+
+def aggregate_monthly_financials(property_ids, months):
+    """
+    {(property_id, month): unsaved PropertyMonthlyFinancials} for every property and
+    first-of-month date in `months`, still one grouped query per source table however many
+    months there are. Occupancy is left at zero.
+    """
+    months = sorted(set(months))
+    rows = {
+        (pid, month): PropertyMonthlyFinancials(property_id=pid, month=month)
+        for pid in property_ids for month in months
+    }
+    if not months:
+        return rows
+    return _aggregate(rows, property_ids, months[0], next_month(months[-1]), by_month=True)
+
+
+def _build_month(month, property_ids):
+    rows = aggregate_financials(property_ids, month, next_month(month))
+    occupancy = OccupancyTimeline(property_ids).by_property(month_periods([month]))
+    for pid, [(occupied, total)] in occupancy.items():
+        rows[pid].occupied_units = occupied
+        rows[pid].total_units = total
+    return list(rows.values())
+
+
+def combine_financials(rows, **fields):
+    """Sum rollup rows (money, breakdowns and invoice counts) into one unsaved row."""
+    total = PropertyMonthlyFinancials(**fields)
+    for row in rows:
+        for name in ('rent_invoiced', 'late_fees_invoiced', 'collected', 'additional_income', 'expenses'):
+            setattr(total, name, getattr(total, name) + getattr(row, name))
+        for status in INVOICE_STATUSES:
+            name = f'invoices_{status}'
+            setattr(total, name, getattr(total, name) + getattr(row, name))
+        for name in ('additional_income_by_type', 'expenses_by_category'):
+            merged = getattr(total, name)
+            for key, amount in getattr(row, name).items():
+                merged[key] = _money(Decimal(merged.get(key, '0')) + Decimal(amount))
+    return total
+
+
+def refresh_monthly_financials(keys):
+    """
+    Recompute the rollup rows for `keys`, an iterable of (property_id, date) pairs (any
+    day of the month). Each distinct month costs a fixed handful of grouped queries and one
+    upsert, however many properties it covers. Properties that no longer exist are skipped.
+    """
+    by_month = defaultdict(set)
+    for property_id, day in keys:
+        if property_id is not None and day is not None:
+            by_month[month_start(day)].add(property_id)
+    if not by_month:
+        return
+    existing = set(
+        Property.objects.filter(
+            pk__in={pid for ids in by_month.values() for pid in ids},
+        ).values_list('pk', flat=True)
+    )
+    for month, property_ids in by_month.items():
+        property_ids = sorted(property_ids & existing)
+        if not property_ids:
+            continue
+        PropertyMonthlyFinancials.objects.bulk_create(
+            _build_month(month, property_ids),
+            update_conflicts=True,
+            unique_fields=['property', 'month'],
+            update_fields=_UPDATE_FIELDS,
+        )
+
+
+def refresh_occupancy(property_id, start=None, end=None):
+    """Recompute occupancy on the property's existing rollup rows for months in [start, end]."""
+    rows = PropertyMonthlyFinancials.objects.filter(property_id=property_id)
+    if start is not None:
+        rows = rows.filter(month__gte=month_start(start))
+    if end is not None:
+        rows = rows.filter(month__lte=end)
+    rows = list(rows)
+    series = OccupancyTimeline([property_id]).series(month_periods(row.month for row in rows))
+    for row, (occupied, total) in zip(rows, series):
+        row.occupied_units, row.total_units = occupied, total
+    PropertyMonthlyFinancials.objects.bulk_update(rows, ['occupied_units', 'total_units'])
+
+
+def refresh_closed_month_occupancy(today, properties=None):
+    """
+    Recompute occupancy on last month's rollup rows (optionally limited to `properties`)
+    that were last written before this month began. While a month is running its occupancy
+    leaves out deactivated leases; once it ends those leases count again, and nothing else
+    touches the row when the calendar rolls over. Refreshed rows get a new `updated_at`, so
+    later runs in the same month skip them. Returns the number of rows refreshed.
+    """
+    current = month_start(today)
+    previous = month_start(current - timedelta(days=1))
+    month_began = timezone.make_aware(datetime.combine(current, datetime.min.time()))
+    rows = PropertyMonthlyFinancials.objects.filter(month=previous, updated_at__lt=month_began)
+    if properties is not None:
+        rows = rows.filter(property__in=properties)
+    rows = list(rows)
+    if not rows:
+        return 0
+    timeline = OccupancyTimeline({row.property_id for row in rows})
+    [period] = month_periods([previous])
+    now = timezone.now()
+    for row in rows:
+        row.occupied_units = timeline.occupied(row.property_id, *period)
+        row.total_units = timeline.total_units.get(row.property_id, 0)
+        row.updated_at = now
+    PropertyMonthlyFinancials.objects.bulk_update(rows, ['occupied_units', 'total_units', 'updated_at'])
+    return len(rows)
+
+
+def monthly_financials(prop, months):
+    """
+    Rollup rows for `prop` and each month in `months`, in order. Months with no row yet are
+    computed together in memory (a fixed number of grouped queries) and returned unsaved:
+    reads never write. Stored rows come only from `billing.signals` and
+    `rebuild_financial_rollup`, so a missing month costs the grouped queries on every read
+    until one of those fills it.
+    """
+    rows = {
+        row.month: row
+        for row in PropertyMonthlyFinancials.objects.filter(property=prop, month__in=months)
+    }
+    missing = [m for m in months if m not in rows]
+    if missing:
+        built = aggregate_monthly_financials([prop.pk], missing)
+        occupancy = OccupancyTimeline([prop.pk]).series(month_periods(missing))
+        for month, (occupied, total) in zip(missing, occupancy):
+            row = built[(prop.pk, month)]
+            row.occupied_units, row.total_units = occupied, total
+            rows[month] = row
+    return [rows[m] for m in months]
+
+
+def _source_months():
+    """Every (property_id, month) that has invoices, payments, income or expenses."""
+    keys = set()
+    keys.update(
+        Invoice.objects.annotate(m=TruncMonth('period_start'))
+        .values_list('lease__unit__property_id', 'm').distinct()
+    )
+    keys.update(
+        (pid, paid_at_month(m))
+        for pid, m in Payment.objects.filter(status='completed', paid_at__isnull=False)
+        .annotate(m=TruncMonth('paid_at'))
+        .values_list('invoice__lease__unit__property_id', 'm').distinct()
+    )
+    keys.update(
+        AdditionalIncome.objects.annotate(m=TruncMonth('date'))
+        .values_list('unit__property_id', 'm').distinct()
+    )
+    keys.update(
+        Expense.objects.annotate(m=TruncMonth('date'))
+        .values_list('property_id', 'm').distinct()
+    )
+    return keys
+
+
+def rebuild_monthly_financials(properties=None):
+    """
+    Recompute the rollup from scratch for every property-month with recorded activity
+    (optionally limited to `properties`), deleting rows that no longer have any.
+    Returns the number of rows written.
+    """
+    keys = _source_months()
+    stale = PropertyMonthlyFinancials.objects.all()
+    if properties is not None:
+        wanted = set(properties.values_list('pk', flat=True))
+        keys = {(pid, m) for pid, m in keys if pid in wanted}
+        stale = stale.filter(property__in=properties)
+    with transaction.atomic():
+        stale.delete()
+        refresh_monthly_financials(keys)
+    return len(keys)
@@ -0,0 +1,124 @@
+"""
+Billing forecast for GET /api/billing/reports/forecast/.
+
+Generation and due dates are closed-form per calendar month (the generation day is the
+clamped rent due day minus the lead days, never before the 1st, so it always falls in the
+month it bills). Expected rent comes from one query grouped by property with a conditional
+sum per forecast month, so the cost does not grow with the number of properties.
+"""
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+
+from property.models import Lease
+from .financial_rollup import month_periods, next_month
+from .models import BillingConfig
+
+MAX_FORECAST_MONTHS = 24
+DEFAULT_FORECAST_MONTHS = 6
+
+
+def clamp_due_day(due_day, year, month):
+    return min(due_day, calendar.monthrange(year, month)[1])
+
+
+def invoice_generation_date(year, month, rent_due_day, lead_days):
+    """Day `process_billing` generates the invoice for the given month."""
+    return date(year, month, max(1, clamp_due_day(rent_due_day, year, month) - lead_days))
+
+
+def rent_due_date(year, month, rent_due_day, grace_period_days):
+    """Due date stamped on that month's invoice (clamped due day plus grace)."""
+    return date(year, month, clamp_due_day(rent_due_day, year, month)) + timedelta(days=grace_period_days)
+
+
+def next_invoice_generation_on_or_after(start, rent_due_day, lead_days):
+    """First generation date on or after `start`: this month's, or else next month's."""
+    generation = invoice_generation_date(start.year, start.month, rent_due_day, lead_days)
+    if generation >= start:
+        return generation
+    following = next_month(start.replace(day=1))
+    return invoice_generation_date(following.year, following.month, rent_due_day, lead_days)
+
+
+def forecast_months(today, count):
+    """First-of-month dates for the `count` months starting with the current one."""
+    months = [today.replace(day=1)]
+    while len(months) < count:
+        months.append(next_month(months[-1]))
+    return months
+
+
+def _lease_bills_month(period_start, period_end):
+    # The lease has started by the end of the period and has not ended before it begins.
+    return Q(start_date__lte=period_end) & (Q(end_date__isnull=True) | Q(end_date__gte=period_start))
+
+
+def build_billing_forecast(property_ids, today, months):
+    """
+    {property_id: {'config': (rent_due_day, lead_days, grace_days) or None,
+                   'months': [(month, generation_date, due_date, lease_count, expected_rent), ...],
+                   'expiring': [lease dict, ...]}}
+    for the first-of-month dates in `months`. Three queries in total: billing configs,
+    expected rent per property (one conditional Sum / Count per month) and the leases whose
+    end date falls between `today` and the end of the horizon.
+    """
+    periods = month_periods(months)
+    horizon_end = periods[-1][1]
+
+    configs = {
+        pid: (due_day, lead, grace)
+        for pid, due_day, lead, grace in BillingConfig.objects.filter(property_id__in=property_ids).values_list(
+            'property_id', 'rent_due_day', 'invoice_lead_days', 'grace_period_days',
+        )
+    }
+
+    annotations = {}
+    for i, (period_start, period_end) in enumerate(periods):
+        billed = _lease_bills_month(period_start, period_end)
+        annotations[f'rent_{i}'] = Sum('rent_amount', filter=billed)
+        annotations[f'leases_{i}'] = Count('pk', filter=billed)
+    grouped = {
+        row['unit__property_id']: row
+        for row in Lease.objects.filter(unit__property_id__in=property_ids, is_active=True)
+        .values('unit__property_id').order_by().annotate(**annotations)
+    }
+
+    expiring = {pid: [] for pid in property_ids}
+    for lease_id, pid, unit_name, first, last, rent, end_date in (
+        Lease.objects.filter(
+            unit__property_id__in=property_ids, is_active=True,
+            end_date__gte=today, end_date__lte=horizon_end,
+        )
+        .order_by('end_date', 'pk')
+        .values_list(
+            'pk', 'unit__property_id', 'unit__name', 'tenant__first_name', 'tenant__last_name',
+            'rent_amount', 'end_date',
+        )
+    ):
+        expiring[pid].append({
+            'lease': lease_id,
+            'unit': unit_name,
+            'tenant': f'{first or ""} {last or ""}'.strip(),
+            'rent_amount': rent,
+            'end_date': end_date,
+        })
+
+    forecast = {}
+    for pid in property_ids:
+        config = configs.get(pid)
+        row = grouped.get(pid, {})
+        schedule = []
+        for i, month in enumerate(months):
+            generation = due = None
+            if config is not None:
+                due_day, lead, grace = config
+                generation = invoice_generation_date(month.year, month.month, due_day, lead)
+                due = rent_due_date(month.year, month.month, due_day, grace)
+            schedule.append((
+                month, generation, due, row.get(f'leases_{i}', 0), row.get(f'rent_{i}') or Decimal('0'),
+            ))
+        forecast[pid] = {'config': config, 'months': schedule, 'expiring': expiring[pid]}
+    return forecast
@@ -0,0 +1,150 @@
+"""Set-based invoice generation for the `process_billing` command."""
+import calendar
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Greatest, Least
+
+from property.models import Lease
+from .financial_rollup import refresh_monthly_financials
+from .models import BillingConfig, Invoice
+from .utils import generate_invoice_number
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _provisional_invoice_number(lease_id, period_start):
+    """Unique placeholder used until the row has a pk (invoice_number is unique, so '' cannot repeat)."""
+    return f"PENDING-{lease_id}-{period_start:%Y%m}"
+
+
+def configs_due_on(today):
+    """BillingConfig rows whose invoice generation day (clamped due day minus lead days) is `today`."""
+    last_day = calendar.monthrange(today.year, today.month)[1]
+    return BillingConfig.objects.annotate(
+        _generation_day=Greatest(
+            Value(1),
+            Least(F('rent_due_day'), Value(last_day)) - F('invoice_lead_days'),
+        ),
+    ).filter(_generation_day=today.day)
+
+
+def due_dates_by_property(today, configs):
+    """{property_id: due_date} for the given (already due) configs."""
+    last_day = calendar.monthrange(today.year, today.month)[1]
+    due = {}
+    for property_id, rent_due_day, grace_days in configs.values_list(
+        'property_id', 'rent_due_day', 'grace_period_days',
+    ):
+        anchor = date(today.year, today.month, min(rent_due_day, last_day))
+        due[property_id] = anchor + timedelta(days=grace_days)
+    return due
+
+
+def leases_missing_invoice(today, configs):
+    """Active leases on due properties that have no invoice for this month yet."""
+    period_start = today.replace(day=1)
+    existing = Invoice.objects.filter(lease_id=OuterRef('pk'), period_start=period_start)
+    return (
+        Lease.objects.filter(
+            is_active=True,
+            unit__property_id__in=configs.values('property_id'),
+        )
+        .filter(~Exists(existing))
+        .order_by('pk')
+    )
+
+
+def unconfigured_property_names(properties=None):
+    """Names of properties with active leases but no BillingConfig (reported, never invoiced)."""
+    leases = Lease.objects.all()
+    if properties is not None:
+        leases = leases.filter(unit__property__in=properties)
+    return list(
+        leases.filter(is_active=True, unit__property__billing_config__isnull=True)
+        .order_by('unit__property__name')
+        .values_list('unit__property__name', flat=True)
+        .distinct()
+    )
+
+
+def generate_due_invoices(today, *, properties=None, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    """
+    Insert this month's invoice for every active lease whose property generates today.
+    `properties` optionally restricts the run to a Property queryset (one shard).
+
+    Leases are read in keyset batches of `batch_size`; each batch is one `bulk_create`
+    (conflicts on (lease, period_start) are ignored, so overlapping runs are safe) followed
+    by one `bulk_update` assigning `INV-NNNN` numbers. `on_batch(stats, rows)` is called
+    after every batch with `index`, `created` and `seconds`, plus the
+    (lease_id, property_id, rent_amount, tenant_username, unit_name, property_name) rows
+    that received a new invoice.
+    Returns {'created': int, 'batches': [stats, ...]}.
+    """
+    configs = configs_due_on(today)
+    if properties is not None:
+        configs = configs.filter(property__in=properties)
+    due_dates = due_dates_by_property(today, configs)
+    if not due_dates:
+        return {'created': 0, 'batches': []}
+
+    period_start = today.replace(day=1)
+    period_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    leases = leases_missing_invoice(today, configs).values_list(
+        'pk', 'unit__property_id', 'rent_amount', 'tenant__username', 'unit__name',
+        'unit__property__name',
+    )
+
+    batches = []
+    total_created = 0
+    last_pk = 0
+    while True:
+        rows = list(leases.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        started = time.monotonic()
+
+        invoices = [
+            Invoice(
+                lease_id=lease_id,
+                invoice_number=_provisional_invoice_number(lease_id, period_start),
+                period_start=period_start,
+                period_end=period_end,
+                due_date=due_dates[property_id],
+                rent_amount=rent_amount,
+                late_fee_amount=Decimal('0'),
+                total_amount=rent_amount,
+                balance_due=rent_amount,
+                status='pending',
+            )
+            for lease_id, property_id, rent_amount, *_ in rows
+        ]
+        with transaction.atomic():
+            Invoice.objects.bulk_create(invoices, ignore_conflicts=True)
+            created = list(
+                Invoice.objects.filter(
+                    invoice_number__in=[inv.invoice_number for inv in invoices],
+                ).only('pk', 'lease_id')
+            )
+            for inv in created:
+                inv.invoice_number = generate_invoice_number(inv.pk)
+            Invoice.objects.bulk_update(created, ['invoice_number'])
+        # bulk_create skips model signals, so refresh the financial rollup here.
+        refresh_monthly_financials({(property_id, period_start) for _, property_id, *_ in rows})
+
+        stats = {
+            'index': len(batches) + 1,
+            'created': len(created),
+            'seconds': time.monotonic() - started,
+        }
+        batches.append(stats)
+        total_created += len(created)
+        if on_batch is not None:
+            created_lease_ids = {inv.lease_id for inv in created}
+            on_batch(stats, [row for row in rows if row[0] in created_lease_ids])
+
+    return {'created': total_created, 'batches': batches}
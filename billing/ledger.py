@@ -0,0 +1,184 @@
+"""
+Tenant ledger (statement) for one lease or every lease of a tenant.
+
+Each source table contributes one ORM branch with the same annotated columns: rent
+invoiced (dated on the period start), late fees (dated on the due date), unit charges
+recorded as additional income while the lease ran, and completed payments (dated on the
+local day they were paid). The branches are combined with UNION ALL and the running
+balance is `SUM(debit - credit) OVER (ORDER BY entry_date, entry_order, source_id)`, so a
+page deep into the statement carries the right balance without loading what comes before
+it. Pages are keyset on that same ordering.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import CharField, DateField, DecimalField, F, IntegerField, Q, Value
+from django.db.models.functions import Cast, Coalesce, TruncDate
+
+from .models import AdditionalIncome, Invoice, Payment
+
+KIND_RENT = 'rent'
+KIND_LATE_FEE = 'late_fee'
+KIND_CHARGE = 'charge'
+KIND_PAYMENT = 'payment'
+# Same-day entries: charges before payments, so a payment made on the invoice date nets to zero.
+ENTRY_ORDER = {KIND_RENT: 1, KIND_LATE_FEE: 2, KIND_CHARGE: 3, KIND_PAYMENT: 4}
+
+COLUMNS = (
+    'ledger_lease', 'entry_date', 'entry_order', 'entry_kind', 'source_id',
+    'reference', 'detail', 'debit', 'credit',
+)
+_MONEY = DecimalField(max_digits=12, decimal_places=2)
+_ZERO = Value(Decimal('0'), output_field=_MONEY)
+
+
+def _branch(queryset, kind, **columns):
+    """`queryset` reduced to the shared ledger columns, annotated in COLUMNS order."""
+    columns['entry_order'] = Value(ENTRY_ORDER[kind], output_field=IntegerField())
+    columns['entry_kind'] = Value(kind, output_field=CharField())
+    return queryset.order_by().annotate(**{name: columns[name] for name in COLUMNS}).values(*COLUMNS)
+
+
+def _entry_branches(lease_ids):
+    invoices = Invoice.objects.filter(lease_id__in=lease_ids).exclude(status='cancelled')
+    rent = _branch(
+        invoices, KIND_RENT,
+        ledger_lease=F('lease_id'), entry_date=F('period_start'), source_id=F('pk'),
+        reference=F('invoice_number'), detail=Value('', output_field=CharField()),
+        debit=Cast('rent_amount', _MONEY), credit=_ZERO,
+    )
+    late_fees = _branch(
+        invoices.filter(late_fee_amount__gt=0), KIND_LATE_FEE,
+        ledger_lease=F('lease_id'), entry_date=F('due_date'), source_id=F('pk'),
+        reference=F('invoice_number'), detail=Value('', output_field=CharField()),
+        debit=Cast('late_fee_amount', _MONEY), credit=_ZERO,
+    )
+    charges = _branch(
+        AdditionalIncome.objects.filter(unit__lease__in=lease_ids, date__gte=F('unit__lease__start_date'))
+        .filter(Q(unit__lease__end_date__isnull=True) | Q(date__lte=F('unit__lease__end_date'))),
+        KIND_CHARGE,
+        ledger_lease=F('unit__lease__id'), entry_date=F('date'), source_id=F('pk'),
+        reference=F('charge_type__name'), detail=F('description'),
+        debit=Cast('amount', _MONEY), credit=_ZERO,
+    )
+    payments = _branch(
+        Payment.objects.filter(invoice__lease_id__in=lease_ids, status='completed', paid_at__isnull=False),
+        KIND_PAYMENT,
+        ledger_lease=F('invoice__lease_id'), entry_date=TruncDate('paid_at', output_field=DateField()),
+        source_id=F('pk'),
+        reference=Coalesce('receipt__receipt_number', 'transaction_reference', Value(''), output_field=CharField()),
+        detail=F('payment_method'),
+        debit=_ZERO, credit=Cast('amount', _MONEY),
+    )
+    return rent.union(late_fees, charges, payments, all=True)
+
+
+def _to_decimal(value):
+    # SQLite hands back floats for numeric expressions over a raw cursor; PostgreSQL gives Decimal.
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def _to_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+class Ledger:
+    """Chronological statement over `lease_ids` (one lease, or all of a tenant's leases)."""
+
+    def __init__(self, lease_ids):
+        self.lease_ids = list(lease_ids)
+
+    def _sql(self):
+        union_sql, params = _entry_branches(self.lease_ids).query.sql_with_params()
+        sql = (
+            f'SELECT {", ".join(COLUMNS)}, '
+            'SUM(debit - credit) OVER ('
+            'ORDER BY entry_date, entry_order, source_id ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW'
+            f') AS balance FROM ({union_sql}) ledger_entries'
+        )
+        return sql, list(params)
+
+    def count(self):
+        if not self.lease_ids:
+            return 0
+        union_sql, params = _entry_branches(self.lease_ids).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({union_sql}) ledger_entries', params)
+            return cursor.fetchone()[0]
+
+    def entries(self, after=None, limit=None):
+        """
+        Entries as dicts with the running `balance`, oldest first. `after` is the
+        (entry_date, entry_order, source_id) key of the last entry already seen.
+        """
+        if not self.lease_ids:
+            return []
+        inner, params = self._sql()
+        sql = f'SELECT * FROM ({inner}) ledger'
+        if after is not None:
+            sql += ' WHERE (entry_date > %s OR (entry_date = %s AND (entry_order > %s OR (entry_order = %s AND source_id > %s))))'
+            entry_date, entry_order, source_id = after
+            params += [entry_date, entry_date, entry_order, entry_order, source_id]
+        sql += ' ORDER BY entry_date, entry_order, source_id'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            names = [col[0] for col in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        return [self._entry(row) for row in rows]
+
+    @staticmethod
+    def _entry(row):
+        kind = row['entry_kind']
+        entry_date = _to_date(row['entry_date'])
+        if kind == KIND_RENT:
+            description = f'Rent {entry_date:%Y-%m}'
+        elif kind == KIND_LATE_FEE:
+            description = f'Late fee on {row["reference"]}'
+        elif kind == KIND_CHARGE:
+            description = row['reference'] + (f': {row["detail"]}' if row['detail'] else '')
+        else:
+            description = f'Payment ({dict(Payment.PAYMENT_METHOD_CHOICES).get(row["detail"], row["detail"])})'
+        return {
+            'date': entry_date,
+            'kind': kind,
+            'description': description,
+            'reference': row['reference'] or '',
+            'lease': row['ledger_lease'],
+            'source_id': row['source_id'],
+            'entry_order': row['entry_order'],
+            'debit': _to_decimal(row['debit']),
+            'credit': _to_decimal(row['credit']),
+            'balance': _to_decimal(row['balance']),
+        }
+
+
+LEDGER_HEADER = ('Date', 'Description', 'Reference', 'Lease', 'Debit', 'Credit', 'Balance')
+
+
+def ledger_rows(entries):
+    for entry in entries:
+        yield (
+            entry['date'], entry['description'], entry['reference'], entry['lease'],
+            entry['debit'], entry['credit'], entry['balance'],
+        )
+
+
+def ledger_pdf_lines(title, entries):
+    """Fixed-width statement lines for `billing.exports.render_text_pdf`."""
+    layout = '{:<10}  {:<36.36}  {:<16.16}  {:>11}  {:>11}  {:>12}'
+    lines = [title, '', layout.format('Date', 'Description', 'Reference', 'Debit', 'Credit', 'Balance'), '-' * 106]
+    balance = Decimal('0')
+    for entry in entries:
+        balance = entry['balance']
+        lines.append(layout.format(
+            entry['date'].isoformat(), entry['description'], entry['reference'],
+            f"{entry['debit']:,}" if entry['debit'] else '',
+            f"{entry['credit']:,}" if entry['credit'] else '',
+            f"{entry['balance']:,}",
+        ))
+    lines += ['-' * 106, f'{"Closing balance":<78}{balance:>28,}']
+    return lines
@@ -1,218 +1,245 @@
-import calendar
-from datetime import date, timedelta
-from decimal import Decimal
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
 from django.utils import timezone
 
-from property.models import Lease
-from billing.models import BillingConfig, Invoice, ReminderLog, PropertyBillingNotificationSettings
+from property.models import Property
+from billing.financial_rollup import refresh_closed_month_occupancy
+from billing.invoice_generation import (
+    DEFAULT_BATCH_SIZE,
+    generate_due_invoices,
+    unconfigured_property_names,
+)
+from billing.late_fees import apply_late_fees
+from billing.reminders import send_reminders
+from billing.sharding import advisory_lock, parse_shard, shard_label, shard_properties
+from notifications.preferences import preference_cache_stats
 
 
-class Command(BaseCommand):
-    help = 'Generate invoices, apply late fees, and send email reminders'
+def _init_worker():
+    """
+    Process-pool initializer. Children are forked, so they inherit the configured (and, under
+    the test runner, test) settings; the parent closed its connections before forking, and
+    this drops any inherited handle so each child opens its own connection on first query.
+    """
+    connections.close_all()
 
-    def handle(self, *args, **options):
-        today = timezone.now().date()
-        self._generate_invoices(today)
-        self._apply_late_fees(today)
-        self._send_reminders(today)
 
-    # ── Invoice Generation ──────────────────────────────────────────────────────
+def _run_shard_in_worker(today, shard, options):
+    """Process-pool entry point: run one shard with its own DB connection."""
+    return Command(stdout=sys.stdout, stderr=sys.stderr).run_shard(today, shard, options)
+
 
-    def _generate_invoices(self, today):
-        active_leases = Lease.objects.filter(
-            is_active=True
-        ).select_related('unit__property__billing_config', 'tenant')
+class Command(BaseCommand):
+    help = (
+        'Generate invoices, apply late fees, send email reminders, and settle last month\'s '
+        'occupancy in the financial rollup. Shards are guarded by '
+        'session-level advisory locks, so on PostgreSQL use a direct or session-mode connection, '
+        'not a transaction-mode pooler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per invoice/reminder insert batch (default {DEFAULT_BATCH_SIZE}).',
+        )
+        parser.add_argument(
+            '--late-fee-chunk-size',
+            type=int,
+            default=None,
+            help='Apply late fees in pk ranges of this many invoices, one short transaction each '
+                 '(default: all invoices in one transaction).',
+        )
+        parser.add_argument(
+            '--shard',
+            default=None,
+            help='Only process properties with property_id %% N == i, given as i/N '
+                 '(e.g. 0/4 on one cron host, 1/4 on the next).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Split properties into N shards and run them in a pool of N processes.',
+        )
 
-        for lease in active_leases:
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers must be at least 1.')
+        shard = None
+        if options['shard']:
+            if workers > 1:
+                raise CommandError('--shard and --workers cannot be combined.')
             try:
-                config = lease.unit.property.billing_config
-            except BillingConfig.DoesNotExist:
-                self.stdout.write(f'  No billing config for property "{lease.unit.property.name}" — skipping')
-                continue
+                shard = parse_shard(options['shard'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        sequential_reason = self._sequential_reason() if workers > 1 else None
+        if workers == 1:
+            summaries = [self.run_shard(today, shard, options)]
+        elif sequential_reason:
+            self.stdout.write(self.style.WARNING(f'  {sequential_reason}: running shards sequentially'))
+            summaries = [self.run_shard(today, (i, workers), options) for i in range(workers)]
+        else:
+            summaries = self._run_in_pool(today, workers, options)
+        self._write_summary(summaries)
+
+    def _sequential_reason(self):
+        if connection.vendor == 'sqlite':
+            # SQLite allows a single writer, so worker processes would only contend for the lock.
+            return 'SQLite backend'
+        if any(conn.in_atomic_block for conn in connections.all()):
+            # Workers could not see uncommitted rows, and closing the connection would break the transaction.
+            return 'Inside a transaction'
+        return None
+
+    def _run_in_pool(self, today, workers, options):
+        shards = [(i, workers) for i in range(workers)]
+        stage_options = {
+            key: options[key] for key in ('batch_size', 'late_fee_chunk_size', 'verbosity')
+        }
+        # Children must open their own connections, never share the parent's socket.
+        connections.close_all()
+        # fork, not the platform default (forkserver on Python 3.14): children keep the parent's
+        # settings instead of re-importing the base ones.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+        ) as pool:
+            return list(pool.map(
+                _run_shard_in_worker,
+                [today] * workers,
+                shards,
+                [stage_options] * workers,
+            ))
 
-            y, m = today.year, today.month
-            clamped_due = self._clamp_due_day(config.rent_due_day, y, m)
-            gen_day = max(1, clamped_due - config.invoice_lead_days)
-            if today.day != gen_day:
+    def run_shard(self, today, shard, options):
+        """Run every stage for one shard (None = all properties) under that shard's advisory lock."""
+        label = shard_label(shard)
+        summary = {'shard': label, 'skipped': False, 'stages': []}
+        with advisory_lock(f'process_billing:{label}') as acquired:
+            if not acquired:
+                self.stdout.write(self.style.WARNING(
+                    f'  Shard {label} is already being processed by another run — skipping'
+                ))
+                summary['skipped'] = True
+                return summary
+
+            properties = shard_properties(shard)
+            stages = [
+                ('generate', lambda: self._generate_invoices(
+                    today, properties, options['batch_size'], options['verbosity'],
+                )),
+                ('late_fees', lambda: self._apply_late_fees(
+                    today, properties, options['late_fee_chunk_size'],
+                )),
+                ('reminders', lambda: self._send_reminders(
+                    today, properties, options['batch_size'], options['verbosity'],
+                )),
+                ('occupancy', lambda: self._refresh_closed_month_occupancy(today, properties)),
+            ]
+            cache_before = preference_cache_stats()
+            for name, run in stages:
+                started = time.monotonic()
+                rows = run()
+                summary['stages'].append((name, rows, time.monotonic() - started))
+            summary['preference_cache'] = {
+                key: value - cache_before[key] for key, value in preference_cache_stats().items()
+            }
+        return summary
+
+    def _write_summary(self, summaries):
+        self.stdout.write('  Stage timings:')
+        for summary in summaries:
+            if summary['skipped']:
+                self.stdout.write(f"    shard {summary['shard']}: skipped (locked)")
                 continue
-
-            period_start = today.replace(day=1)
-            period_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
-            anchor = date(y, m, clamped_due)
-            due_date = anchor + timedelta(days=config.grace_period_days)
-
-            _, created = Invoice.objects.get_or_create(
-                lease=lease,
-                period_start=period_start,
-                defaults={
-                    'period_end': period_end,
-                    'due_date': due_date,
-                    'rent_amount': lease.rent_amount,
-                    'late_fee_amount': Decimal('0'),
-                    'total_amount': lease.rent_amount,
-                    'status': 'pending',
-                },
+            parts = [f'{name} {rows} rows in {seconds:.2f}s' for name, rows, seconds in summary['stages']]
+            total = sum(seconds for _, _, seconds in summary['stages'])
+            self.stdout.write(f"    shard {summary['shard']}: {', '.join(parts)} — total {total:.2f}s")
+            prefs = summary['preference_cache']
+            self.stdout.write(
+                f"      notification preferences: {prefs['hits']} cached "
+                f"({prefs['local_hits']} local, {prefs['shared_hits']} shared), {prefs['misses']} loaded"
             )
-            if created:
-                self.stdout.write(self.style.SUCCESS(
-                    f'  Created invoice for {lease.tenant.username} — {lease.unit} ({period_start})'
-                ))
-
-    # ── Late Fees ───────────────────────────────────────────────────────────────
 
-    def _apply_late_fees(self, today):
-        overdue_invoices = Invoice.objects.filter(
-            status__in=['pending', 'partial'],
-            due_date__lt=today,
-        ).select_related('lease__unit__property__billing_config')
-
-        for invoice in overdue_invoices:
-            try:
-                config = invoice.lease.unit.property.billing_config
-            except BillingConfig.DoesNotExist:
-                continue
+    # ── Invoice Generation ──────────────────────────────────────────────────────
 
-            if config.late_fee_mode == BillingConfig.LATE_FEE_MODE_FIXED:
-                late_fee = (config.late_fee_fixed_amount or Decimal('0')).quantize(Decimal('0.01'))
-            else:
-                late_fee = (
-                    invoice.rent_amount * config.late_fee_percentage / Decimal('100')
-                ).quantize(Decimal('0.01'))
+    def _generate_invoices(self, today, properties, batch_size, verbosity):
+        for name in unconfigured_property_names(properties):
+            self.stdout.write(f'  No billing config for property "{name}" — skipping')
+
+        def report_batch(stats, rows):
+            if verbosity >= 2:
+                period_start = today.replace(day=1)
+                for _, _, _, username, unit_name, property_name in rows:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  Created invoice for {username} — {unit_name} ({property_name}) ({period_start})'
+                    ))
+            rate = stats['created'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(
+                f"  Invoice batch {stats['index']}: {stats['created']} created "
+                f"in {stats['seconds']:.2f}s ({rate:.0f}/s)"
+            )
 
-                if config.late_fee_max_percentage:
-                    max_fee = (
-                        invoice.rent_amount * config.late_fee_max_percentage / Decimal('100')
-                    ).quantize(Decimal('0.01'))
-                    late_fee = min(late_fee, max_fee)
+        result = generate_due_invoices(
+            today, properties=properties, batch_size=batch_size, on_batch=report_batch,
+        )
+        self.stdout.write(self.style.SUCCESS(f"  Invoices created: {result['created']}"))
+        return result['created']
 
-            invoice.late_fee_amount = late_fee
-            invoice.total_amount = invoice.rent_amount + late_fee
-            invoice.status = 'overdue'
-            invoice.save()
+    # ── Late Fees ───────────────────────────────────────────────────────────────
 
+    def _apply_late_fees(self, today, properties, chunk_size):
+        counts = apply_late_fees(today, properties=properties, chunk_size=chunk_size)
+        names = dict(Property.objects.filter(pk__in=counts).values_list('pk', 'name'))
+        for property_id, n in sorted(counts.items()):
             self.stdout.write(self.style.WARNING(
-                f'  Late fee applied: {invoice.lease.tenant.username} — Invoice {invoice.id} (+{late_fee})'
+                f'  Late fees applied: {names.get(property_id, property_id)} — {n} invoice{"s" if n != 1 else ""}'
             ))
+        return sum(counts.values())
 
     # ── Reminders ───────────────────────────────────────────────────────────────
 
-    def _send_reminders(self, today):
-        self._send_pre_due_reminders(today)
-        self._send_due_date_reminders(today)
-        self._send_overdue_reminders(today)
-
-    def _pre_due_offset_days(self, prop):
-        """Legacy: no settings row → 3. Row exists with null remind_before_due_days → disabled."""
-        try:
-            s = prop.billing_notification_settings
-        except PropertyBillingNotificationSettings.DoesNotExist:
-            return 3
-        if s.remind_before_due_days is None:
-            return None
-        return s.remind_before_due_days
-
-    def _overdue_reminder_delay_days(self, prop):
-        """Days after invoice due_date before sending overdue reminder. Null → 0."""
-        try:
-            s = prop.billing_notification_settings
-        except PropertyBillingNotificationSettings.DoesNotExist:
-            return 0
-        if s.remind_after_overdue_days is None:
-            return 0
-        return s.remind_after_overdue_days
-
-    def _send_pre_due_reminders(self, today):
-        from notifications.utils import create_notification
-
-        candidates = Invoice.objects.filter(
-            status__in=['pending', 'partial'],
-        ).exclude(reminders__reminder_type='pre_due').select_related(
-            'lease__tenant', 'lease__unit__property',
-        )
-
-        for invoice in candidates:
-            prop = invoice.lease.unit.property
-            n = self._pre_due_offset_days(prop)
-            if n is None:
-                continue
-            if invoice.due_date != today + timedelta(days=n):
-                continue
-
-            tenant = invoice.lease.tenant
-            title = f'Rent due in {n} day{"s" if n != 1 else ""}'
-            body = (
-                f'Hi {tenant.first_name or tenant.username},\n\n'
-                f'This is a reminder that your rent of KES {invoice.total_amount} '
-                f'is due on {invoice.due_date}.\n\n'
-                f'Invoice #{invoice.id} | Period: {invoice.period_start} – {invoice.period_end}\n\n'
-                f'Please ensure payment is made on time to avoid late fees.\n\n'
-                f'Tree House'
-            )
-            create_notification(
-                tenant, 'payment_reminder', title, body,
-                action_url='',
-            )
-            ReminderLog.objects.create(invoice=invoice, reminder_type='pre_due')
-            self.stdout.write(f'  Pre-due reminder sent to {tenant.email}')
-
-    def _send_due_date_reminders(self, today):
-        from notifications.utils import create_notification
-
-        invoices = Invoice.objects.filter(
-            due_date=today,
-            status__in=['pending', 'partial'],
-        ).exclude(reminders__reminder_type='due_date').select_related('lease__tenant')
-
-        for invoice in invoices:
-            tenant = invoice.lease.tenant
-            title = 'Rent is due today'
-            body = (
-                f'Hi {tenant.first_name or tenant.username},\n\n'
-                f'Your rent of KES {invoice.total_amount} is due today ({invoice.due_date}).\n\n'
-                f'Invoice #{invoice.id} | Period: {invoice.period_start} – {invoice.period_end}\n\n'
-                f'Please make payment today to avoid late fees.\n\n'
-                f'Tree House'
+    def _send_reminders(self, today, properties, batch_size, verbosity):
+        labels = {
+            'pre_due': ('Pre-due', self.style.SUCCESS),
+            'due_date': ('Due-date', self.style.SUCCESS),
+            'overdue': ('Overdue', self.style.ERROR),
+        }
+
+        def report_batch(stats, invoices):
+            label, style = labels[stats['reminder_type']]
+            if verbosity >= 2:
+                for invoice in invoices:
+                    self.stdout.write(style(f'  {label} reminder sent to {invoice.lease.tenant.email}'))
+            self.stdout.write(
+                f"  {label} reminder batch: {stats['sent']} sent in {stats['seconds']:.2f}s"
             )
-            create_notification(tenant, 'payment_reminder', title, body, action_url='')
-            ReminderLog.objects.create(invoice=invoice, reminder_type='due_date')
-            self.stdout.write(f'  Due-date reminder sent to {tenant.email}')
 
-    def _send_overdue_reminders(self, today):
-        from notifications.utils import create_notification
-
-        invoices = Invoice.objects.filter(
-            status='overdue',
-        ).exclude(reminders__reminder_type='overdue').select_related(
-            'lease__tenant', 'lease__unit__property',
+        sent = send_reminders(
+            today, properties=properties, batch_size=batch_size, on_batch=report_batch,
         )
+        for reminder_type, n in sent.items():
+            self.stdout.write(f'  {labels[reminder_type][0]} reminders sent: {n}')
+        return sum(sent.values())
 
-        for invoice in invoices:
-            prop = invoice.lease.unit.property
-            delay = self._overdue_reminder_delay_days(prop)
-            threshold = invoice.due_date + timedelta(days=delay)
-            if today < threshold:
-                continue
+    # ── Rollup Occupancy ────────────────────────────────────────────────────────
 
-            tenant = invoice.lease.tenant
-            title = 'Rent overdue — late fee applied'
-            body = (
-                f'Hi {tenant.first_name or tenant.username},\n\n'
-                f'Your rent for the period {invoice.period_start} – {invoice.period_end} is overdue.\n\n'
-                f'Rent:      KES {invoice.rent_amount}\n'
-                f'Late fee:  KES {invoice.late_fee_amount}\n'
-                f'Total due: KES {invoice.total_amount}\n\n'
-                f'Please make payment immediately to avoid further charges.\n\n'
-                f'Tree House'
+    def _refresh_closed_month_occupancy(self, today, properties):
+        refreshed = refresh_closed_month_occupancy(today, properties)
+        if refreshed:
+            self.stdout.write(
+                f'  Last month\'s occupancy refreshed: {refreshed} rollup row{"s" if refreshed != 1 else ""}'
             )
-            create_notification(tenant, 'payment_reminder', title, body, action_url='')
-            ReminderLog.objects.create(invoice=invoice, reminder_type='overdue')
-            self.stdout.write(self.style.ERROR(f'  Overdue reminder sent to {tenant.email}'))
-
-    # ── Helpers ─────────────────────────────────────────────────────────────────
-
-    def _clamp_due_day(self, due_day, year, month):
-        """Return due_day clamped to the last day of the given month."""
-        max_day = calendar.monthrange(year, month)[1]
-        return min(due_day, max_day)
+        return refreshed
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from billing.models import StripeWebhookEvent
+from billing.stripe_events import MAX_ATTEMPTS, process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Apply queued Stripe webhook events (payments, receipts, tenant notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events per batch (default 100).')
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f'Failures before an event is parked as failed (default {MAX_ATTEMPTS}).',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new events instead of exiting once the inbox is drained.',
+        )
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            self._drain(options['batch_size'], options['max_attempts'])
+            if not options['loop']:
+                return
+            time.sleep(options['sleep'])
+
+    def _drain(self, batch_size, max_attempts):
+        """Run batches until one comes back short, i.e. until no due events are left."""
+        while True:
+            stats = process_pending_events(batch_size=batch_size, max_attempts=max_attempts)
+            handled = stats['processed'] + stats['retried'] + stats['failed']
+            if handled:
+                self._report(stats)
+            if handled < batch_size:
+                return
+
+    def _report(self, stats):
+        from monitoring.models import SystemMetric
+
+        lags = stats['lags']
+        line = f"  Processed {stats['processed']}, retrying {stats['retried']}, failed {stats['failed']}"
+        if lags:
+            max_lag = max(lags)
+            SystemMetric.objects.create(metric_type='stripe_event_lag_seconds', value=round(max_lag, 2))
+            line += f'; event-to-receipt lag max {max_lag:.1f}s, avg {sum(lags) / len(lags):.1f}s'
+        pending = StripeWebhookEvent.objects.filter(status=StripeWebhookEvent.STATUS_PENDING).count()
+        self.stdout.write(self.style.SUCCESS(f'{line}; {pending} pending'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from property.models import Property
+from billing.financial_rollup import rebuild_monthly_financials
+
+
+class Command(BaseCommand):
+    help = 'Recompute the PropertyMonthlyFinancials rollup behind the financial report'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--property',
+            type=int,
+            action='append',
+            dest='property_ids',
+            help='Only rebuild this property id (repeatable). Default: every property.',
+        )
+
+    def handle(self, *args, **options):
+        properties = None
+        if options['property_ids']:
+            properties = Property.objects.filter(pk__in=options['property_ids'])
+            missing = set(options['property_ids']) - set(properties.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f'Unknown property id(s): {", ".join(map(str, sorted(missing)))}')
+
+        started = time.monotonic()
+        written = rebuild_monthly_financials(properties)
+        self.stdout.write(self.style.SUCCESS(
+            f'  Rebuilt {written} property-month row{"s" if written != 1 else ""} '
+            f'in {time.monotonic() - started:.2f}s'
+        ))
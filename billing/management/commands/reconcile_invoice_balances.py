@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from billing.models import Invoice, completed_payments_total
+
+
+class Command(BaseCommand):
+    help = "Find invoices whose stored amount_paid / balance_due disagree with their payments, and fix them"
+    chunk_size = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing.')
+        parser.add_argument(
+            '--property',
+            type=int,
+            action='append',
+            dest='property_ids',
+            help='Only check invoices of this property id (repeatable). Default: every property.',
+        )
+
+    def handle(self, *args, **options):
+        invoices = Invoice.objects.all()
+        if options['property_ids']:
+            invoices = invoices.filter(lease__unit__property_id__in=options['property_ids'])
+
+        drifted = list(
+            invoices.with_balance_drift()
+            .values_list('pk', 'invoice_number', 'amount_paid', 'computed_amount_paid')
+        )
+        for pk, number, stored, actual in drifted:
+            self.stdout.write(f'  {number or pk}: amount_paid {stored} -> {actual}')
+
+        if not options['dry_run']:
+            ids = [row[0] for row in drifted]
+            for i in range(0, len(ids), self.chunk_size):
+                Invoice.objects.filter(pk__in=ids[i:i + self.chunk_size]).update(
+                    amount_paid=completed_payments_total(),
+                    balance_due=F('total_amount') - completed_payments_total(),
+                )
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'  {verb} {len(drifted)} invoice{"s" if len(drifted) != 1 else ""} with balance drift'
+        ))
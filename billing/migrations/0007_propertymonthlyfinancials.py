@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0010_lease_document_file_upload'),
+        ('billing', '0006_payment_add_fee_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyMonthlyFinancials',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('rent_invoiced', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('late_fees_invoiced', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('additional_income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('additional_income_by_type', models.JSONField(blank=True, default=dict)),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expenses_by_category', models.JSONField(blank=True, default=dict)),
+                ('invoices_paid', models.PositiveIntegerField(default=0)),
+                ('invoices_pending', models.PositiveIntegerField(default=0)),
+                ('invoices_overdue', models.PositiveIntegerField(default=0)),
+                ('invoices_partial', models.PositiveIntegerField(default=0)),
+                ('invoices_cancelled', models.PositiveIntegerField(default=0)),
+                ('occupied_units', models.PositiveIntegerField(default=0)),
+                ('total_units', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                (
+                    'property',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='monthly_financials',
+                        to='property.property',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name_plural': 'Property monthly financials',
+                'unique_together': {('property', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+TRGM_INDEX = 'billing_receipt_search_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    # pg_trgm GIN index so `LIKE '%term%'` is an index scan; other backends keep the plain scan.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON billing_receipt '
+        'USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRGM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='search_document',
+            field=models.TextField(
+                blank=True,
+                default='',
+                editable=False,
+                help_text='Lower-cased searchable text (see billing.receipt_search); maintained by signals.',
+            ),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
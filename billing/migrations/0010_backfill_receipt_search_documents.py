@@ -0,0 +1,35 @@
+from django.db import migrations
+
+SOURCE_FIELDS = (
+    'payment__invoice__invoice_number',
+    'payment__invoice__lease__unit__name',
+    'payment__invoice__lease__tenant__first_name',
+    'payment__invoice__lease__tenant__last_name',
+    'payment__invoice__lease__tenant__email',
+    'payment__transaction_reference',
+)
+
+
+def backfill_search_documents(apps, schema_editor):
+    Receipt = apps.get_model('billing', 'Receipt')
+    batch = []
+    rows = Receipt.objects.values_list('pk', 'receipt_number', *SOURCE_FIELDS)
+    for pk, receipt_number, invoice_number, unit_name, first, last, email, reference in rows.iterator():
+        tenant_name = f'{first or ""} {last or ""}'.strip()
+        parts = (receipt_number, invoice_number, unit_name, tenant_name, email, reference)
+        batch.append(Receipt(pk=pk, search_document='\n'.join((p or '').strip() for p in parts).lower()))
+        if len(batch) >= 500:
+            Receipt.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    Receipt.objects.bulk_update(batch, ['search_document'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0009_receipt_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0012_stripewebhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_paid',
+            field=models.DecimalField(
+                decimal_places=2, default=0, max_digits=10,
+                help_text='Sum of completed payments; maintained by refresh_balance() (see reconcile_invoice_balances)',
+            ),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance_due',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, help_text='total_amount - amount_paid'),
+        ),
+    ]
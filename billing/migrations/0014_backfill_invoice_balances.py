@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_balances(apps, schema_editor):
+    Invoice = apps.get_model('billing', 'Invoice')
+    Payment = apps.get_model('billing', 'Payment')
+    paid = Coalesce(
+        Subquery(
+            Payment.objects.filter(invoice=OuterRef('pk'), status='completed')
+            .order_by().values('invoice').annotate(total=Sum('amount')).values('total')
+        ),
+        Value(Decimal('0')),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+    Invoice.objects.update(amount_paid=paid)
+    Invoice.objects.update(balance_due=F('total_amount') - F('amount_paid'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0013_invoice_balance_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0014_backfill_invoice_balances'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(
+                condition=models.Q(status__in=('pending', 'partial', 'overdue')),
+                fields=['due_date', 'lease'],
+                name='billing_invoice_unpaid_due_idx',
+            ),
+        ),
+    ]
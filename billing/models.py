@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from authentication.models import CustomUser
 from property.models import Property, Unit, Lease
@@ -66,6 +70,31 @@ class PropertyBillingNotificationSettings(models.Model):
         return f"BillingNotificationSettings({self.property.name})"
 
 
+def completed_payments_total():
+    """Correlated subquery: sum of the outer invoice's completed payments (0 when none)."""
+    total = (
+        Payment.objects.filter(invoice=OuterRef('pk'), status='completed')
+        .order_by().values('invoice').annotate(total=Sum('amount')).values('total')
+    )
+    return Coalesce(Subquery(total), Value(Decimal('0')), output_field=models.DecimalField(max_digits=10, decimal_places=2))
+
+
+UNPAID_INVOICE_STATUSES = ('pending', 'partial', 'overdue')
+
+
+class InvoiceQuerySet(models.QuerySet):
+    def with_computed_balance(self):
+        """Annotate `computed_amount_paid` from the payments table (what amount_paid should hold)."""
+        return self.annotate(computed_amount_paid=completed_payments_total())
+
+    def with_balance_drift(self):
+        """Invoices whose stored amount_paid / balance_due disagree with their payments."""
+        return self.with_computed_balance().filter(
+            ~Q(amount_paid=F('computed_amount_paid'))
+            | ~Q(balance_due=F('total_amount') - F('computed_amount_paid'))
+        )
+
+
 class Invoice(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -83,13 +112,33 @@ class Invoice(models.Model):
     rent_amount = models.DecimalField(max_digits=10, decimal_places=2)
     late_fee_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount_paid = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0,
+        help_text='Sum of completed payments; maintained by refresh_balance() (see reconcile_invoice_balances)',
+    )
+    balance_due = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text='total_amount - amount_paid')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = InvoiceQuerySet.as_manager()
+
     class Meta:
         unique_together = ('lease', 'period_start')
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='billing_invoice_created_idx'),
+            # Arrears aging only reads open invoices, a small slice of the history.
+            models.Index(
+                fields=['due_date', 'lease'],
+                name='billing_invoice_unpaid_due_idx',
+                condition=Q(status__in=UNPAID_INVOICE_STATUSES),
+            ),
+        ]
 
     def save(self, *args, **kwargs):
+        self.balance_due = Decimal(self.total_amount) - Decimal(self.amount_paid)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'total_amount' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'balance_due'}
         super().save(*args, **kwargs)
         if not self.invoice_number:
             self.invoice_number = generate_invoice_number(self.pk)
@@ -98,11 +147,17 @@ class Invoice(models.Model):
     def __str__(self):
         return f"Invoice {self.invoice_number or self.id} — {self.lease.unit} ({self.period_start})"
 
-    def amount_paid(self):
-        return sum(p.amount for p in self.payments.filter(status='completed'))
+    def refresh_balance(self):
+        """Recompute amount_paid / balance_due from completed payments in one UPDATE and reload them."""
+        type(self).objects.filter(pk=self.pk).update(
+            amount_paid=completed_payments_total(),
+            balance_due=F('total_amount') - completed_payments_total(),
+        )
+        self.refresh_from_db(fields=['amount_paid', 'balance_due'])
 
     def update_status(self):
-        paid = self.amount_paid()
+        self.refresh_balance()
+        paid = self.amount_paid
         if paid >= self.total_amount:
             self.status = 'paid'
         elif paid > 0:
@@ -155,11 +210,68 @@ class Receipt(models.Model):
     payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='receipt')
     receipt_number = models.CharField(max_length=50, unique=True)
     issued_at = models.DateTimeField(auto_now_add=True)
+    search_document = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        help_text='Lower-cased searchable text (see billing.receipt_search); maintained by signals.',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['issued_at', 'id'], name='billing_receipt_issued_idx'),
+        ]
 
     def __str__(self):
         return self.receipt_number
 
 
+class ReceiptNumberCounter(models.Model):
+    """
+    Last receipt sequence number handed out per calendar month (`RCP-YYYYMM-NNNN`).
+    Advanced by `billing.utils.allocate_receipt_numbers` with a single atomic increment.
+    """
+    month = models.DateField(unique=True, help_text="First day of the month")
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.last_value}"
+
+
+class StripeWebhookEvent(models.Model):
+    """
+    Inbox of verified Stripe webhook events, keyed by Stripe's event id. Written by
+    `stripe_webhook` and drained by `process_stripe_events` (see billing.stripe_events).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSED = 'processed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSED, 'Processed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField(help_text="The event's data.object")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    stripe_created_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='billing_stripe_event_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
+
 class ReminderLog(models.Model):
     REMINDER_TYPES = [
         ('pre_due', 'Pre Due'),
@@ -250,3 +362,36 @@ class Expense(models.Model):
 
     def __str__(self):
         return f"{self.get_category_display()} — {self.property.name} — {self.amount}"
+
+
+class PropertyMonthlyFinancials(models.Model):
+    """
+    Per-property, per-month rollup behind the financial report. Rows are recomputed from
+    the source tables by `billing.financial_rollup` (signals keep them current,
+    `process_billing` settles last month's occupancy once the month has ended, and
+    `rebuild_financial_rollup` recomputes them from scratch).
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='monthly_financials')
+    month = models.DateField(help_text="First day of the month")
+    rent_invoiced = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    late_fees_invoiced = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    additional_income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    additional_income_by_type = models.JSONField(default=dict, blank=True)
+    expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expenses_by_category = models.JSONField(default=dict, blank=True)
+    invoices_paid = models.PositiveIntegerField(default=0)
+    invoices_pending = models.PositiveIntegerField(default=0)
+    invoices_overdue = models.PositiveIntegerField(default=0)
+    invoices_partial = models.PositiveIntegerField(default=0)
+    invoices_cancelled = models.PositiveIntegerField(default=0)
+    occupied_units = models.PositiveIntegerField(default=0)
+    total_units = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('property', 'month')
+        verbose_name_plural = 'Property monthly financials'
+
+    def __str__(self):
+        return f"Financials {self.property_id} {self.month:%Y-%m}"
@@ -1,4 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import date
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class ReceiptListPagination(PageNumberPagination):
@@ -6,3 +16,127 @@ class ReceiptListPagination(PageNumberPagination):
     page_query_param = 'page'
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first keyset pagination on (`ordering_field`, id).
+
+    The cursor is an opaque token for the last row of the previous page; the next page is
+    `WHERE (field, id) < (cursor_field, cursor_id)`, so every page costs the same index range
+    scan however deep it is (no OFFSET). `count` is only computed when `include_count=true`.
+    """
+    ordering_field = None
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'include_count'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size < 1:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, row):
+        value = getattr(row, self.ordering_field)
+        payload = json.dumps([value.isoformat(), row.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(value, str) or not isinstance(pk, int):
+                raise ValueError
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise ValidationError({self.cursor_query_param: ['Invalid cursor.']})
+        return (timezone.make_aware(value) if timezone.is_naive(value) else value), pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        field = self.ordering_field
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+
+        queryset = queryset.order_by(f'-{field}', '-pk')
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            value, pk = self.decode_cursor(token)
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+
+        rows = list(queryset[:page_size + 1])
+        self.next_cursor = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'next_cursor': self.next_cursor}
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
+
+
+class ReceiptCursorPagination(KeysetPagination):
+    ordering_field = 'issued_at'
+
+
+class InvoiceCursorPagination(KeysetPagination):
+    ordering_field = 'created_at'
+
+
+def wants_cursor_pagination(request):
+    """Cursor mode is opt-in (`?cursor=`, empty for the first page) so page-number clients keep working."""
+    return KeysetPagination.cursor_query_param in request.query_params
+
+
+class LedgerCursorPagination(KeysetPagination):
+    """
+    Oldest-first keyset pages over a `billing.ledger.Ledger` on (date, entry order, source id).
+    The running balance is computed in SQL over the whole ledger, so every page carries it.
+    """
+
+    def encode_cursor(self, entry):
+        payload = json.dumps([entry['date'].isoformat(), entry['entry_order'], entry['source_id']], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            value, order, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(order, int) or not isinstance(pk, int):
+                raise ValueError
+            value = date.fromisoformat(value)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise ValidationError({self.cursor_query_param: ['Invalid cursor.']})
+        return value, order, pk
+
+    def paginate_queryset(self, ledger, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = ledger.count()
+
+        token = request.query_params.get(self.cursor_query_param)
+        after = self.decode_cursor(token) if token else None
+        entries = ledger.entries(after=after, limit=page_size + 1)
+        self.next_cursor = self.encode_cursor(entries[page_size - 1]) if len(entries) > page_size else None
+        return entries[:page_size]
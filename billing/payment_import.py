@@ -0,0 +1,363 @@
+"""
+Bulk import of M-Pesa / bank statement rows as completed payments.
+
+Rows are parsed from CSV or JSON, matched to invoices, and written in chunks: each chunk
+is one transaction with one `bulk_create` of Payments, one block of receipt numbers,
+one `bulk_create` of Receipts and one UPDATE of the touched invoices' balances. Matching:
+
+1. `transaction_reference` already recorded on a Payment -> the row is a duplicate.
+2. `invoice_number` (or an account reference equal to an invoice number) -> that invoice.
+3. Account reference that is a unit name, or starts with one followed by a delimiter
+   ("A12 0712…", "A12-Jane"), on a property whose BillingConfig sets an
+   `mpesa_account_label` (tenants pay with the unit code as the account) -> the oldest
+   open invoice of that unit. Unit names repeat across properties, so the row's `property`
+   (id) narrows the match; an account matching units on several properties, or several
+   units, is reported unmatched rather than guessed.
+
+The label is free display text telling tenants what to enter ("Unit code + phone"), not a
+pattern, so it is never compared with the row's account: a non-empty label only opts the
+property into unit-code matching.
+"""
+import csv
+import io
+import json
+import re
+import uuid
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .financial_rollup import paid_at_month, refresh_monthly_financials
+from .models import Invoice, Payment, PropertyBillingNotificationSettings, Receipt, completed_payments_total
+from .receipt_search import build_search_document
+from .receipt_stats import invalidate_receipt_stats
+from .utils import allocate_receipt_numbers
+
+MAX_ROWS = 5000
+DEFAULT_CHUNK_SIZE = 200
+OPEN_STATUSES = ('pending', 'partial', 'overdue')
+
+ROW_CREATED = 'created'
+ROW_DUPLICATE = 'duplicate'
+ROW_UNMATCHED = 'unmatched'
+ROW_ERROR = 'error'
+ROW_MATCHED = 'matched'  # dry run: would be created
+ROW_STATUSES = (ROW_CREATED, ROW_MATCHED, ROW_DUPLICATE, ROW_UNMATCHED, ROW_ERROR)
+
+# Statement column headers (lower-cased) accepted for each field.
+COLUMN_ALIASES = {
+    'transaction_reference': ('transaction_reference', 'reference', 'receipt no.', 'receipt_no', 'transaction_id'),
+    'amount': ('amount', 'paid in', 'paid_in', 'credit'),
+    'paid_at': ('paid_at', 'date', 'completion time', 'completion_time', 'value_date'),
+    'invoice_number': ('invoice_number', 'invoice'),
+    'account': ('account', 'account_reference', 'account no.', 'bill_ref_number'),
+    'property': ('property', 'property_id'),
+}
+
+
+class StatementError(ValueError):
+    """The statement as a whole cannot be read (bad format, no rows, too many rows)."""
+
+
+def _canonical_row(raw):
+    lowered = {str(k).strip().lower(): v for k, v in raw.items() if k is not None}
+    row = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value not in (None, ''):
+                row[field] = str(value).strip()
+                break
+    return row
+
+
+def parse_statement(upload=None, rows=None):
+    """
+    Canonical row dicts from an uploaded .csv / .json file or an already-decoded JSON list.
+    Raises StatementError when the statement cannot be read.
+    """
+    if upload is not None:
+        try:
+            text = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise StatementError('Statement must be UTF-8 encoded.')
+        if upload.name.lower().endswith('.json'):
+            try:
+                rows = json.loads(text)
+            except ValueError:
+                raise StatementError('Statement is not valid JSON.')
+        else:
+            rows = list(csv.DictReader(io.StringIO(text)))
+    if isinstance(rows, dict):
+        rows = rows.get('rows')
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise StatementError('Provide a CSV/JSON file or a JSON list of rows.')
+    if not rows:
+        raise StatementError('Statement has no rows.')
+    if len(rows) > MAX_ROWS:
+        raise StatementError(f'Statement has more than {MAX_ROWS} rows; split it.')
+    return [_canonical_row(r) for r in rows]
+
+
+def _parse_amount(value):
+    """Positive amount rounded to cents, or None (also for NaN, Infinity and out-of-range exponents)."""
+    try:
+        amount = Decimal(value.replace(',', ''))
+        if not amount.is_finite() or amount <= 0:
+            return None
+        return amount.quantize(Decimal('0.01'))
+    except (AttributeError, InvalidOperation):
+        return None
+
+
+def _parse_paid_at(value):
+    if not value:
+        return timezone.now()
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.combine(day, time(12, 0))
+    except ValueError:
+        # Well-formed but impossible, e.g. 2024-02-30 or 2024-13-01.
+        return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _unit_code(name):
+    """Unit name without punctuation or spaces, upper-cased: 'Unit 1-A' -> 'UNIT1A'."""
+    return re.sub(r'[^0-9A-Z]', '', name.upper())
+
+
+def _account_prefixes(account):
+    """
+    The unit codes an account reference can name: its leading delimiter-bounded words joined,
+    so 'A-1 0712' gives 'A', 'A1', 'A10712' and never the bare prefix 'A1' of 'A12'.
+    """
+    words = [w for w in re.split(r'[^0-9A-Z]+', account.upper()) if w]
+    return {''.join(words[:n]) for n in range(1, len(words) + 1)}
+
+
+class _Matcher:
+    """Invoice lookups for one statement, loaded with a fixed number of queries up front."""
+
+    def __init__(self, invoices, rows):
+        references = {r['transaction_reference'] for r in rows if r.get('transaction_reference')}
+        self.recorded_references = set(
+            Payment.objects.filter(transaction_reference__in=references).values_list('transaction_reference', flat=True)
+        )
+        numbers = {r.get('invoice_number') or r.get('account') for r in rows} - {None}
+        related = invoices.select_related('lease__unit__property', 'lease__tenant')
+        self.by_number = {inv.invoice_number: inv for inv in related.filter(invoice_number__in=numbers)}
+
+        # Unit-code accounts: open invoices of units on properties that take M-Pesa account labels,
+        # keyed by (property id, unit code) since unit names repeat across properties.
+        self.by_unit = defaultdict(list)
+        labelled = related.filter(status__in=OPEN_STATUSES).exclude(
+            lease__unit__property__billing_config__mpesa_account_label='',
+        ).filter(lease__unit__property__billing_config__isnull=False)
+        if any(r.get('account') for r in rows):
+            for inv in labelled.order_by('due_date', 'pk'):
+                code = _unit_code(inv.lease.unit.name)
+                if code:
+                    self.by_unit[(inv.lease.unit.property_id, code)].append(inv)
+
+    def candidates(self, row):
+        """
+        (invoices the row may pay in preference order, detail when there are none). A unit's
+        open invoices come oldest first.
+        """
+        number = row.get('invoice_number')
+        if number:
+            return ([self.by_number[number]], '') if number in self.by_number else ([], '')
+        account = row.get('account')
+        if not account:
+            return [], ''
+        if account in self.by_number:
+            return [self.by_number[account]], ''
+        property_id = row.get('property')
+        prefixes = _account_prefixes(account)
+        keys = [
+            key for key in self.by_unit
+            if key[1] in prefixes and (not property_id or str(key[0]) == property_id)
+        ]
+        if len(keys) > 1:
+            if len({key[0] for key in keys}) > 1:
+                return [], 'Account matches units on several properties; add a property column.'
+            return [], 'Account matches several units.'
+        return (self.by_unit[keys[0]], '') if keys else ([], '')
+
+
+def _result(index, row, status, detail='', invoice=None):
+    return {
+        'row': index,
+        'transaction_reference': row.get('transaction_reference', ''),
+        'status': status,
+        'invoice': invoice.pk if invoice else None,
+        'invoice_number': invoice.invoice_number if invoice else None,
+        'payment': None,
+        'receipt_number': None,
+        'detail': detail,
+    }
+
+
+def plan_import(invoices, rows, payment_method):
+    """
+    Match and validate every row against the `invoices` the caller may pay into.
+    Returns (results, planned): one result per row, and (result, invoice, amount, paid_at,
+    payment_method) for each row to create. Running balances stop several rows overpaying one invoice.
+    """
+    matcher = _Matcher(invoices, rows)
+    remaining = {}
+    seen_references = set()
+    results, planned = [], []
+    for index, row in enumerate(rows, start=1):
+        reference = row.get('transaction_reference')
+        if not reference:
+            results.append(_result(index, row, ROW_ERROR, 'transaction_reference is required.'))
+            continue
+        if reference in matcher.recorded_references or reference in seen_references:
+            results.append(_result(index, row, ROW_DUPLICATE, 'A payment with this reference is already recorded.'))
+            continue
+        amount = _parse_amount(row.get('amount'))
+        if amount is None:
+            results.append(_result(index, row, ROW_ERROR, 'amount must be a positive number.'))
+            continue
+        paid_at = _parse_paid_at(row.get('paid_at'))
+        if paid_at is None:
+            results.append(_result(index, row, ROW_ERROR, 'paid_at must be an ISO date or datetime.'))
+            continue
+        candidates, detail = matcher.candidates(row)
+        if not candidates:
+            results.append(_result(index, row, ROW_UNMATCHED, detail or 'No invoice matches this row.'))
+            continue
+        # Earlier rows may already have settled a unit's oldest invoice; move on to the next one.
+        invoice = next(
+            (inv for inv in candidates if remaining.get(inv.pk, inv.balance_due) > 0), candidates[-1],
+        )
+        if invoice.status == 'cancelled':
+            results.append(_result(index, row, ROW_ERROR, 'Invoice is cancelled.', invoice))
+            continue
+        balance = remaining.setdefault(invoice.pk, invoice.balance_due)
+        if amount > balance:
+            results.append(_result(index, row, ROW_ERROR, f'Amount exceeds remaining balance ({balance}).', invoice))
+            continue
+        remaining[invoice.pk] = balance - amount
+        seen_references.add(reference)
+        result = _result(index, row, ROW_MATCHED, invoice=invoice)
+        results.append(result)
+        planned.append((result, invoice, amount, paid_at, payment_method))
+    return results, planned
+
+
+def _write_chunk(chunk):
+    """Create the chunk's payments and receipts and settle its invoices in one transaction."""
+    with transaction.atomic():
+        payments = Payment.objects.bulk_create([
+            Payment(
+                invoice=invoice,
+                amount=amount,
+                stripe_payment_intent_id=f'import-{uuid.uuid4().hex}',
+                payment_method=method,
+                transaction_reference=result['transaction_reference'],
+                status='completed',
+                paid_at=paid_at,
+            )
+            for result, invoice, amount, paid_at, method in chunk
+        ])
+        numbers = allocate_receipt_numbers(len(payments))
+        receipts = []
+        for payment, number, (result, invoice, *_rest) in zip(payments, numbers, chunk):
+            tenant = invoice.lease.tenant
+            receipts.append(Receipt(
+                payment=payment,
+                receipt_number=number,
+                # bulk_create skips the pre_save signal that normally builds this.
+                search_document=build_search_document(
+                    number, invoice.invoice_number, invoice.lease.unit.name,
+                    tenant.first_name, tenant.last_name, tenant.email, payment.transaction_reference,
+                ),
+            ))
+        Receipt.objects.bulk_create(receipts)
+
+        invoice_ids = {invoice.pk for _, invoice, *_rest in chunk}
+        touched = Invoice.objects.filter(pk__in=invoice_ids)
+        touched.update(
+            amount_paid=completed_payments_total(),
+            balance_due=F('total_amount') - completed_payments_total(),
+        )
+        touched.exclude(status='cancelled').filter(amount_paid__gte=F('total_amount')).update(status='paid')
+        touched.exclude(status__in=('cancelled', 'paid')).filter(amount_paid__gt=0).update(status='partial')
+
+        # Bulk writes skip model signals: refresh the rollup and receipt stats here.
+        keys = set()
+        for _, invoice, _amount, paid_at, _method in chunk:
+            property_id = invoice.lease.unit.property_id
+            keys |= {(property_id, invoice.period_start), (property_id, paid_at_month(paid_at))}
+        transaction.on_commit(lambda: refresh_monthly_financials(keys))
+        transaction.on_commit(invalidate_receipt_stats)
+
+    for payment, receipt, (result, *_rest) in zip(payments, receipts, chunk):
+        result.update(status=ROW_CREATED, payment=payment.pk, receipt_number=receipt.receipt_number)
+    return receipts
+
+
+def _notify_tenants(chunk, receipts):
+    from notifications.models import Notification
+    from notifications.utils import save_notifications
+
+    muted = set(
+        PropertyBillingNotificationSettings.objects.filter(
+            property_id__in={invoice.lease.unit.property_id for _, invoice, *_rest in chunk},
+            send_receipt_on_payment=False,
+        ).values_list('property_id', flat=True)
+    )
+    notifications = []
+    for (result, invoice, amount, *_rest), receipt in zip(chunk, receipts):
+        if invoice.lease.unit.property_id in muted:
+            continue
+        tenant = invoice.lease.tenant
+        notifications.append(Notification(
+            user=tenant,
+            notification_type='payment',
+            title='Payment received',
+            body=(
+                f'Hi {tenant.first_name or tenant.username},\n\n'
+                f'We recorded a payment of KES {amount} toward invoice #{invoice.id}.\n'
+                f'Receipt: {receipt.receipt_number}\n\n'
+                f'Tree House'
+            ),
+            action_url='',
+        ))
+    save_notifications(notifications, email_pref_key='payment_receipt_sent')
+
+
+def import_payments(invoices, rows, *, payment_method, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import canonical statement `rows` against the `invoices` queryset the caller may pay into.
+    Returns {'summary': {status: count, 'total': n}, 'rows': [per-row result]}.
+    """
+    results, planned = plan_import(invoices, rows, payment_method)
+    if not dry_run:
+        for start in range(0, len(planned), chunk_size):
+            chunk = planned[start:start + chunk_size]
+            try:
+                receipts = _write_chunk(chunk)
+            except IntegrityError:
+                for result, *_rest in chunk:
+                    result.update(status=ROW_ERROR, detail='Could not record this chunk; import it again.')
+                continue
+            _notify_tenants(chunk, receipts)
+
+    summary = {status: 0 for status in ROW_STATUSES}
+    for result in results:
+        summary[result['status']] += 1
+    summary['total'] = len(results)
+    return {'summary': summary, 'rows': results}
@@ -0,0 +1,15 @@
+"""Aggregations for GET /api/billing/reports/portfolio/."""
+from property.occupancy import OccupancyTimeline
+from .financial_rollup import aggregate_financials, month_periods, next_month
+
+
+def build_portfolio_figures(property_ids, months):
+    """
+    Figures for every property in `property_ids` over the consecutive `months`:
+    ({property_id: unsaved PropertyMonthlyFinancials}, {property_id: [(occupied, total), ...]}).
+    Money and invoice counts come from one grouped query per source table and occupancy
+    from one load of the lease intervals, however many properties and months there are.
+    """
+    figures = aggregate_financials(property_ids, months[0], next_month(months[-1]))
+    occupancy = OccupancyTimeline(property_ids).by_property(month_periods(months))
+    return figures, occupancy
@@ -1,9 +1,11 @@
 from datetime import datetime
 
-from django.db.models import Q, Value, CharField, DateTimeField
-from django.db.models.functions import Coalesce, Concat, Trim
+from django.db.models import DateTimeField
+from django.db.models.functions import Coalesce
 from django.utils import timezone as dj_timezone
 
+from .receipt_search import normalize_search_term
+
 
 def validate_receipt_list_query_params(query_params, allowed_payment_methods):
     """
@@ -107,30 +109,5 @@ def apply_receipt_list_filters(qs, parsed):
             ),
         ).filter(_receipt_month_anchor__gte=start, _receipt_month_anchor__lt=end)
     if 'search' in parsed:
-        term = parsed['search']
-        qs = qs.annotate(
-            _receipt_tenant_full=Trim(
-                Concat(
-                    Coalesce(
-                        'payment__invoice__lease__tenant__first_name',
-                        Value(''),
-                        output_field=CharField(),
-                    ),
-                    Value(' '),
-                    Coalesce(
-                        'payment__invoice__lease__tenant__last_name',
-                        Value(''),
-                        output_field=CharField(),
-                    ),
-                    output_field=CharField(),
-                ),
-            ),
-        ).filter(
-            Q(receipt_number__icontains=term)
-            | Q(payment__invoice__invoice_number__icontains=term)
-            | Q(payment__invoice__lease__unit__name__icontains=term)
-            | Q(payment__invoice__lease__tenant__email__icontains=term)
-            | Q(payment__transaction_reference__icontains=term)
-            | Q(_receipt_tenant_full__icontains=term)
-        )
+        qs = qs.filter(search_document__contains=normalize_search_term(parsed['search']))
     return qs
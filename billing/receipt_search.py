@@ -0,0 +1,57 @@
+"""
+Denormalized receipt search document.
+
+`Receipt.search_document` holds the lower-cased searchable text of a receipt (receipt and
+invoice numbers, unit name, tenant name and email, transaction reference), one field per
+line so a term never matches across two fields. The receipt list `search` filter is a single
+`LIKE '%term%'` on that column, served on PostgreSQL by a pg_trgm GIN index
+(migration 0009) instead of a join across payments, invoices, leases, units and users.
+
+`billing.signals` rebuilds the documents of affected receipts when a payment, invoice,
+lease, unit or tenant that feeds them is saved. `QuerySet.update()` sends no signals, so
+call `refresh_search_documents` after bulk updates of those fields.
+"""
+from .models import Payment, Receipt
+
+# Related values the document is built from, in document order.
+SEARCH_SOURCE_FIELDS = (
+    'payment__invoice__invoice_number',
+    'payment__invoice__lease__unit__name',
+    'payment__invoice__lease__tenant__first_name',
+    'payment__invoice__lease__tenant__last_name',
+    'payment__invoice__lease__tenant__email',
+    'payment__transaction_reference',
+)
+
+
+def build_search_document(receipt_number, invoice_number, unit_name, first_name, last_name, email, reference):
+    tenant_name = f'{first_name or ""} {last_name or ""}'.strip()
+    parts = (receipt_number, invoice_number, unit_name, tenant_name, email, reference)
+    return '\n'.join((part or '').strip() for part in parts).lower()
+
+
+def normalize_search_term(term):
+    """The stored document is lower-cased, so a case-sensitive `contains` stays index-friendly."""
+    return term.strip().lower()
+
+
+def search_document_for(receipt):
+    """Document for an unsaved or saved receipt, read with one query through its payment."""
+    values = (
+        Payment.objects.filter(pk=receipt.payment_id)
+        .values_list(*(field.removeprefix('payment__') for field in SEARCH_SOURCE_FIELDS))
+        .first()
+    ) or (None,) * len(SEARCH_SOURCE_FIELDS)
+    return build_search_document(receipt.receipt_number, *values)
+
+
+def refresh_search_documents(receipts):
+    """Rebuild the documents of every receipt in the `receipts` queryset; returns how many changed."""
+    stale = []
+    rows = receipts.values_list('pk', 'receipt_number', 'search_document', *SEARCH_SOURCE_FIELDS)
+    for pk, receipt_number, current, *values in rows.iterator():
+        document = build_search_document(receipt_number, *values)
+        if document != current:
+            stale.append(Receipt(pk=pk, search_document=document))
+    Receipt.objects.bulk_update(stale, ['search_document'], batch_size=500)
+    return len(stale)
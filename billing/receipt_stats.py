@@ -1,12 +1,17 @@
 """Aggregations for GET /api/billing/receipts/stats/."""
+import uuid
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 
-from django.db.models import Count, Sum, Avg, DateTimeField
-from django.db.models.functions import Coalesce
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
 
-from .models import Payment, Receipt
+from .models import Payment
+
+# Stats are cached per user and filter set for this long; any new Receipt invalidates them.
+STATS_CACHE_SECONDS = 60
+_STATS_VERSION_KEY = 'billing:receipt-stats:version'
 
 
 def _quantize_money(value):
@@ -19,60 +24,82 @@ def _quantize_pct(value):
     return float(d.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
 
 
+def _current_month_bounds():
+    now = timezone.now()
+    y, mo = now.year, now.month
+    start = timezone.make_aware(datetime(y, mo, 1))
+    if mo == 12:
+        end = timezone.make_aware(datetime(y + 1, 1, 1))
+    else:
+        end = timezone.make_aware(datetime(y, mo + 1, 1))
+    return start, end
+
+
 def build_receipt_stats_payload(filtered_receipts_qs):
     """
     `filtered_receipts_qs` is a Receipt queryset after role scope + optional property/month filters.
     `this_month_*` uses the active timezone’s current calendar month on Coalesce(paid_at, issued_at).
+    Everything comes from one aggregate query with conditional (`filter=`) aggregates.
     """
     method_keys = [c[0] for c in Payment.PAYMENT_METHOD_CHOICES]
-    zero_breakdown = {k: 0.0 for k in method_keys}
+    start, end = _current_month_bounds()
+    this_month = (
+        Q(payment__paid_at__gte=start, payment__paid_at__lt=end)
+        | Q(payment__paid_at__isnull=True, issued_at__gte=start, issued_at__lt=end)
+    )
 
-    total_count = filtered_receipts_qs.count()
+    agg = filtered_receipts_qs.aggregate(
+        total_count=Count('pk'),
+        avg_amt=Avg('payment__amount'),
+        this_month_count=Count('pk', filter=this_month),
+        this_month_sum=Sum('payment__amount', filter=this_month),
+        **{
+            f'method_{m}': Count('pk', filter=Q(payment__payment_method=m))
+            for m in method_keys
+        },
+    )
+
+    total_count = agg['total_count']
     if total_count == 0:
         return {
             'total_count': 0,
             'this_month_count': 0,
             'this_month_total': '0.00',
-            'method_breakdown': zero_breakdown.copy(),
+            'method_breakdown': {k: 0.0 for k in method_keys},
             'average_amount': '0.00',
         }
 
-    agg = filtered_receipts_qs.aggregate(
-        sum_amt=Sum('payment__amount'),
-        avg_amt=Avg('payment__amount'),
-    )
-    average_amount = _quantize_money(agg['avg_amt'])
+    method_breakdown = {
+        m: _quantize_pct(Decimal(agg[f'method_{m}']) * Decimal('100') / Decimal(total_count))
+        for m in method_keys
+    }
+    return {
+        'total_count': total_count,
+        'this_month_count': agg['this_month_count'],
+        'this_month_total': _quantize_money(agg['this_month_sum']),
+        'method_breakdown': method_breakdown,
+        'average_amount': _quantize_money(agg['avg_amt']),
+    }
 
-    method_rows = filtered_receipts_qs.values('payment__payment_method').annotate(c=Count('id'))
-    breakdown = {k: Decimal('0') for k in method_keys}
-    for row in method_rows:
-        m = row['payment__payment_method']
-        if m in breakdown:
-            breakdown[m] = Decimal(row['c']) * Decimal('100') / Decimal(total_count)
-    method_breakdown = {k: _quantize_pct(breakdown[k]) for k in method_keys}
 
-    now = timezone.now()
-    y, mo = now.year, now.month
-    start = timezone.make_aware(datetime(y, mo, 1))
-    if mo == 12:
-        end = timezone.make_aware(datetime(y + 1, 1, 1))
-    else:
-        end = timezone.make_aware(datetime(y, mo + 1, 1))
+def _stats_cache_key(user, parsed):
+    version = cache.get_or_set(_STATS_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+    month = parsed.get('month')
+    filters = f"p{parsed.get('property_id', '')}:m{'%d-%02d' % month if month else ''}"
+    # The current month is part of the key so this_month_* never crosses a month boundary.
+    return f'billing:receipt-stats:{version}:{user.pk}:{filters}:{timezone.now():%Y-%m}'
 
-    this_month_qs = Receipt.objects.filter(
-        pk__in=filtered_receipts_qs.values('pk'),
-    ).annotate(
-        _eff=Coalesce('payment__paid_at', 'issued_at', output_field=DateTimeField()),
-    ).filter(_eff__gte=start, _eff__lt=end)
 
-    this_month_count = this_month_qs.count()
-    tm_agg = this_month_qs.aggregate(s=Sum('payment__amount'))
-    this_month_total = _quantize_money(tm_agg['s'])
+def cached_receipt_stats_payload(user, parsed, filtered_receipts_qs):
+    """`build_receipt_stats_payload` behind a short per-user cache keyed by the parsed filters."""
+    key = _stats_cache_key(user, parsed)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_receipt_stats_payload(filtered_receipts_qs)
+        cache.set(key, payload, STATS_CACHE_SECONDS)
+    return payload
 
-    return {
-        'total_count': total_count,
-        'this_month_count': this_month_count,
-        'this_month_total': this_month_total,
-        'method_breakdown': method_breakdown,
-        'average_amount': average_amount,
-    }
+
+def invalidate_receipt_stats():
+    """Drop every cached stats payload (a new version makes all existing keys unreachable)."""
+    cache.set(_STATS_VERSION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,179 @@
+"""Batched payment reminder pipeline for the `process_billing` command."""
+import operator
+import time
+from datetime import timedelta
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Invoice, PropertyBillingNotificationSettings, ReminderLog
+
+DEFAULT_BATCH_SIZE = 1000
+
+# No settings row → legacy 3-day pre-due reminder. A row with null remind_before_due_days disables it.
+LEGACY_PRE_DUE_DAYS = 3
+
+_SETTINGS = 'lease__unit__property__billing_notification_settings'
+
+
+def _unreminded(reminder_type, **filters):
+    return (
+        Invoice.objects.filter(**filters)
+        .exclude(reminders__reminder_type=reminder_type)
+        .select_related('lease__tenant')
+    )
+
+
+def pre_due_candidates(today):
+    """Pending/partial invoices due exactly `remind_before_due_days` (per property) from today."""
+    offsets = set(
+        PropertyBillingNotificationSettings.objects.filter(remind_before_due_days__isnull=False)
+        .values_list('remind_before_due_days', flat=True)
+        .distinct()
+    )
+    offsets.add(LEGACY_PRE_DUE_DAYS)
+    match = reduce(operator.or_, (
+        Q(_pre_due_offset=n, due_date=today + timedelta(days=n)) for n in sorted(offsets)
+    ))
+    return _unreminded('pre_due', status__in=['pending', 'partial']).annotate(
+        _pre_due_offset=Case(
+            When(**{f'{_SETTINGS}__isnull': True}, then=Value(LEGACY_PRE_DUE_DAYS)),
+            default=F(f'{_SETTINGS}__remind_before_due_days'),
+            output_field=IntegerField(),
+        ),
+    ).filter(match)
+
+
+def due_date_candidates(today):
+    return _unreminded('due_date', status__in=['pending', 'partial'], due_date=today)
+
+
+def overdue_candidates(today):
+    """Overdue invoices at least `remind_after_overdue_days` (per property, null → 0) past due."""
+    delays = set(
+        PropertyBillingNotificationSettings.objects.filter(remind_after_overdue_days__isnull=False)
+        .values_list('remind_after_overdue_days', flat=True)
+        .distinct()
+    )
+    delays.add(0)
+    match = reduce(operator.or_, (
+        Q(_overdue_delay=n, due_date__lte=today - timedelta(days=n)) for n in sorted(delays)
+    ))
+    return _unreminded('overdue', status='overdue').annotate(
+        _overdue_delay=Coalesce(F(f'{_SETTINGS}__remind_after_overdue_days'), Value(0)),
+    ).filter(match)
+
+
+def _greeting(tenant):
+    return f'Hi {tenant.first_name or tenant.username},\n\n'
+
+
+def pre_due_message(invoice, today):
+    n = (invoice.due_date - today).days
+    tenant = invoice.lease.tenant
+    return (
+        f'Rent due in {n} day{"s" if n != 1 else ""}',
+        _greeting(tenant)
+        + f'This is a reminder that your rent of KES {invoice.total_amount} '
+        f'is due on {invoice.due_date}.\n\n'
+        f'Invoice #{invoice.id} | Period: {invoice.period_start} – {invoice.period_end}\n\n'
+        f'Please ensure payment is made on time to avoid late fees.\n\n'
+        f'Tree House',
+    )
+
+
+def due_date_message(invoice, today):
+    tenant = invoice.lease.tenant
+    return (
+        'Rent is due today',
+        _greeting(tenant)
+        + f'Your rent of KES {invoice.total_amount} is due today ({invoice.due_date}).\n\n'
+        f'Invoice #{invoice.id} | Period: {invoice.period_start} – {invoice.period_end}\n\n'
+        f'Please make payment today to avoid late fees.\n\n'
+        f'Tree House',
+    )
+
+
+def overdue_message(invoice, today):
+    tenant = invoice.lease.tenant
+    return (
+        'Rent overdue — late fee applied',
+        _greeting(tenant)
+        + f'Your rent for the period {invoice.period_start} – {invoice.period_end} is overdue.\n\n'
+        f'Rent:      KES {invoice.rent_amount}\n'
+        f'Late fee:  KES {invoice.late_fee_amount}\n'
+        f'Total due: KES {invoice.total_amount}\n\n'
+        f'Please make payment immediately to avoid further charges.\n\n'
+        f'Tree House',
+    )
+
+
+REMINDER_STAGES = [
+    ('pre_due', pre_due_candidates, pre_due_message),
+    ('due_date', due_date_candidates, due_date_message),
+    ('overdue', overdue_candidates, overdue_message),
+]
+
+
+def send_reminders(today, *, properties=None, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    """
+    Send every pre-due, due-date and overdue reminder that is due today.
+
+    Candidates are selected in SQL (including per-property offsets) and read in keyset
+    batches; each batch becomes one `bulk_create` of ReminderLog rows plus one
+    `save_notifications` call (one Notification INSERT, one preference query and one
+    outbox INSERT) in the same transaction. Batch rows are locked with `SKIP LOCKED`, so overlapping runs never
+    remind the same invoice twice. `properties` optionally restricts the run to a Property
+    queryset (one shard). `on_batch(stats, invoices)` is called after every batch with
+    `reminder_type`, `sent` and `seconds`. Returns {reminder_type: sent}.
+    """
+    from notifications.models import Notification
+    from notifications.utils import save_notifications
+
+    sent = {}
+    for reminder_type, candidates_for, message_for in REMINDER_STAGES:
+        sent[reminder_type] = 0
+        candidates = candidates_for(today).order_by('pk')
+        if properties is not None:
+            candidates = candidates.filter(lease__unit__property__in=properties)
+        last_pk = 0
+        while True:
+            started = time.monotonic()
+            with transaction.atomic():
+                invoices = list(
+                    candidates.filter(pk__gt=last_pk)
+                    .select_for_update(skip_locked=True, of=('self',))[:batch_size]
+                )
+                if not invoices:
+                    break
+                last_pk = invoices[-1].pk
+
+                notifications = []
+                for invoice in invoices:
+                    title, body = message_for(invoice, today)
+                    notifications.append(Notification(
+                        user=invoice.lease.tenant,
+                        notification_type='payment_reminder',
+                        title=title,
+                        body=body,
+                        action_url='',
+                    ))
+                ReminderLog.objects.bulk_create(
+                    [ReminderLog(invoice=invoice, reminder_type=reminder_type) for invoice in invoices],
+                    ignore_conflicts=True,
+                )
+                save_notifications(notifications)
+
+            sent[reminder_type] += len(invoices)
+            if on_batch is not None:
+                on_batch(
+                    {
+                        'reminder_type': reminder_type,
+                        'sent': len(invoices),
+                        'seconds': time.monotonic() - started,
+                    },
+                    invoices,
+                )
+    return sent
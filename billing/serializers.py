@@ -104,17 +104,13 @@ class BillingConfigSerializer(serializers.ModelSerializer):
 
 
 class InvoiceSerializer(serializers.ModelSerializer):
-    amount_paid = serializers.SerializerMethodField()
-
     class Meta:
         model = Invoice
         fields = ['id', 'invoice_number', 'lease', 'period_start', 'period_end', 'due_date',
                   'rent_amount', 'late_fee_amount', 'total_amount', 'status',
-                  'amount_paid', 'created_at']
-        read_only_fields = ['invoice_number', 'rent_amount', 'late_fee_amount', 'total_amount', 'status', 'created_at']
-
-    def get_amount_paid(self, obj):
-        return str(obj.amount_paid())
+                  'amount_paid', 'balance_due', 'created_at']
+        read_only_fields = ['invoice_number', 'rent_amount', 'late_fee_amount', 'total_amount', 'status',
+                            'amount_paid', 'balance_due', 'created_at']
 
 
 class InvoiceCreateSerializer(serializers.Serializer):
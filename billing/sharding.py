@@ -0,0 +1,76 @@
+"""Property-id sharding and run locks for the `process_billing` command."""
+import logging
+import zlib
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models.functions import Mod
+
+from property.models import Property
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(value):
+    """Parse `i/N` (0 <= i < N) into (i, N). Raises ValueError on bad input."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except (AttributeError, ValueError):
+        raise ValueError('shard must look like i/N, e.g. 0/4.')
+    if count < 1 or not (0 <= index < count):
+        raise ValueError('shard index must satisfy 0 <= i < N.')
+    return index, count
+
+
+def shard_label(shard):
+    return 'all' if shard is None else f'{shard[0]}/{shard[1]}'
+
+
+def shard_properties(shard):
+    """Properties in shard (i, N): property_id % N == i. None means every property."""
+    if shard is None:
+        return None
+    index, count = shard
+    return Property.objects.annotate(_shard=Mod('pk', count)).filter(_shard=index)
+
+
+def _lock_key(name):
+    # pg advisory locks take a signed bigint; crc32 is stable across processes and hosts.
+    return zlib.crc32(name.encode())
+
+
+@contextmanager
+def advisory_lock(name):
+    """
+    Session-level PostgreSQL advisory lock named `name`. Yields True when acquired and
+    False when another session holds it. Backends without advisory locks always yield True
+    (each stage is idempotent on its own, the lock only avoids duplicate work).
+
+    The lock belongs to the server session, so lock and unlock must reach the same backend:
+    run `process_billing` on a direct or session-mode connection, not through a
+    transaction-mode pooler (Supabase port 6543, PgBouncer `pool_mode=transaction`), where
+    consecutive statements may land on different backends. There the lock can stay held by
+    a pooled session, so the shard is skipped until that session closes. The stages use
+    short transactions on purpose (see `--late-fee-chunk-size`), so a transaction-scoped
+    `pg_try_advisory_xact_lock` around the whole run is not an option.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+
+    key = _lock_key(name)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+                released = cursor.fetchone()[0]
+            if not released:
+                logger.warning(
+                    'Advisory lock %r was not held by this session at release; is process_billing '
+                    'running through a transaction-mode connection pooler?', name,
+                )
@@ -0,0 +1,159 @@
+"""Keep derived billing data (financial rollup, cached receipt stats, receipt search documents) current."""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from property.models import Lease, Unit
+from .financial_rollup import paid_at_month, refresh_monthly_financials, refresh_occupancy
+from .models import AdditionalIncome, ChargeType, Expense, Invoice, Payment, Receipt
+from .receipt_search import refresh_search_documents, search_document_for
+from .receipt_stats import invalidate_receipt_stats
+
+
+def _invoice_keys(invoice):
+    property_id = Lease.objects.filter(pk=invoice.lease_id).values_list('unit__property_id', flat=True).first()
+    return {(property_id, invoice.period_start)}
+
+
+def _payment_keys(payment):
+    if payment.paid_at is None:
+        return set()
+    property_id = (
+        Invoice.objects.filter(pk=payment.invoice_id)
+        .values_list('lease__unit__property_id', flat=True).first()
+    )
+    return {(property_id, paid_at_month(payment.paid_at))}
+
+
+def _income_keys(entry):
+    property_id = Unit.objects.filter(pk=entry.unit_id).values_list('property_id', flat=True).first()
+    return {(property_id, entry.date)}
+
+
+def _expense_keys(expense):
+    return {(expense.property_id, expense.date)}
+
+
+_KEYS = {
+    Invoice: _invoice_keys,
+    Payment: _payment_keys,
+    AdditionalIncome: _income_keys,
+    Expense: _expense_keys,
+}
+
+
+def _refresh_on_commit(keys):
+    if keys:
+        transaction.on_commit(lambda: refresh_monthly_financials(keys))
+
+
+def _stash_previous_keys(sender, instance, **kwargs):
+    # An edit can move a row to another month (or property); refresh where it used to be too.
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._rollup_previous_keys = _KEYS[sender](previous) if previous else set()
+
+
+def _refresh_after_save(sender, instance, **kwargs):
+    keys = _KEYS[sender](instance) | getattr(instance, '_rollup_previous_keys', set())
+    _refresh_on_commit(keys)
+
+
+def _refresh_after_delete(sender, instance, **kwargs):
+    # pre_delete: parents removed by the same cascade are still readable here.
+    _refresh_on_commit(_KEYS[sender](instance))
+
+
+for _model in _KEYS:
+    pre_save.connect(_stash_previous_keys, sender=_model, dispatch_uid=f'rollup_pre_save_{_model.__name__}')
+    post_save.connect(_refresh_after_save, sender=_model, dispatch_uid=f'rollup_post_save_{_model.__name__}')
+    pre_delete.connect(_refresh_after_delete, sender=_model, dispatch_uid=f'rollup_pre_delete_{_model.__name__}')
+
+
+@receiver(post_save, sender=ChargeType, dispatch_uid='rollup_charge_type_renamed')
+def _charge_type_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    months = instance.income_entries.values_list('date', flat=True).distinct()
+    _refresh_on_commit({(instance.property_id, day) for day in months})
+
+
+@receiver(pre_save, sender=Lease, dispatch_uid='rollup_lease_pre_save')
+def _lease_pre_save(sender, instance, **kwargs):
+    instance._rollup_previous = Lease.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+
+def _refresh_lease_occupancy(leases):
+    """Refresh occupancy over the months spanned by `leases` (old and new versions of one lease)."""
+    spans = {}
+    for lease in leases:
+        property_id = Unit.objects.filter(pk=lease.unit_id).values_list('property_id', flat=True).first()
+        if property_id is None:
+            continue
+        start, end = spans.get(property_id, (lease.start_date, lease.end_date))
+        start = min(start, lease.start_date)
+        end = None if end is None or lease.end_date is None else max(end, lease.end_date)
+        spans[property_id] = (start, end)
+    for property_id, (start, end) in spans.items():
+        transaction.on_commit(lambda pid=property_id, s=start, e=end: refresh_occupancy(pid, s, e))
+
+
+@receiver(post_save, sender=Lease, dispatch_uid='rollup_lease_post_save')
+def _lease_saved(sender, instance, **kwargs):
+    _refresh_lease_occupancy([lease for lease in (getattr(instance, '_rollup_previous', None), instance) if lease])
+
+
+@receiver(post_delete, sender=Lease, dispatch_uid='rollup_lease_post_delete')
+def _lease_deleted(sender, instance, **kwargs):
+    _refresh_lease_occupancy([instance])
+
+
+@receiver([post_save, post_delete], sender=Unit, dispatch_uid='rollup_unit_changed')
+def _unit_changed(sender, instance, **kwargs):
+    # Unit counts are not dated, so every stored month of the property changes.
+    transaction.on_commit(lambda: refresh_occupancy(instance.property_id))
+
+
+@receiver(post_save, sender=Receipt, dispatch_uid='receipt_stats_invalidate_on_create')
+def _receipt_created(sender, instance, created, **kwargs):
+    if created:
+        invalidate_receipt_stats()
+
+
+@receiver(post_delete, sender=Receipt, dispatch_uid='receipt_stats_invalidate_on_delete')
+def _receipt_deleted(sender, instance, **kwargs):
+    invalidate_receipt_stats()
+
+
+@receiver(pre_save, sender=Receipt, dispatch_uid='receipt_search_document')
+def _receipt_search_document(sender, instance, **kwargs):
+    instance.search_document = search_document_for(instance)
+
+
+# Related rows whose fields appear in receipt search documents: (model, fields, receipt lookup).
+_SEARCH_SOURCES = (
+    (Payment, {'transaction_reference'}, 'payment'),
+    (Invoice, {'invoice_number', 'lease', 'lease_id'}, 'payment__invoice'),
+    # Re-letting a unit or correcting a lease's tenant changes the name and email on its receipts.
+    (Lease, {'tenant', 'tenant_id', 'unit', 'unit_id'}, 'payment__invoice__lease'),
+    (Unit, {'name'}, 'payment__invoice__lease__unit'),
+    (get_user_model(), {'first_name', 'last_name', 'email'}, 'payment__invoice__lease__tenant'),
+)
+
+
+def _make_search_source_handler(fields, lookup):
+    def handler(sender, instance, created, update_fields=None, **kwargs):
+        # New rows have no receipts yet; saves that touch only other columns (e.g. last_login) are skipped.
+        if created or (update_fields is not None and not fields & set(update_fields)):
+            return
+        refresh_search_documents(Receipt.objects.filter(**{lookup: instance.pk}))
+    return handler
+
+
+for _model, _fields, _lookup in _SEARCH_SOURCES:
+    post_save.connect(
+        _make_search_source_handler(_fields, _lookup),
+        sender=_model,
+        weak=False,
+        dispatch_uid=f'receipt_search_source_{_model.__name__}',
+    )
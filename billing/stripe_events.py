@@ -0,0 +1,148 @@
+"""
+Stripe webhook inbox.
+
+`stripe_webhook` only verifies the signature and stores the event in `StripeWebhookEvent`
+(unique on the Stripe event id, so redelivered events are dropped at insert) before
+answering 200. `process_stripe_events` drains the inbox in batches: each event is applied
+in its own transaction, failures are retried with exponential backoff, and events that keep
+failing are parked as `failed` for inspection.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, Receipt, StripeWebhookEvent
+from .utils import generate_receipt_number
+
+EVENT_PAYMENT_SUCCEEDED = 'payment_intent.succeeded'
+EVENT_PAYMENT_FAILED = 'payment_intent.payment_failed'
+HANDLED_EVENT_TYPES = (EVENT_PAYMENT_SUCCEEDED, EVENT_PAYMENT_FAILED)
+
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 6 * 60 * 60
+
+
+def enqueue_event(event):
+    """Store a verified Stripe event; returns False when it was already in the inbox."""
+    created_ts = event.get('created')
+    _, created = StripeWebhookEvent.objects.get_or_create(
+        event_id=event['id'],
+        defaults={
+            'event_type': event['type'],
+            'payload': event['data']['object'],
+            'stripe_created_at': (
+                datetime.fromtimestamp(created_ts, tz=dt_timezone.utc) if created_ts else None
+            ),
+        },
+    )
+    return created
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failure: 30s, 60s, 120s, ... capped at six hours."""
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def handle_payment_success(intent):
+    """Complete the payment and issue its receipt; returns the new Receipt, or None if nothing changed."""
+    payment = (
+        Payment.objects.select_for_update()
+        .select_related('invoice__lease__unit__property', 'invoice__lease__tenant')
+        .filter(stripe_payment_intent_id=intent['id']).first()
+    )
+    if payment is None:
+        return None
+
+    if payment.status != 'completed':
+        payment.status = 'completed'
+        payment.paid_at = timezone.now()
+        payment.stripe_charge_id = intent.get('latest_charge', '')
+        payment.save()
+        payment.invoice.update_status()
+
+    if Receipt.objects.filter(payment=payment).exists():
+        return None
+    from .views import _notify_tenant_payment_received
+
+    receipt = Receipt.objects.create(payment=payment, receipt_number=generate_receipt_number())
+    _notify_tenant_payment_received(payment.invoice, payment.amount, receipt.receipt_number)
+    return receipt
+
+
+def handle_payment_failure(intent):
+    Payment.objects.filter(stripe_payment_intent_id=intent['id']).exclude(status='completed').update(
+        status='failed',
+    )
+    return None
+
+
+HANDLERS = {
+    EVENT_PAYMENT_SUCCEEDED: handle_payment_success,
+    EVENT_PAYMENT_FAILED: handle_payment_failure,
+}
+
+
+def _apply(event_pk):
+    """
+    Process one inbox row in its own transaction. Returns (event, receipt or None), or None
+    when the row was skipped because another worker holds it or it is no longer pending.
+    """
+    with transaction.atomic():
+        event = (
+            StripeWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(pk=event_pk, status=StripeWebhookEvent.STATUS_PENDING).first()
+        )
+        if event is None:
+            return None  # another worker has it, or it was already processed
+        receipt = HANDLERS[event.event_type](event.payload)
+        event.status = StripeWebhookEvent.STATUS_PROCESSED
+        event.attempts += 1
+        event.processed_at = timezone.now()
+        event.last_error = ''
+        event.save(update_fields=['status', 'attempts', 'processed_at', 'last_error'])
+    return event, receipt
+
+
+def _record_failure(event_pk, exc, max_attempts):
+    event = StripeWebhookEvent.objects.get(pk=event_pk)
+    event.attempts += 1
+    event.last_error = f'{type(exc).__name__}: {exc}'[:2000]
+    if event.attempts >= max_attempts:
+        event.status = StripeWebhookEvent.STATUS_FAILED
+    else:
+        event.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(event.attempts))
+    event.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+    return event.status
+
+
+def process_pending_events(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Apply up to `batch_size` due inbox events, oldest first.
+
+    Returns a dict with `processed`, `retried`, `failed` counts and `lags`: seconds from
+    Stripe's event timestamp (or our receipt of it) to the receipt being issued, one per
+    receipt created in this batch.
+    """
+    due = list(
+        StripeWebhookEvent.objects.filter(
+            status=StripeWebhookEvent.STATUS_PENDING, next_attempt_at__lte=timezone.now(),
+        ).order_by('received_at', 'pk').values_list('pk', flat=True)[:batch_size]
+    )
+    stats = {'processed': 0, 'retried': 0, 'failed': 0, 'lags': []}
+    for pk in due:
+        try:
+            result = _apply(pk)
+        except Exception as exc:
+            failed = _record_failure(pk, exc, max_attempts) == StripeWebhookEvent.STATUS_FAILED
+            stats['failed' if failed else 'retried'] += 1
+            continue
+        if result is None:
+            continue
+        stats['processed'] += 1
+        event, receipt = result
+        if receipt is not None:
+            origin = event.stripe_created_at or event.received_at
+            stats['lags'].append(max((receipt.issued_at - origin).total_seconds(), 0.0))
+    return stats
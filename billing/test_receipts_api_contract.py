@@ -5,6 +5,7 @@ from datetime import date, datetime
 from decimal import Decimal
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.db import connection
 from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
@@ -61,6 +62,7 @@ class ReceiptsApiContractTests(APITestCase):
     """Frontend contract for /api/billing/receipts/ and /api/billing/receipts/stats/."""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.landlord, self.landlord_token = contract_make_user('contract_ll', 'Landlord')
         self.tenant, self.tenant_token = contract_make_user('contract_tt', 'Tenant')
@@ -1,10 +1,15 @@
 import calendar
 from datetime import date, datetime, timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 from unittest.mock import patch, MagicMock
 
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.utils import timezone
+from django.test import TransactionTestCase
 from rest_framework.test import APITestCase
 from rest_framework.authtoken.models import Token
 from rest_framework import status
@@ -22,8 +27,11 @@ from billing.models import (
     AdditionalIncome,
     Expense,
     PropertyBillingNotificationSettings,
+    PropertyMonthlyFinancials,
+    StripeWebhookEvent,
 )
-from billing.utils import generate_receipt_number, generate_invoice_number
+from billing.utils import allocate_receipt_numbers, generate_receipt_number, generate_invoice_number
+from notifications.models import Notification
 from billing.serializers import ReceiptSerializer
 from billing.views import _receipt_base_queryset
 from billing.pagination import ReceiptListPagination
@@ -215,6 +223,80 @@ class InvoiceTests(APITestCase):
         response = self.client.get(reverse('invoice-list'))
         self.assertEqual(len(response.data), 0)
 
+    def _pay(self, invoice, amount, ref):
+        Payment.objects.create(
+            invoice=invoice, amount=Decimal(amount), stripe_payment_intent_id=ref,
+            status='completed', paid_at=timezone.now(),
+        )
+        invoice.update_status()
+
+    def test_invoice_list_query_count_is_constant(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._pay(self.invoice, '1000', 'pi_qc_0')
+        self.auth(self.tenant_token)
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(reverse('invoice-list'))
+        for month in range(1, 9):
+            inv = Invoice.objects.create(
+                lease=self.lease, period_start=date(2024, month, 1), period_end=date(2024, month, 28),
+                due_date=date(2024, month, 5), rent_amount=Decimal('45000'), total_amount=Decimal('45000'),
+            )
+            self._pay(inv, '500', f'pi_qc_{month}')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('invoice-list'))
+        self.assertEqual(len(response.data), 9)
+        self.assertEqual(len(many), len(one))
+        row = next(r for r in response.data if r['id'] == self.invoice.id)
+        self.assertEqual(row['amount_paid'], '1000.00')
+        self.assertEqual(row['balance_due'], '44000.00')
+
+    def test_reconcile_invoice_balances_fixes_drift(self):
+        from django.core.management import call_command
+
+        self._pay(self.invoice, '1000', 'pi_rc_1')
+        Payment.objects.create(
+            invoice=self.invoice, amount=Decimal('2000'), stripe_payment_intent_id='pi_rc_2',
+            status='completed', paid_at=timezone.now(),
+        )  # recorded without update_status(): the stored columns are now stale
+        self.assertEqual(Invoice.objects.with_balance_drift().count(), 1)
+
+        out = StringIO()
+        call_command('reconcile_invoice_balances', '--dry-run', stdout=out)
+        self.assertIn('Found 1 invoice', out.getvalue())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('1000.00'))
+
+        call_command('reconcile_invoice_balances', stdout=StringIO())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('3000.00'))
+        self.assertEqual(self.invoice.balance_due, self.invoice.total_amount - Decimal('3000.00'))
+        self.assertFalse(Invoice.objects.with_balance_drift().exists())
+
+    def test_invoice_cursor_pagination(self):
+        for month in (1, 2, 3, 4):
+            Invoice.objects.create(
+                lease=self.lease, period_start=date(2025, month, 1), period_end=date(2025, month, 28),
+                due_date=date(2025, month, 5), rent_amount=Decimal('45000'), total_amount=Decimal('45000'),
+            )
+        self.auth(self.landlord_token)
+        r = self.client.get(reverse('invoice-list'), {'cursor': '', 'page_size': 3})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(r.data['results']), 3)
+        self.assertNotIn('count', r.data)
+        r2 = self.client.get(reverse('invoice-list'), {'cursor': r.data['next_cursor'], 'page_size': 3})
+        self.assertEqual(len(r2.data['results']), 2)
+        self.assertIsNone(r2.data['next_cursor'])
+        ids = [row['id'] for row in r.data['results'] + r2.data['results']]
+        self.assertEqual(ids, list(Invoice.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_invoice_cursor_pagination_respects_scope(self):
+        self.auth(self.other_token)
+        r = self.client.get(reverse('invoice-list'), {'cursor': '', 'include_count': '1'})
+        self.assertEqual(r.data['count'], 0)
+        self.assertEqual(r.data['results'], [])
+
     def test_tenant_can_retrieve_own_invoice(self):
         self.auth(self.tenant_token)
         response = self.client.get(reverse('invoice-detail', args=[self.invoice.id]))
@@ -602,8 +684,8 @@ class ManualPaymentRecordTests(APITestCase):
         self.assertEqual(r1.status_code, status.HTTP_201_CREATED)
         self.invoice.refresh_from_db()
         self.assertEqual(self.invoice.status, 'partial')
-        remaining = self.invoice.total_amount - self.invoice.amount_paid()
-        self.assertEqual(remaining, Decimal('25000.00'))
+        self.assertEqual(self.invoice.amount_paid, Decimal('20000.00'))
+        self.assertEqual(self.invoice.balance_due, Decimal('25000.00'))
         r2 = self.client.post(
             reverse('invoice-payments', args=[self.invoice.id]),
             {'amount': '25000.00'},
@@ -733,6 +815,295 @@ class ReceiptNumberTests(APITestCase):
         self.assertEqual(seq2, seq1 + 1)
 
 
+    def test_block_allocation_is_consecutive(self):
+        block = allocate_receipt_numbers(5)
+        self.assertEqual(len(block), 5)
+        seqs = [int(n.split('-')[-1]) for n in block]
+        self.assertEqual(seqs, list(range(seqs[0], seqs[0] + 5)))
+        self.assertEqual(int(generate_receipt_number().split('-')[-1]), seqs[-1] + 1)
+
+    def test_counter_continues_after_existing_receipts(self):
+        landlord, _ = make_user('landlord_rn2', 'Landlord')
+        tenant, _ = make_user('tenant_rn2', 'Tenant')
+        invoice = make_invoice(make_lease(make_unit(make_property(landlord), landlord), tenant))
+        payment = Payment.objects.create(
+            invoice=invoice, amount=Decimal('45000'),
+            stripe_payment_intent_id='pi_seed', status='completed', paid_at=timezone.now(),
+        )
+        prefix = f"RCP-{timezone.now():%Y%m}-"
+        Receipt.objects.create(payment=payment, receipt_number=f'{prefix}0041')
+        self.assertEqual(generate_receipt_number(), f'{prefix}0042')
+
+    def test_allocation_does_not_scan_receipts(self):
+        generate_receipt_number()
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            generate_receipt_number()
+        self.assertFalse([q for q in ctx.captured_queries if 'billing_receipt"' in q['sql']])
+
+
+class ReceiptNumberConcurrencyTests(TransactionTestCase):
+    """Many threads allocating at once must never hand out the same number twice."""
+
+    def test_concurrent_allocations_are_unique_and_gapless(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connection
+
+        def worker(n):
+            try:
+                return [number for i in range(10) for number in allocate_receipt_numbers(1 + (n + i) % 3)]
+            finally:
+                connection.close()
+
+        generate_receipt_number()  # create the month's counter before the race
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = [number for batch in pool.map(worker, range(16)) for number in batch]
+
+        seqs = sorted(int(n.split('-')[-1]) for n in results)
+        self.assertEqual(len(seqs), len(set(seqs)))
+        self.assertEqual(seqs, list(range(2, 2 + len(seqs))))
+
+
+class StripeWebhookInboxTests(APITestCase):
+    def setUp(self):
+        self.landlord, _ = make_user('landlord_wh', 'Landlord')
+        self.tenant, _ = make_user('tenant_wh', 'Tenant')
+        self.invoice = make_invoice(make_lease(make_unit(make_property(self.landlord), self.landlord), self.tenant))
+        self.payment = Payment.objects.create(
+            invoice=self.invoice, amount=Decimal('45000'), stripe_payment_intent_id='pi_wh_1', status='pending',
+        )
+
+    def _event(self, event_id='evt_1', event_type='payment_intent.succeeded', intent_id='pi_wh_1'):
+        return {
+            'id': event_id,
+            'type': event_type,
+            'created': int(timezone.now().timestamp()) - 5,
+            'data': {'object': {'id': intent_id, 'latest_charge': 'ch_wh_1'}},
+        }
+
+    def _deliver(self, event):
+        with patch('billing.views.stripe.Webhook.construct_event', return_value=event):
+            return self.client.post(reverse('stripe-webhook'), data=b'{}', content_type='application/json')
+
+    def _run_worker(self, **options):
+        from django.core.management import call_command
+        call_command('process_stripe_events', verbosity=0, stdout=StringIO(), **options)
+
+    def test_webhook_only_queues_the_event(self):
+        response = self._deliver(self._event())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(StripeWebhookEvent.objects.get().status, StripeWebhookEvent.STATUS_PENDING)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertFalse(Receipt.objects.exists())
+
+    def test_redelivered_and_unhandled_events_are_not_queued_twice(self):
+        self._deliver(self._event())
+        self._deliver(self._event())
+        self._deliver(self._event(event_id='evt_other', event_type='charge.refunded'))
+        self.assertEqual(StripeWebhookEvent.objects.count(), 1)
+
+    def test_worker_completes_payment_and_records_lag(self):
+        from monitoring.models import SystemMetric
+
+        self._deliver(self._event())
+        # A second event for the same intent must not issue a second receipt.
+        self._deliver(self._event(event_id='evt_2'))
+        self._run_worker()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(self.payment.stripe_charge_id, 'ch_wh_1')
+        self.assertEqual(Receipt.objects.filter(payment=self.payment).count(), 1)
+        self.assertFalse(StripeWebhookEvent.objects.exclude(status=StripeWebhookEvent.STATUS_PROCESSED).exists())
+        lag = SystemMetric.objects.get(metric_type='stripe_event_lag_seconds')
+        self.assertGreaterEqual(lag.value, Decimal('5'))
+
+    def test_failures_back_off_then_park(self):
+        self._deliver(self._event())
+        with patch('billing.stripe_events.generate_receipt_number', side_effect=RuntimeError('boom')):
+            self._run_worker(max_attempts=2)
+            event = StripeWebhookEvent.objects.get()
+            self.assertEqual(event.status, StripeWebhookEvent.STATUS_PENDING)
+            self.assertEqual(event.attempts, 1)
+            self.assertIn('boom', event.last_error)
+            self.assertGreater(event.next_attempt_at, timezone.now())
+            # The transaction rolled back, so the payment is untouched.
+            self.payment.refresh_from_db()
+            self.assertEqual(self.payment.status, 'pending')
+
+            self._run_worker(max_attempts=2)  # not due yet
+            self.assertEqual(StripeWebhookEvent.objects.get().attempts, 1)
+
+            StripeWebhookEvent.objects.update(next_attempt_at=timezone.now())
+            self._run_worker(max_attempts=2)
+        event = StripeWebhookEvent.objects.get()
+        self.assertEqual(event.status, StripeWebhookEvent.STATUS_FAILED)
+        self.assertEqual(event.attempts, 2)
+
+
+class PaymentImportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.landlord, self.landlord_token = make_user('landlord_imp', 'Landlord')
+        self.tenant, self.tenant_token = make_user('tenant_imp', 'Tenant')
+        self.prop = make_property(self.landlord)
+        BillingConfig.objects.create(
+            property=self.prop, rent_due_day=5, late_fee_percentage=Decimal('5'),
+            mpesa_paybill='400200', mpesa_account_label='Unit code + phone',
+        )
+        self.unit = make_unit(self.prop, self.landlord)
+        self.unit.name = 'A12'
+        self.unit.save()
+        self.lease = make_lease(self.unit, self.tenant)
+        self.older = Invoice.objects.create(
+            lease=self.lease, period_start=date(2026, 1, 1), period_end=date(2026, 1, 31),
+            due_date=date(2026, 1, 5), rent_amount=Decimal('45000'), total_amount=Decimal('45000'),
+        )
+        self.newer = Invoice.objects.create(
+            lease=self.lease, period_start=date(2026, 2, 1), period_end=date(2026, 2, 28),
+            due_date=date(2026, 2, 5), rent_amount=Decimal('45000'), total_amount=Decimal('45000'),
+        )
+
+    def auth(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _import(self, rows, **extra):
+        return self.client.post(reverse('payment-import'), {'rows': rows, **extra}, format='json')
+
+    def test_imports_rows_and_reports_each_one(self):
+        Payment.objects.create(
+            invoice=self.older, amount=Decimal('1'), stripe_payment_intent_id='pi_imp_old',
+            transaction_reference='MP-DUP', status='completed', paid_at=timezone.now(),
+        )
+        self.older.update_status()
+        self.auth(self.landlord_token)
+        r = self._import([
+            {'transaction_reference': 'MP-1', 'amount': '44,999.00', 'account': 'a12 0712345678', 'paid_at': '2026-02-03'},
+            {'transaction_reference': 'MP-2', 'amount': '20000', 'account': 'A12'},
+            {'transaction_reference': 'MP-3', 'amount': '1000', 'invoice_number': self.newer.invoice_number},
+            {'transaction_reference': 'MP-DUP', 'amount': '10', 'account': 'A12'},
+            {'transaction_reference': 'MP-4', 'amount': '10', 'account': 'B99'},
+            {'transaction_reference': 'MP-5', 'amount': 'ten', 'account': 'A12'},
+        ])
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [row['status'] for row in r.data['rows']],
+            ['created', 'created', 'created', 'duplicate', 'unmatched', 'error'],
+        )
+        self.assertEqual(r.data['summary']['created'], 3)
+        # The first row settles the older invoice, so the next unit-code row moves to the newer one.
+        self.assertEqual(r.data['rows'][0]['invoice'], self.older.pk)
+        self.assertEqual(r.data['rows'][1]['invoice'], self.newer.pk)
+
+        self.older.refresh_from_db()
+        self.newer.refresh_from_db()
+        self.assertEqual((self.older.status, self.older.balance_due), ('paid', Decimal('0.00')))
+        self.assertEqual((self.newer.status, self.newer.amount_paid), ('partial', Decimal('21000.00')))
+        receipt = Receipt.objects.get(payment__transaction_reference='MP-1')
+        self.assertEqual(receipt.receipt_number, r.data['rows'][0]['receipt_number'])
+        self.assertIn('mp-1', receipt.search_document)
+        self.assertEqual(Notification.objects.filter(user=self.tenant, notification_type='payment').count(), 3)
+
+    def test_rows_cannot_overpay_an_invoice(self):
+        self.auth(self.landlord_token)
+        r = self._import([
+            {'transaction_reference': 'OV-1', 'amount': '40000', 'invoice_number': self.older.invoice_number},
+            {'transaction_reference': 'OV-2', 'amount': '40000', 'invoice_number': self.older.invoice_number},
+        ])
+        self.assertEqual([row['status'] for row in r.data['rows']], ['created', 'error'])
+        self.assertIn('remaining balance (5000.00)', r.data['rows'][1]['detail'])
+
+    def test_unparseable_amounts_and_dates_are_row_errors(self):
+        self.auth(self.landlord_token)
+        amounts = ['NaN', 'sNaN', 'Infinity', '-Infinity', '1e999999999', '0', '-5']
+        dates = ['2024-02-30', '2024-13-01', '2024-02-30T10:00:00', 'yesterday']
+        rows = [
+            {'transaction_reference': f'BAD-A{i}', 'amount': amount, 'invoice_number': self.older.invoice_number}
+            for i, amount in enumerate(amounts)
+        ] + [
+            {'transaction_reference': f'BAD-D{i}', 'amount': '10', 'paid_at': paid_at,
+             'invoice_number': self.older.invoice_number}
+            for i, paid_at in enumerate(dates)
+        ]
+        r = self._import(rows)
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['status'] for row in r.data['rows']], ['error'] * len(rows))
+        self.assertEqual(r.data['rows'][0]['detail'], 'amount must be a positive number.')
+        self.assertEqual(r.data['rows'][-1]['detail'], 'paid_at must be an ISO date or datetime.')
+        self.assertFalse(Payment.objects.exists())
+
+    def test_csv_upload_dry_run_writes_nothing(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        statement = SimpleUploadedFile(
+            'statement.csv',
+            b'Receipt No.,Completion Time,Paid In,Account No.\nQX1,2026-02-03 10:15:00,"45,000.00",A12 0700\n',
+            content_type='text/csv',
+        )
+        self.auth(self.landlord_token)
+        r = self.client.post(reverse('payment-import'), {'file': statement, 'dry_run': 'true'})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.data['rows'][0]['status'], 'matched')
+        self.assertEqual(r.data['rows'][0]['invoice'], self.older.pk)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_other_landlords_invoices_are_not_matched(self):
+        other, other_token = make_user('landlord_imp2', 'Landlord')
+        self.auth(other_token)
+        r = self._import([{'transaction_reference': 'X-1', 'amount': '10', 'invoice_number': self.older.invoice_number}])
+        self.assertEqual(r.data['rows'][0]['status'], 'unmatched')
+
+    def test_unit_codes_match_only_whole_words(self):
+        short = make_unit(self.prop, self.landlord)
+        short.name = 'A1'
+        short.save()
+        short_invoice = Invoice.objects.create(
+            lease=make_lease(short, self.tenant), period_start=date(2026, 1, 1), period_end=date(2026, 1, 31),
+            due_date=date(2026, 1, 5), rent_amount=Decimal('100'), total_amount=Decimal('100'),
+        )
+        self.auth(self.landlord_token)
+        r = self._import([
+            {'transaction_reference': 'W-1', 'amount': '10', 'account': 'A12'},
+            {'transaction_reference': 'W-2', 'amount': '10', 'account': 'a1-0712345678'},
+            {'transaction_reference': 'W-3', 'amount': '10', 'account': 'A120712345678'},
+        ], dry_run='true')
+        self.assertEqual([row['invoice'] for row in r.data['rows']], [self.older.pk, short_invoice.pk, None])
+
+    def test_unit_name_on_two_properties_needs_the_property(self):
+        other_prop = make_property(self.landlord)
+        BillingConfig.objects.create(
+            property=other_prop, rent_due_day=5, late_fee_percentage=Decimal('5'), mpesa_account_label='Unit code',
+        )
+        other_unit = make_unit(other_prop, self.landlord)
+        other_unit.name = 'A12'
+        other_unit.save()
+        other_tenant, _ = make_user('tenant_imp_other', 'Tenant')
+        other_invoice = Invoice.objects.create(
+            lease=make_lease(other_unit, other_tenant), period_start=date(2026, 1, 1), period_end=date(2026, 1, 31),
+            due_date=date(2026, 1, 1), rent_amount=Decimal('100'), total_amount=Decimal('100'),
+        )
+        self.auth(self.landlord_token)
+        r = self._import([
+            {'transaction_reference': 'P-1', 'amount': '10', 'account': 'A12'},
+            {'transaction_reference': 'P-2', 'amount': '10', 'account': 'A12', 'property': str(other_prop.pk)},
+            {'transaction_reference': 'P-3', 'amount': '10', 'account': 'A12', 'property_id': self.prop.pk},
+        ])
+        self.assertEqual([row['status'] for row in r.data['rows']], ['unmatched', 'created', 'created'])
+        self.assertIn('several properties', r.data['rows'][0]['detail'])
+        self.assertEqual(r.data['rows'][1]['invoice'], other_invoice.pk)
+        self.assertEqual(r.data['rows'][2]['invoice'], self.older.pk)
+
+    def test_tenant_forbidden_and_bad_statement_rejected(self):
+        self.auth(self.tenant_token)
+        self.assertEqual(self._import([]).status_code, status.HTTP_403_FORBIDDEN)
+        self.auth(self.landlord_token)
+        self.assertEqual(self._import([]).status_code, status.HTTP_400_BAD_REQUEST)
+        r = self._import([{'transaction_reference': 'X', 'amount': '1'}], payment_method='barter')
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class ProcessBillingCommandTests(APITestCase):
     def setUp(self):
         self.landlord, _ = make_user('landlord_cmd', 'Landlord')
@@ -761,6 +1132,56 @@ class ProcessBillingCommandTests(APITestCase):
         call_command('process_billing', verbosity=0)
         self.assertEqual(Invoice.objects.filter(lease=self.lease).count(), 1)
 
+    def test_bulk_generation_numbers_every_new_invoice(self):
+        from django.core.management import call_command
+        for i in range(2, 5):
+            unit = Unit.objects.create(property=self.prop, name=f'Unit {i}', price='45000', created_by=self.landlord)
+            make_lease(unit, self.tenant)
+        call_command('process_billing', batch_size=2, verbosity=0)
+        invoices = Invoice.objects.filter(lease__unit__property=self.prop)
+        self.assertEqual(invoices.count(), 4)
+        for inv in invoices:
+            self.assertEqual(inv.invoice_number, generate_invoice_number(inv.pk))
+            self.assertEqual(inv.total_amount, Decimal('45000.00'))
+            self.assertEqual(inv.due_date, date.today() + timedelta(days=3))
+
+    def test_generation_skips_existing_invoice_and_keeps_its_number(self):
+        from django.core.management import call_command
+        existing = Invoice.objects.create(
+            lease=self.lease,
+            period_start=date.today().replace(day=1),
+            period_end=date.today(),
+            due_date=date.today(),
+            rent_amount=Decimal('100'),
+            late_fee_amount=Decimal('0'),
+            total_amount=Decimal('100'),
+        )
+        call_command('process_billing', verbosity=0)
+        self.assertEqual(Invoice.objects.filter(lease=self.lease).count(), 1)
+        existing.refresh_from_db()
+        self.assertEqual(existing.invoice_number, generate_invoice_number(existing.pk))
+        self.assertEqual(existing.rent_amount, Decimal('100'))
+
+    def test_generation_ignores_property_not_due_today(self):
+        from billing.invoice_generation import generate_due_invoices
+        today = date.today()
+        BillingConfig.objects.filter(property=self.prop).update(rent_due_day=(today.day % 28) + 1)
+        result = generate_due_invoices(today)
+        self.assertEqual(result['created'], 0)
+        self.assertFalse(Invoice.objects.filter(lease=self.lease).exists())
+
+    def test_generation_reports_batches(self):
+        from billing.invoice_generation import generate_due_invoices
+        unit = Unit.objects.create(property=self.prop, name='Unit 2', price='45000', created_by=self.landlord)
+        make_lease(unit, self.tenant)
+        seen = []
+        result = generate_due_invoices(
+            date.today(), batch_size=1, on_batch=lambda stats, rows: seen.append((stats, rows)),
+        )
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([stats['index'] for stats, _ in seen], [1, 2])
+        self.assertTrue(all(len(rows) == 1 for _, rows in seen))
+
     def test_late_fee_applied_to_overdue_invoice(self):
         from django.core.management import call_command
         overdue_invoice = Invoice.objects.create(
@@ -779,8 +1200,7 @@ class ProcessBillingCommandTests(APITestCase):
         self.assertEqual(overdue_invoice.late_fee_amount, Decimal('2250.00'))  # 5% of 45000
         self.assertEqual(overdue_invoice.total_amount, Decimal('47250.00'))
 
-    @patch('notifications.utils.create_notification')
-    def test_pre_due_reminder_sent(self, mock_notify):
+    def test_pre_due_reminder_sent(self):
         invoice = Invoice.objects.create(
             lease=self.lease,
             period_start=date.today().replace(day=1),
@@ -793,11 +1213,10 @@ class ProcessBillingCommandTests(APITestCase):
         )
         from django.core.management import call_command
         call_command('process_billing', verbosity=0)
-        mock_notify.assert_called()
+        self.assertTrue(Notification.objects.filter(user=self.tenant, notification_type='payment_reminder').exists())
         self.assertTrue(ReminderLog.objects.filter(invoice=invoice, reminder_type='pre_due').exists())
 
-    @patch('notifications.utils.create_notification')
-    def test_reminder_not_sent_twice(self, mock_notify):
+    def test_reminder_not_sent_twice(self):
         invoice = Invoice.objects.create(
             lease=self.lease,
             period_start=date.today().replace(day=1),
@@ -811,10 +1230,9 @@ class ProcessBillingCommandTests(APITestCase):
         ReminderLog.objects.create(invoice=invoice, reminder_type='pre_due')
         from django.core.management import call_command
         call_command('process_billing', verbosity=0)
-        mock_notify.assert_not_called()
+        self.assertFalse(Notification.objects.filter(user=self.tenant).exists())
 
-    @patch('notifications.utils.create_notification')
-    def test_pre_due_disabled_when_notification_settings_null(self, mock_notify):
+    def test_pre_due_disabled_when_notification_settings_null(self):
         PropertyBillingNotificationSettings.objects.create(
             property=self.prop,
             remind_before_due_days=None,
@@ -831,7 +1249,138 @@ class ProcessBillingCommandTests(APITestCase):
         )
         from django.core.management import call_command
         call_command('process_billing', verbosity=0)
-        mock_notify.assert_not_called()
+        self.assertFalse(Notification.objects.filter(user=self.tenant).exists())
+
+    def _invoice_due_in(self, days, lease=None, status='pending'):
+        lease = lease or self.lease
+        return Invoice.objects.create(
+            lease=lease,
+            period_start=date(2000, 1, 1) + timedelta(days=31 * (days + 10)),
+            period_end=date.today(),
+            due_date=date.today() + timedelta(days=days),
+            rent_amount=Decimal('45000'),
+            late_fee_amount=Decimal('0'),
+            total_amount=Decimal('45000'),
+            status=status,
+        )
+
+    def test_pre_due_uses_per_property_offset(self):
+        from billing.reminders import send_reminders
+        PropertyBillingNotificationSettings.objects.create(property=self.prop, remind_before_due_days=5)
+        self._invoice_due_in(3)
+        due_in_five = self._invoice_due_in(5)
+        sent = send_reminders(date.today())
+        self.assertEqual(sent['pre_due'], 1)
+        self.assertEqual(
+            list(ReminderLog.objects.filter(reminder_type='pre_due').values_list('invoice_id', flat=True)),
+            [due_in_five.pk],
+        )
+        self.assertEqual(Notification.objects.get(user=self.tenant).title, 'Rent due in 5 days')
+
+    def test_due_date_reminder_sent_once(self):
+        from billing.reminders import send_reminders
+        invoice = self._invoice_due_in(0)
+        self.assertEqual(send_reminders(date.today())['due_date'], 1)
+        self.assertEqual(send_reminders(date.today())['due_date'], 0)
+        self.assertTrue(ReminderLog.objects.filter(invoice=invoice, reminder_type='due_date').exists())
+        self.assertEqual(Notification.objects.filter(title='Rent is due today').count(), 1)
+
+    def test_overdue_reminder_waits_for_property_delay(self):
+        from billing.reminders import send_reminders
+        PropertyBillingNotificationSettings.objects.create(property=self.prop, remind_after_overdue_days=3)
+        self._invoice_due_in(-2, status='overdue')
+        waited = self._invoice_due_in(-3, status='overdue')
+        self.assertEqual(send_reminders(date.today())['overdue'], 1)
+        self.assertTrue(ReminderLog.objects.filter(invoice=waited, reminder_type='overdue').exists())
+
+    def test_reminder_emails_respect_preferences_in_one_batch(self):
+        from django.core import mail
+        from authentication.models import NotificationPreference
+        from billing.reminders import send_reminders
+        other_tenant, _ = make_user('tenant_cmd2', 'Tenant')
+        unit = Unit.objects.create(property=self.prop, name='Unit 2', price='45000', created_by=self.landlord)
+        self._invoice_due_in(0)
+        self._invoice_due_in(0, lease=make_lease(unit, other_tenant))
+        NotificationPreference.objects.create(user=self.tenant, email_notifications=True)
+        NotificationPreference.objects.create(user=other_tenant, email_notifications=True, payment_due_reminder=False)
+        from notifications.outbox import deliver_pending_emails
+        send_reminders(date.today(), batch_size=10)
+        self.assertEqual(Notification.objects.filter(notification_type='payment_reminder').count(), 2)
+        self.assertEqual(mail.outbox, [])  # queued, not sent inline
+        deliver_pending_emails()
+        self.assertEqual([m.to for m in mail.outbox], [[self.tenant.email]])
+
+    def test_shards_partition_properties(self):
+        from io import StringIO
+        from django.core.management import call_command
+        props = [self.prop] + [make_property(self.landlord) for _ in range(3)]
+        for prop in props[1:]:
+            BillingConfig.objects.create(
+                property=prop, rent_due_day=date.today().day, late_fee_percentage=Decimal('5.00'),
+            )
+            make_lease(make_unit(prop, self.landlord), self.tenant)
+        for index in range(2):
+            out = StringIO()
+            call_command('process_billing', shard=f'{index}/2', verbosity=0, stdout=out)
+            self.assertIn(f'shard {index}/2: generate', out.getvalue())
+            invoiced = set(Invoice.objects.values_list('lease__unit__property_id', flat=True))
+            self.assertEqual(
+                invoiced,
+                {p.pk for p in props if p.pk % 2 <= index},
+            )
+
+    def test_workers_cover_every_shard(self):
+        from io import StringIO
+        from django.core.management import call_command
+        other = make_property(self.landlord)
+        BillingConfig.objects.create(property=other, rent_due_day=date.today().day, late_fee_percentage=Decimal('5.00'))
+        make_lease(make_unit(other, self.landlord), self.tenant)
+        out = StringIO()
+        call_command('process_billing', workers=2, verbosity=0, stdout=out)
+        self.assertEqual(Invoice.objects.count(), 2)
+        self.assertIn('shard 0/2', out.getvalue())
+        self.assertIn('shard 1/2', out.getvalue())
+
+    def test_workers_run_in_forked_pool_outside_transactions(self):
+        from billing.management.commands import process_billing
+        with patch.object(process_billing, 'ProcessPoolExecutor') as pool_cls, \
+                patch.object(process_billing.connections, 'close_all') as close_all:
+            pool = pool_cls.return_value.__enter__.return_value
+            pool.map.side_effect = lambda fn, *args: [{'shard': args[1][i]} for i in range(len(args[1]))]
+            summaries = process_billing.Command()._run_in_pool(
+                date.today(), 2, {'batch_size': 10, 'late_fee_chunk_size': 10, 'verbosity': 0},
+            )
+        kwargs = pool_cls.call_args.kwargs
+        self.assertEqual(kwargs['max_workers'], 2)
+        self.assertEqual(kwargs['mp_context'].get_start_method(), 'fork')
+        self.assertIs(kwargs['initializer'], process_billing._init_worker)
+        self.assertEqual([summary['shard'] for summary in summaries], [(0, 2), (1, 2)])
+        close_all.assert_called_once()
+
+    def test_workers_fall_back_to_sequential_inside_transaction(self):
+        from billing.management.commands import process_billing
+        with patch.object(process_billing, 'ProcessPoolExecutor') as pool_cls, \
+                patch.object(process_billing.connection, 'vendor', 'postgresql'):
+            self.assertEqual(process_billing.Command()._sequential_reason(), 'Inside a transaction')
+        pool_cls.assert_not_called()
+
+    def test_invalid_shard_rejected(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        for value in ('2/2', 'x', '1/0'):
+            with self.assertRaises(CommandError):
+                call_command('process_billing', shard=value, verbosity=0)
+        with self.assertRaises(CommandError):
+            call_command('process_billing', shard='0/2', workers=2, verbosity=0)
+
+    def test_reminders_restricted_to_shard_properties(self):
+        from billing.reminders import send_reminders
+        from billing.sharding import shard_properties
+        self._invoice_due_in(0)
+        other_shard = ((self.prop.pk + 1) % 2, 2)
+        self.assertEqual(send_reminders(date.today(), properties=shard_properties(other_shard))['due_date'], 0)
+        own_shard = (self.prop.pk % 2, 2)
+        self.assertEqual(send_reminders(date.today(), properties=shard_properties(own_shard))['due_date'], 1)
 
     @patch('django.utils.timezone.now')
     def test_invoice_generated_with_lead_days(self, mock_now):
@@ -871,6 +1420,85 @@ class ProcessBillingCommandTests(APITestCase):
         self.assertEqual(overdue_invoice.late_fee_amount, Decimal('500.00'))
         self.assertEqual(overdue_invoice.total_amount, Decimal('45500.00'))
 
+    def _past_due_invoice(self, lease, status='pending'):
+        return Invoice.objects.create(
+            lease=lease,
+            period_start=date.today().replace(day=1) - timedelta(days=31 * lease.pk),
+            period_end=date.today(),
+            due_date=date.today() - timedelta(days=1),
+            rent_amount=Decimal('45000'),
+            late_fee_amount=Decimal('0'),
+            total_amount=Decimal('45000'),
+            status=status,
+        )
+
+    def test_late_fee_capped_percentage(self):
+        from billing.late_fees import apply_late_fees
+        BillingConfig.objects.filter(property=self.prop).update(
+            late_fee_percentage=Decimal('10.00'), late_fee_max_percentage=Decimal('4.00'),
+        )
+        invoice = self._past_due_invoice(self.lease)
+        counts = apply_late_fees(date.today())
+        invoice.refresh_from_db()
+        self.assertEqual(counts, {self.prop.pk: 1})
+        self.assertEqual(invoice.late_fee_amount, Decimal('1800.00'))
+        self.assertEqual(invoice.total_amount, Decimal('46800.00'))
+        self.assertEqual(invoice.status, 'overdue')
+
+    def test_late_fees_skip_invoices_already_overdue(self):
+        from billing.late_fees import apply_late_fees
+        invoice = self._past_due_invoice(self.lease, status='overdue')
+        Invoice.objects.filter(pk=invoice.pk).update(late_fee_amount=Decimal('99.00'))
+        self.assertEqual(apply_late_fees(date.today()), {})
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.late_fee_amount, Decimal('99.00'))
+
+    def test_late_fees_skip_properties_without_config(self):
+        from billing.late_fees import apply_late_fees
+        other_prop = make_property(self.landlord)
+        lease = make_lease(make_unit(other_prop, self.landlord), self.tenant)
+        invoice = self._past_due_invoice(lease)
+        apply_late_fees(date.today())
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.status, 'pending')
+
+    def test_late_fees_in_chunks_count_per_property(self):
+        from billing.late_fees import apply_late_fees
+        other_prop = make_property(self.landlord)
+        BillingConfig.objects.create(
+            property=other_prop, rent_due_day=1, late_fee_percentage=Decimal('0'),
+            late_fee_mode=BillingConfig.LATE_FEE_MODE_FIXED, late_fee_fixed_amount=Decimal('750.00'),
+        )
+        invoices = [self._past_due_invoice(self.lease)]
+        for i in range(2, 5):
+            unit = Unit.objects.create(property=other_prop, name=f'Unit {i}', price='45000', created_by=self.landlord)
+            invoices.append(self._past_due_invoice(make_lease(unit, self.tenant), status='partial'))
+        counts = apply_late_fees(date.today(), chunk_size=2)
+        self.assertEqual(counts, {self.prop.pk: 1, other_prop.pk: 3})
+        fees = sorted(Invoice.objects.filter(pk__in=[i.pk for i in invoices]).values_list('late_fee_amount', flat=True))
+        self.assertEqual(fees, [Decimal('750.00')] * 3 + [Decimal('2250.00')])
+        self.assertFalse(Invoice.objects.exclude(status='overdue').filter(pk__in=[i.pk for i in invoices]).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'worker processes need a multi-writer database')
+class ProcessBillingWorkerPoolTests(TransactionTestCase):
+    """Runs the real process pool: rows must be committed for the workers to see them."""
+
+    def test_workers_cover_every_shard(self):
+        from django.core.management import call_command
+        landlord, _ = make_user('landlord_pool', 'Landlord')
+        tenant, _ = make_user('tenant_pool', 'Tenant')
+        for _ in range(2):
+            prop = make_property(landlord)
+            BillingConfig.objects.create(
+                property=prop, rent_due_day=date.today().day, late_fee_percentage=Decimal('5.00'),
+            )
+            make_lease(make_unit(prop, landlord), tenant)
+        out = StringIO()
+        call_command('process_billing', workers=2, verbosity=0, stdout=out)
+        self.assertNotIn('running shards sequentially', out.getvalue())
+        self.assertEqual(Invoice.objects.count(), 2)
+
 
 class ChargeTypeTests(APITestCase):
     def setUp(self):
@@ -1316,6 +1944,307 @@ class FinancialReportTests(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_occupancy_series_granularity(self):
+        today = date.today()
+        self.auth(self.landlord_token)
+        url = reverse('financial-report', args=[self.prop.id])
+        response = self.client.get(url, {'year': today.year, 'granularity': 'quarterly'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row['period'] for row in response.data['occupancy_series']],
+            [f'{today.year}-Q{q}' for q in range(1, 5)],
+        )
+        current = response.data['occupancy_series'][(today.month - 1) // 3]
+        self.assertEqual(current['occupancy_pct'], '100.00')
+
+        response = self.client.get(url, {'year': today.year, 'month': today.month, 'granularity': 'daily'})
+        self.assertEqual(len(response.data['occupancy_series']), calendar.monthrange(today.year, today.month)[1])
+        self.assertEqual(response.data['occupancy']['occupied_units'], 1)
+
+        response = self.client.get(url, {'year': today.year, 'granularity': 'weekly'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class PortfolioReportTests(APITestCase):
+    def setUp(self):
+        self.landlord, self.landlord_token = make_user('landlord1', 'Landlord')
+        self.other_landlord, self.other_token = make_user('landlord2', 'Landlord')
+        self.agent, self.agent_token = make_user('agent1', 'Agent')
+        self.tenant, self.tenant_token = make_user('tenant1', 'Tenant')
+        self.today = date.today()
+        self.url = reverse('portfolio-report')
+        self.props = [self._property_with_invoice(self.landlord, f'tenant-{i}') for i in range(2)]
+        self.other_prop = self._property_with_invoice(self.other_landlord, 'tenant-other')
+
+    def _property_with_invoice(self, owner, tenant_name):
+        prop = make_property(owner)
+        unit = make_unit(prop, owner)
+        tenant, _ = make_user(tenant_name, 'Tenant')
+        lease = make_lease(unit, tenant)
+        Invoice.objects.create(
+            lease=lease, period_start=self.today.replace(day=1), period_end=self.today,
+            due_date=self.today, rent_amount=Decimal('45000'), total_amount=Decimal('45000'),
+            status='paid',
+        )
+        Expense.objects.create(
+            property=prop, category='utility', amount=Decimal('5000'),
+            date=self.today, recorded_by=owner,
+        )
+        return prop
+
+    def auth(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_landlord_sees_own_properties_and_totals(self):
+        self.auth(self.landlord_token)
+        response = self.client.get(self.url, {'year': self.today.year, 'month': self.today.month})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({row['property'] for row in response.data['properties']}, {p.id for p in self.props})
+        row = response.data['properties'][0]
+        self.assertEqual(row['income']['rent_invoiced'], '45000.00')
+        self.assertEqual(row['invoices']['paid'], 1)
+        self.assertEqual(row['occupancy_avg_pct'], '100.00')
+        totals = response.data['totals']
+        self.assertEqual(totals['income']['rent_invoiced'], '90000.00')
+        self.assertEqual(totals['expenses']['by_category'], {'utility': '10000.00'})
+        self.assertEqual(totals['net_income'], '-10000.00')
+        self.assertEqual(totals['invoices']['paid'], 2)
+
+    def test_quarter_range(self):
+        quarter = (self.today.month - 1) // 3 + 1
+        self.auth(self.landlord_token)
+        response = self.client.get(self.url, {'year': self.today.year, 'quarter': quarter})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['period'], f'{self.today.year}-Q{quarter}')
+        self.assertEqual(response.data['totals']['income']['rent_invoiced'], '90000.00')
+
+        response = self.client.get(self.url, {'year': self.today.year - 1, 'quarter': quarter})
+        self.assertEqual(response.data['totals']['income']['rent_invoiced'], '0.00')
+
+    def test_agent_sees_appointed_properties(self):
+        PropertyAgent.objects.create(property=self.other_prop, agent=self.agent, appointed_by=self.other_landlord)
+        self.auth(self.agent_token)
+        response = self.client.get(self.url, {'year': self.today.year})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['property'] for row in response.data['properties']], [self.other_prop.id])
+
+    def test_tenant_forbidden(self):
+        self.auth(self.tenant_token)
+        response = self.client.get(self.url, {'year': self.today.year})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_period(self):
+        self.auth(self.landlord_token)
+        for params in ({}, {'year': 2024, 'month': 1, 'quarter': 1}, {'year': 2024, 'quarter': 5}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_query_count_independent_of_property_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.auth(self.landlord_token)
+        params = {'year': self.today.year, 'quarter': 1}
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url, params)
+        for i in range(3):
+            self._property_with_invoice(self.landlord, f'tenant-more-{i}')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data['properties']), 5)
+        self.assertEqual(len(many), len(few))
+
+class PropertyMonthlyFinancialsTests(APITestCase):
+    """Rollup rows behind financial_report: signal maintenance, rebuild, and the read path."""
+
+    def setUp(self):
+        self.landlord, self.landlord_token = make_user('landlord1', 'Landlord')
+        self.tenant, _ = make_user('tenant1', 'Tenant')
+        self.prop = make_property(self.landlord)
+        self.unit = make_unit(self.prop, self.landlord)
+        self.lease = make_lease(self.unit, self.tenant)
+        self.month = date.today().replace(day=1)
+
+    def auth(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _row(self):
+        return PropertyMonthlyFinancials.objects.get(property=self.prop, month=self.month)
+
+    def _invoice(self, **kwargs):
+        fields = {
+            'lease': self.lease, 'period_start': self.month, 'period_end': self.month,
+            'due_date': self.month, 'rent_amount': Decimal('45000'),
+            'total_amount': Decimal('45000'), 'status': 'pending',
+        }
+        fields.update(kwargs)
+        return Invoice.objects.create(**fields)
+
+    def test_signals_maintain_rollup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = self._invoice()
+        row = self._row()
+        self.assertEqual(row.rent_invoiced, Decimal('45000.00'))
+        self.assertEqual(row.invoices_pending, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(
+                invoice=invoice, amount=Decimal('45000'), stripe_payment_intent_id='pi_rollup',
+                status='completed', paid_at=timezone.now(),
+            )
+            invoice.status = 'paid'
+            invoice.save()
+            Expense.objects.create(
+                property=self.prop, category='repair', amount=Decimal('2000'),
+                date=date.today(), recorded_by=self.landlord,
+            )
+        row = self._row()
+        self.assertEqual(row.collected, Decimal('45000.00'))
+        self.assertEqual((row.invoices_pending, row.invoices_paid), (0, 1))
+        self.assertEqual(row.expenses_by_category, {'repair': '2000.00'})
+        self.assertEqual((row.occupied_units, row.total_units), (1, 1))
+
+    def test_moving_expense_to_another_month_updates_both_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = Expense.objects.create(
+                property=self.prop, category='repair', amount=Decimal('2000'),
+                date=date.today(), recorded_by=self.landlord,
+            )
+        earlier = self.month - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.date = earlier
+            expense.save()
+        self.assertEqual(self._row().expenses, Decimal('0.00'))
+        self.assertEqual(
+            PropertyMonthlyFinancials.objects.get(property=self.prop, month=earlier.replace(day=1)).expenses,
+            Decimal('2000.00'),
+        )
+
+    def test_deleting_income_updates_rollup(self):
+        charge_type = ChargeType.objects.create(property=self.prop, name='Water', created_by=self.landlord)
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = AdditionalIncome.objects.create(
+                unit=self.unit, charge_type=charge_type, amount=Decimal('1500'),
+                date=date.today(), recorded_by=self.landlord,
+            )
+        self.assertEqual(self._row().additional_income_by_type, {'Water': '1500.00'})
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.delete()
+        self.assertEqual(self._row().additional_income, Decimal('0.00'))
+        self.assertEqual(self._row().additional_income_by_type, {})
+
+    def test_new_unit_updates_stored_occupancy(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._invoice()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_unit(self.prop, self.landlord)
+        self.assertEqual((self._row().occupied_units, self._row().total_units), (1, 2))
+
+    def test_process_billing_refreshes_rollup(self):
+        from io import StringIO
+        from django.core.management import call_command
+        BillingConfig.objects.create(
+            property=self.prop, rent_due_day=date.today().day, late_fee_percentage=Decimal('5.00'),
+        )
+        call_command('process_billing', stdout=StringIO())
+        self.assertEqual(self._row().invoices_pending, 1)
+        self.assertEqual(self._row().rent_invoiced, Decimal(self.lease.rent_amount))
+
+    def test_process_billing_settles_last_months_occupancy(self):
+        from io import StringIO
+        from django.core.management import call_command
+        previous = (self.month - timedelta(days=1)).replace(day=1)
+        # Deactivated mid-month: left out while the month ran, counted once it has ended.
+        Lease.objects.filter(pk=self.lease.pk).update(
+            start_date=previous - timedelta(days=60), end_date=previous + timedelta(days=10), is_active=False,
+        )
+        PropertyMonthlyFinancials.objects.create(
+            property=self.prop, month=previous, occupied_units=0, total_units=1,
+        )
+        written_while_open = timezone.make_aware(datetime.combine(previous + timedelta(days=20), datetime.min.time()))
+        PropertyMonthlyFinancials.objects.filter(month=previous).update(updated_at=written_while_open)
+
+        out = StringIO()
+        call_command('process_billing', stdout=out)
+        row = PropertyMonthlyFinancials.objects.get(property=self.prop, month=previous)
+        self.assertEqual((row.occupied_units, row.total_units), (1, 1))
+        self.assertIn("Last month's occupancy refreshed: 1 rollup row", out.getvalue())
+
+        out = StringIO()
+        call_command('process_billing', stdout=out)
+        self.assertNotIn("occupancy refreshed", out.getvalue())
+
+    def test_rebuild_command_recomputes_rows(self):
+        from io import StringIO
+        from django.core.management import call_command
+        self._invoice(status='paid')
+        PropertyMonthlyFinancials.objects.create(property=self.prop, month=self.month, invoices_paid=7)
+        stale_month = date(2020, 1, 1)
+        PropertyMonthlyFinancials.objects.create(property=self.prop, month=stale_month)
+        out = StringIO()
+        call_command('rebuild_financial_rollup', stdout=out)
+        self.assertEqual(self._row().invoices_paid, 1)
+        self.assertFalse(PropertyMonthlyFinancials.objects.filter(month=stale_month).exists())
+        self.assertIn('Rebuilt 1 property-month row', out.getvalue())
+
+    def test_annual_report_reads_rollup_in_one_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from billing.financial_rollup import refresh_monthly_financials
+        self._invoice()
+        year_months = [date(self.month.year, m, 1) for m in range(1, 13)]
+        refresh_monthly_financials((self.prop.pk, m) for m in year_months)
+        self.auth(self.landlord_token)
+        url = reverse('financial-report', args=[self.prop.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'year': self.month.year})
+        rollup_queries = [q for q in queries if 'billing_propertymonthlyfinancials' in q['sql']]
+        self.assertEqual(len(rollup_queries), 1)
+        self.assertFalse([q for q in queries if 'billing_invoice' in q['sql']])
+        self.assertEqual(response.data['income']['rent_invoiced'], '45000.00')
+
+    def test_report_computes_missing_months_in_a_fixed_number_of_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        year = self.month.year - 1
+        self._invoice(period_start=date(year, 3, 1), period_end=date(year, 3, 31), due_date=date(year, 3, 5))
+        Expense.objects.create(
+            property=self.prop, category='repairs', amount=Decimal('2500'), date=date(year, 7, 14),
+            recorded_by=self.landlord,
+        )
+        self.assertFalse(PropertyMonthlyFinancials.objects.exists())
+        self.auth(self.landlord_token)
+        url = reverse('financial-report', args=[self.prop.id])
+        source_tables = ('billing_invoice', 'billing_payment', 'billing_additionalincome', 'billing_expense')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'year': year})
+        self.assertEqual(response.data['income']['rent_invoiced'], '45000.00')
+        self.assertEqual(response.data['expenses']['total'], '2500.00')
+        # One grouped query per source table for all twelve months, and nothing stored.
+        self.assertEqual(len([q for q in queries if any(t in q['sql'] for t in source_tables)]), 4)
+        self.assertFalse([q for q in queries if not q['sql'].startswith('SELECT')])
+        self.assertFalse(PropertyMonthlyFinancials.objects.exists())
+
+    def test_deactivated_lease_still_counts_in_past_months(self):
+        year = self.month.year - 1
+        Lease.objects.filter(pk=self.lease.pk).update(
+            start_date=date(year, 2, 1), end_date=date(year, 4, 30), is_active=False,
+        )
+        self.auth(self.landlord_token)
+        response = self.client.get(reverse('financial-report', args=[self.prop.id]), {'year': year})
+        occupied = [row['occupied_units'] for row in response.data['occupancy_series']]
+        self.assertEqual(occupied, [0, 1, 1, 1] + [0] * 8)
+
+    def test_report_for_current_year_does_not_write(self):
+        self._invoice()
+        self.auth(self.landlord_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(
+                reverse('financial-report', args=[self.prop.id]), {'year': self.month.year},
+            )
+        self.assertEqual(response.data['income']['rent_invoiced'], '45000.00')
+        self.assertFalse(PropertyMonthlyFinancials.objects.exists())
+
 
 class MaintenanceExpenseAutoCreateTests(APITestCase):
     """Expense is auto-created from accepted bid when request is marked completed."""
@@ -1931,6 +2860,44 @@ class ReceiptListFilterPaginationTests(APITestCase):
         r = self.client.get(reverse('receipt-list'), {'search': 'penthouse'})
         self.assertEqual(r.data['count'], 1)
 
+    def test_search_document_follows_related_edits(self):
+        rec = self._create_receipt(self.landlord, self.tenant, self.prop_a, period_month=4, stripe_suffix='sd')
+        unit = rec.payment.invoice.lease.unit
+        unit.name = 'Garden Cottage'
+        unit.save()
+        self.tenant.last_name = 'Renamed'
+        self.tenant.save()
+        payment = rec.payment
+        payment.transaction_reference = 'BANK-777'
+        payment.save()
+        rec.refresh_from_db()
+        self.assertIn('garden cottage', rec.search_document)
+        self.assertIn('pat renamed', rec.search_document)
+        self.assertIn('bank-777', rec.search_document)
+
+        self.auth(self.landlord_token)
+        for term in ('Garden', 'pat renamed', 'bank-777'):
+            r = self.client.get(reverse('receipt-list'), {'search': term})
+            self.assertEqual(r.data['count'], 1, term)
+
+    def test_search_document_follows_lease_tenant_change(self):
+        rec = self._create_receipt(self.landlord, self.tenant, self.prop_a, period_month=4, stripe_suffix='lt')
+        new_tenant, _ = make_user('relet_tenant', 'Tenant')
+        new_tenant.first_name, new_tenant.last_name = 'Quinn', 'Newcomer'
+        new_tenant.save()
+        lease = rec.payment.invoice.lease
+        lease.tenant = new_tenant
+        lease.save()
+        rec.refresh_from_db()
+        self.assertIn('quinn newcomer', rec.search_document)
+        self.assertNotIn('pat', rec.search_document)
+
+    def test_search_does_not_match_across_fields(self):
+        self._create_receipt(self.landlord, self.tenant, self.prop_a, period_month=4, stripe_suffix='sx')
+        self.auth(self.landlord_token)
+        r = self.client.get(reverse('receipt-list'), {'search': 'customer renter_rf'})
+        self.assertEqual(r.data['count'], 0)
+
     def test_combined_filters(self):
         self._create_receipt(
             self.landlord,
@@ -1984,6 +2951,76 @@ class ReceiptListFilterPaginationTests(APITestCase):
             self.assertEqual(len(r.data['results']), 5)
             self.assertEqual(r.data['count'], 12)
 
+    def _walk_cursor_pages(self, params):
+        seen, cursor, pages = [], '', 0
+        while cursor is not None:
+            r = self.client.get(reverse('receipt-list'), {**params, 'cursor': cursor})
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in r.data['results'])
+            cursor = r.data['next_cursor']
+            pages += 1
+        return seen, pages
+
+    def test_cursor_pagination_walks_ties_without_gaps(self):
+        receipts = [
+            self._create_receipt(self.landlord, self.tenant, self.prop_a, period_month=2, stripe_suffix=f'k{n}')
+            for n in range(7)
+        ]
+        # Identical issued_at on most rows: the id tie-breaker must keep pages disjoint.
+        same = timezone.make_aware(datetime(2026, 2, 20, 12, 0, 0))
+        Receipt.objects.filter(pk__in=[r.pk for r in receipts[:5]]).update(issued_at=same)
+        self.auth(self.landlord_token)
+        seen, pages = self._walk_cursor_pages({'page_size': 3})
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(seen), sorted(r.pk for r in receipts))
+        expected = list(Receipt.objects.order_by('-issued_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_cursor_pagination_keeps_filters_and_omits_count_by_default(self):
+        for n in range(4):
+            self._create_receipt(
+                self.landlord, self.tenant, self.prop_a, period_month=2, stripe_suffix=f'kf{n}',
+                payment_method='mpesa' if n % 2 else 'card',
+            )
+        self.auth(self.landlord_token)
+        r = self.client.get(reverse('receipt-list'), {'cursor': '', 'method': 'mpesa'})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', r.data)
+        self.assertEqual({row['payment_method'] for row in r.data['results']}, {'mpesa'})
+        self.assertEqual(len(r.data['results']), 2)
+        self.assertIsNone(r.data['next'])
+
+        r = self.client.get(reverse('receipt-list'), {'cursor': '', 'method': 'mpesa', 'include_count': 'true'})
+        self.assertEqual(r.data['count'], 2)
+
+    def test_cursor_page_query_count_constant(self):
+        for n in range(6):
+            self._create_receipt(self.landlord, self.tenant, self.prop_a, period_month=2, stripe_suffix=f'kq{n}')
+        self.auth(self.landlord_token)
+        first = self.client.get(reverse('receipt-list'), {'cursor': '', 'page_size': 2})
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('receipt-list'), {'cursor': first.data['next_cursor'], 'page_size': 2})
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql'].upper()])
+        self.assertFalse([q for q in ctx.captured_queries if 'OFFSET' in q['sql'].upper()])
+
+    def test_invalid_cursor_returns_400(self):
+        self.auth(self.landlord_token)
+        r = self.client.get(reverse('receipt-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cursor', r.data)
+
+    def test_forged_cursor_value_returns_400(self):
+        import base64
+        import json
+        self.auth(self.landlord_token)
+        for value in ('garbage', '2024-02-30T00:00:00'):
+            token = base64.urlsafe_b64encode(json.dumps([value, 1]).encode()).decode()
+            r = self.client.get(reverse('receipt-list'), {'cursor': token})
+            self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('cursor', r.data)
+
     def test_tenant_other_property_filter_returns_empty(self):
         other_landlord, _ = make_user('landlord_other_rf', 'Landlord')
         other_prop = make_property(other_landlord)
@@ -1998,6 +3035,9 @@ class ReceiptListFilterPaginationTests(APITestCase):
 class ReceiptStatsTests(APITestCase):
     """GET /api/billing/receipts/stats/"""
 
+    def setUp(self):
+        cache.clear()
+
     def _pay_rec(
         self,
         landlord,
@@ -2142,6 +3182,55 @@ class ReceiptStatsTests(APITestCase):
         self.assertEqual(Decimal(r.data['average_amount']), Decimal('100.00'))
         self.assertEqual(r.data['this_month_count'], 0)
 
+    @patch('billing.receipt_stats.timezone.now')
+    def test_stats_use_one_aggregate_query(self, mock_now):
+        from billing.receipt_stats import build_receipt_stats_payload
+        from billing.views import _receipt_list_scoped_queryset
+        mock_now.return_value = timezone.make_aware(datetime(2026, 4, 20, 12, 0, 0))
+        landlord, _ = make_user('landlord_st_q', 'Landlord')
+        tenant, _ = make_user('tenant_st_q', 'Tenant')
+        prop = make_property(landlord)
+        for i, method in enumerate(['card', 'mpesa', 'bank']):
+            self._pay_rec(
+                landlord, tenant, prop, inv_month=4,
+                paid_dt=timezone.make_aware(datetime(2026, 4, i + 1, 12, 0, 0)),
+                amount=str(100 * (i + 1)), method=method, suffix=f'q{i}',
+            )
+        with self.assertNumQueries(1):
+            payload = build_receipt_stats_payload(_receipt_list_scoped_queryset(landlord))
+        self.assertEqual(payload['total_count'], 3)
+        self.assertEqual(payload['this_month_total'], '600.00')
+        self.assertEqual(payload['method_breakdown']['bank'], 33.33)
+
+    @patch('billing.receipt_stats.timezone.now')
+    def test_stats_cached_until_receipt_created(self, mock_now):
+        mock_now.return_value = timezone.make_aware(datetime(2026, 4, 20, 12, 0, 0))
+        landlord, lt = make_user('landlord_st_cache', 'Landlord')
+        tenant, _ = make_user('tenant_st_cache', 'Tenant')
+        prop = make_property(landlord)
+        self._pay_rec(
+            landlord, tenant, prop, inv_month=4,
+            paid_dt=timezone.make_aware(datetime(2026, 4, 2, 12, 0, 0)),
+            amount='100', suffix='c1',
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {lt.key}')
+        self.assertEqual(self.client.get(reverse('receipt-stats')).data['total_count'], 1)
+
+        Receipt.objects.filter(payment__invoice__lease__unit__property=prop).update(receipt_number='RCP-EDITED')
+        with patch('billing.receipt_stats.build_receipt_stats_payload') as build:
+            r = self.client.get(reverse('receipt-stats'))
+        build.assert_not_called()
+        self.assertEqual(r.data['total_count'], 1)
+
+        self._pay_rec(
+            landlord, tenant, prop, inv_month=4,
+            paid_dt=timezone.make_aware(datetime(2026, 4, 3, 12, 0, 0)),
+            amount='300', suffix='c2',
+        )
+        r = self.client.get(reverse('receipt-stats'))
+        self.assertEqual(r.data['total_count'], 2)
+        self.assertEqual(r.data['this_month_total'], '400.00')
+
     def test_invalid_month_returns_400(self):
         landlord, lt = make_user('landlord_st_inv', 'Landlord')
         self.client.credentials(HTTP_AUTHORIZATION=f'Token {lt.key}')
@@ -2193,3 +3282,360 @@ class ReceiptStatsTests(APITestCase):
         self.assertEqual(r.status_code, status.HTTP_200_OK)
         self.assertEqual(r.data['total_count'], 1)
         self.assertEqual(Decimal(r.data['average_amount']), Decimal('100.00'))
+
+
+class ExportTests(APITestCase):
+    """Streaming CSV / XLSX downloads of receipts, invoices and expenses."""
+
+    def setUp(self):
+        self.landlord, self.landlord_token = make_user('landlord_exp', 'Landlord')
+        self.tenant, self.tenant_token = make_user('tenant_exp', 'Tenant')
+        self.prop = make_property(self.landlord)
+        self.invoice = make_invoice(make_lease(make_unit(self.prop, self.landlord), self.tenant))
+        for n, method in enumerate(('mpesa', 'card', 'mpesa')):
+            payment = Payment.objects.create(
+                invoice=self.invoice, amount=Decimal('100'), stripe_payment_intent_id=f'pi_exp_{n}',
+                payment_method=method, transaction_reference=f'EXP-{n}', status='completed', paid_at=timezone.now(),
+            )
+            Receipt.objects.create(payment=payment, receipt_number=f'RCP-EXP-{n}')
+        self.invoice.update_status()
+
+    def auth(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _csv_rows(self, response):
+        import csv
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(text.splitlines()))
+
+    def test_receipt_csv_applies_list_filters(self):
+        self.auth(self.landlord_token)
+        response = self.client.get(reverse('receipt-export'), {'method': 'mpesa'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('attachment; filename="receipts-', response['Content-Disposition'])
+        rows = self._csv_rows(response)
+        self.assertEqual(rows[0][:2], ['Receipt number', 'Issued at'])
+        self.assertEqual([r[0] for r in rows[1:]], ['RCP-EXP-2', 'RCP-EXP-0'])
+
+    def test_receipt_xlsx_is_a_valid_workbook(self):
+        import zipfile
+        from io import BytesIO
+
+        self.auth(self.landlord_token)
+        response = self.client.get(reverse('receipt-export'), {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('xl/workbook.xml', archive.namelist())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn('RCP-EXP-1', sheet)
+
+    async def test_exports_stream_asynchronously_over_asgi(self):
+        import csv
+        from billing import exports
+        headers = {'Authorization': f'Token {self.landlord_token.key}'}
+        with patch.object(exports, 'ASYNC_BATCH_SIZE', 1):
+            response = await self.async_client.get(reverse('receipt-export'), headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.is_async)  # Django 4.2 would otherwise buffer a sync iterator
+            text = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8-sig')
+        rows = list(csv.reader(text.splitlines()))
+        self.assertEqual([r[0] for r in rows[1:]], ['RCP-EXP-2', 'RCP-EXP-1', 'RCP-EXP-0'])
+
+    def test_invoice_export_is_scoped_like_the_list(self):
+        other_tenant, other_token = make_user('tenant_exp2', 'Tenant')
+        self.auth(other_token)
+        self.assertEqual(len(self._csv_rows(self.client.get(reverse('invoice-export')))), 1)
+        self.auth(self.tenant_token)
+        rows = self._csv_rows(self.client.get(reverse('invoice-export')))
+        self.assertEqual([r[0] for r in rows[1:]], [self.invoice.invoice_number])
+        self.assertEqual(rows[1][rows[0].index('Paid')], '300.00')
+
+    def test_expense_export_permissions_and_format_validation(self):
+        Expense.objects.create(
+            property=self.prop, category='repair', amount=Decimal('2500'), description='Gate, "north" side',
+            date=date(2026, 3, 1), recorded_by=self.landlord,
+        )
+        self.auth(self.tenant_token)
+        response = self.client.get(reverse('expense-export', args=[self.prop.pk]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.auth(self.landlord_token)
+        response = self.client.get(reverse('expense-export', args=[self.prop.pk]), {'file_format': 'pdf'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        rows = self._csv_rows(self.client.get(reverse('expense-export', args=[self.prop.pk])))
+        self.assertEqual(rows[1][:3], ['2026-03-01', 'repair', '2500.00'])
+        self.assertEqual(rows[1][4], 'Gate, "north" side')
+
+
+class BillingForecastTests(APITestCase):
+    def setUp(self):
+        self.landlord, self.landlord_token = make_user('landlord_fc', 'Landlord')
+        self.tenant, self.tenant_token = make_user('tenant_fc', 'Tenant')
+        self.today = date.today()
+        self.url = reverse('billing-forecast')
+        self.prop = make_property(self.landlord)
+        BillingConfig.objects.create(
+            property=self.prop, rent_due_day=31, grace_period_days=3,
+            late_fee_percentage='5.00', invoice_lead_days=2, updated_by=self.landlord,
+        )
+        self.lease = make_lease(make_unit(self.prop, self.landlord), self.tenant)
+
+    def auth(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _add_lease(self, prop, name, **fields):
+        tenant, _ = make_user(name, 'Tenant')
+        unit = Unit.objects.create(property=prop, name=name, price='30000', created_by=self.landlord)
+        return Lease.objects.create(
+            unit=unit, tenant=tenant, rent_amount=Decimal('30000'), is_active=True,
+            **{'start_date': self.today, **fields},
+        )
+
+    def test_closed_form_dates_match_day_by_day_walk(self):
+        from billing.forecast import clamp_due_day, next_invoice_generation_on_or_after
+
+        def walk(start, due_day, lead):
+            for i in range(370):
+                d = start + timedelta(days=i)
+                if d.day == max(1, clamp_due_day(due_day, d.year, d.month) - lead):
+                    return d
+
+        for due_day, lead in ((1, 0), (5, 2), (15, 20), (29, 0), (31, 3)):
+            start = date(2023, 12, 1)
+            while start < date(2025, 3, 1):
+                self.assertEqual(
+                    next_invoice_generation_on_or_after(start, due_day, lead), walk(start, due_day, lead),
+                    (start, due_day, lead),
+                )
+                start += timedelta(days=1)
+
+    def test_schedule_and_expected_rent(self):
+        month_after_next = (self.today.replace(day=1) + timedelta(days=62)).replace(day=1)
+        self._add_lease(self.prop, 'ending', end_date=self.today)
+        self._add_lease(self.prop, 'starting', start_date=month_after_next)
+        self.auth(self.landlord_token)
+        response = self.client.get(self.url, {'months': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['months']), 3)
+        row = response.data['properties'][0]
+        self.assertTrue(row['configured'])
+        first = row['schedule'][0]
+        last_day = calendar.monthrange(self.today.year, self.today.month)[1]
+        self.assertEqual(first['invoice_generation_date'], date(self.today.year, self.today.month, last_day - 2))
+        self.assertEqual(first['due_date'], date(self.today.year, self.today.month, last_day) + timedelta(days=3))
+        self.assertEqual(
+            [(m['lease_count'], m['expected_rent']) for m in row['schedule']],
+            [(2, '75000.00'), (1, '45000.00'), (2, '75000.00')],
+        )
+        self.assertEqual(row['expected_rent_total'], '195000.00')
+        self.assertEqual([lease['unit'] for lease in row['expiring_leases']], ['ending'])
+        self.assertEqual(response.data['totals']['expiring_lease_count'], 1)
+        self.assertEqual(response.data['totals']['expected_rent'], '195000.00')
+
+    def test_unconfigured_property_has_rent_but_no_dates(self):
+        other = make_property(self.landlord)
+        self._add_lease(other, 'other-unit')
+        self.auth(self.landlord_token)
+        response = self.client.get(self.url, {'property': other.id, 'months': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [row] = response.data['properties']
+        self.assertFalse(row['configured'])
+        self.assertIsNone(row['schedule'][0]['invoice_generation_date'])
+        self.assertEqual(row['schedule'][0]['expected_rent'], '30000.00')
+
+    def test_tenant_forbidden_and_invalid_months(self):
+        self.auth(self.tenant_token)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        self.auth(self.landlord_token)
+        for months in ('0', '25', 'x'):
+            response = self.client.get(self.url, {'months': months})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, months)
+
+    def test_query_count_independent_of_property_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.auth(self.landlord_token)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url, {'months': 12})
+        for i in range(3):
+            self._add_lease(make_property(self.landlord), f'more-{i}')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url, {'months': 12})
+        self.assertEqual(len(response.data['properties']), 4)
+        self.assertEqual(len(many), len(few))
+
+
+class LedgerTests(APITestCase):
+    def setUp(self):
+        self.landlord, self.landlord_token = make_user('landlord_lg', 'Landlord')
+        self.other_landlord, self.other_token = make_user('landlord_lg2', 'Landlord')
+        self.tenant, self.tenant_token = make_user('tenant_lg', 'Tenant')
+        self.other_tenant, self.other_tenant_token = make_user('tenant_lg2', 'Tenant')
+        self.prop = make_property(self.landlord)
+        self.unit = make_unit(self.prop, self.landlord)
+        self.lease = make_lease(self.unit, self.tenant)
+        self.lease.start_date = date(2026, 1, 1)
+        self.lease.save()
+
+        self.january = self._invoice(date(2026, 1, 1), late_fee=Decimal('500'))
+        self.february = self._invoice(date(2026, 2, 1))
+        self._invoice(date(2026, 3, 1), status='cancelled')
+        self.payment = Payment.objects.create(
+            invoice=self.january, amount=Decimal('45500'), stripe_payment_intent_id='pi_ledger_1',
+            payment_method='mpesa', status='completed',
+            paid_at=timezone.make_aware(datetime(2026, 1, 20, 12, 0)),
+        )
+        Receipt.objects.create(payment=self.payment, receipt_number='RCP-LEDGER-1')
+        Payment.objects.create(
+            invoice=self.february, amount=Decimal('1000'), stripe_payment_intent_id='pi_ledger_pending',
+        )
+        charge_type = ChargeType.objects.create(property=self.prop, name='Water', created_by=self.landlord)
+        AdditionalIncome.objects.create(
+            unit=self.unit, charge_type=charge_type, amount=Decimal('1200'), date=date(2026, 2, 3),
+            description='Meter reading', recorded_by=self.landlord,
+        )
+        AdditionalIncome.objects.create(
+            unit=self.unit, charge_type=charge_type, amount=Decimal('900'), date=date(2025, 12, 3),
+            recorded_by=self.landlord,
+        )
+        self.url = reverse('lease-ledger', args=[self.lease.pk])
+
+    def _invoice(self, period_start, late_fee=Decimal('0'), status='pending'):
+        return Invoice.objects.create(
+            lease=self.lease, period_start=period_start, period_end=period_start.replace(day=28),
+            due_date=period_start + timedelta(days=4), rent_amount=Decimal('45000'),
+            late_fee_amount=late_fee, total_amount=Decimal('45000') + late_fee, status=status,
+        )
+
+    def auth(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_entries_in_order_with_running_balance(self):
+        self.auth(self.landlord_token)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(e['date'], e['kind'], e['debit'], e['credit'], e['balance']) for e in response.data['results']],
+            [
+                (date(2026, 1, 1), 'rent', '45000.00', '0.00', '45000.00'),
+                (date(2026, 1, 5), 'late_fee', '500.00', '0.00', '45500.00'),
+                (date(2026, 1, 20), 'payment', '0.00', '45500.00', '0.00'),
+                (date(2026, 2, 1), 'rent', '45000.00', '0.00', '45000.00'),
+                (date(2026, 2, 3), 'charge', '1200.00', '0.00', '46200.00'),
+            ],
+        )
+        payment = response.data['results'][2]
+        self.assertEqual(payment['reference'], 'RCP-LEDGER-1')
+        self.assertEqual(payment['description'], 'Payment (M-Pesa)')
+        self.assertEqual(response.data['results'][4]['description'], 'Water: Meter reading')
+
+    def test_cursor_pages_carry_the_running_balance(self):
+        self.auth(self.tenant_token)
+        first = self.client.get(self.url, {'page_size': 2, 'include_count': 'true'})
+        self.assertEqual(first.data['count'], 5)
+        self.assertEqual([e['balance'] for e in first.data['results']], ['45000.00', '45500.00'])
+        second = self.client.get(self.url, {'page_size': 2, 'cursor': first.data['next_cursor']})
+        self.assertEqual([e['balance'] for e in second.data['results']], ['0.00', '45000.00'])
+        third = self.client.get(self.url, {'page_size': 2, 'cursor': second.data['next_cursor']})
+        self.assertEqual([e['balance'] for e in third.data['results']], ['46200.00'])
+        self.assertIsNone(third.data['next_cursor'])
+
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tenant_ledger_scoping(self):
+        url = reverse('tenant-ledger', args=[self.tenant.pk])
+        self.auth(self.tenant_token)
+        self.assertEqual(len(self.client.get(url).data['results']), 5)
+        self.auth(self.other_tenant_token)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        self.auth(self.other_token)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.auth(self.landlord_token)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_csv_and_pdf_downloads(self):
+        self.auth(self.landlord_token)
+        response = self.client.get(self.url, {'file_format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], 'Date,Description,Reference,Lease,Debit,Credit,Balance')
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[-1].endswith(',46200.00'))
+
+        response = self.client.get(self.url, {'file_format': 'pdf'})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF-1.4'))
+        self.assertIn(b'Closing balance', response.content)
+        self.assertIn(f'ledger-lease-{self.lease.pk}-'.encode(), response['Content-Disposition'].encode())
+
+        response = self.client.get(self.url, {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ArrearsAgingTests(APITestCase):
+    def setUp(self):
+        self.landlord, self.landlord_token = make_user('landlord_ag', 'Landlord')
+        self.other_landlord, self.other_token = make_user('landlord_ag2', 'Landlord')
+        self.tenant, self.tenant_token = make_user('tenant_ag', 'Tenant')
+        self.today = date.today()
+        self.url = reverse('arrears-aging')
+        self.prop = make_property(self.landlord)
+        self.lease = make_lease(make_unit(self.prop, self.landlord), self.tenant)
+        other_tenant, _ = make_user('tenant_ag2', 'Tenant')
+        other_prop = make_property(self.other_landlord)
+        self.other_lease = make_lease(make_unit(other_prop, self.other_landlord), other_tenant)
+
+        self._invoice(self.lease, days_late=5)
+        partial = self._invoice(self.lease, days_late=45)
+        Payment.objects.create(
+            invoice=partial, amount=Decimal('15000'), stripe_payment_intent_id='pi_aging_partial',
+            status='completed', paid_at=timezone.now(),
+        )
+        partial.update_status()
+        self._invoice(self.lease, days_late=75)
+        self._invoice(self.lease, days_late=120)
+        self._invoice(self.lease, days_late=200, status='paid')
+        self._invoice(self.lease, days_late=-3)
+        self._invoice(self.other_lease, days_late=10)
+
+    def _invoice(self, lease, days_late, status='overdue'):
+        due = self.today - timedelta(days=days_late)
+        period_start = date(2020, 1, 1) + timedelta(days=32 * Invoice.objects.filter(lease=lease).count())
+        return Invoice.objects.create(
+            lease=lease, period_start=period_start.replace(day=1), period_end=due, due_date=due,
+            rent_amount=Decimal('45000'), total_amount=Decimal('45000'), status=status,
+        )
+
+    def auth(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_buckets_by_days_past_due(self):
+        self.auth(self.landlord_token)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [row] = response.data['rows']
+        self.assertEqual(row['unit'], self.lease.unit_id)
+        self.assertEqual(row['tenant'], self.tenant.id)
+        self.assertEqual(
+            [row[key] for key in ('days_0_30', 'days_31_60', 'days_61_90', 'days_90_plus', 'total')],
+            ['45000.00', '30000.00', '45000.00', '45000.00', '165000.00'],
+        )
+        self.assertEqual(row['invoice_count'], 4)
+        self.assertEqual(response.data['properties'][0]['total'], '165000.00')
+        self.assertEqual(response.data['totals']['days_31_60'], '30000.00')
+
+    def test_scoped_like_invoice_list(self):
+        self.auth(self.tenant_token)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['totals']['total'], '165000.00')
+        self.auth(self.other_token)
+        response = self.client.get(self.url)
+        self.assertEqual([row['property'] for row in response.data['rows']], [self.other_lease.unit.property_id])
+        response = self.client.get(self.url, {'property': self.prop.id})
+        self.assertEqual(response.data['rows'], [])
+        self.assertEqual(response.data['totals']['total'], '0.00')
@@ -5,11 +5,16 @@ urlpatterns = [
     path('config/<int:property_id>/', views.billing_config, name='billing-config'),
     path('properties/<int:property_pk>/billing-preview/', views.billing_preview, name='billing-preview'),
     path('invoices/', views.invoice_list, name='invoice-list'),
+    path('invoices/export/', views.invoice_export, name='invoice-export'),
     path('invoices/<int:pk>/', views.invoice_detail, name='invoice-detail'),
     path('invoices/<int:pk>/pay/', views.pay_invoice, name='invoice-pay'),
     path('invoices/<int:pk>/payments/', views.invoice_payments, name='invoice-payments'),
+    path('leases/<int:lease_pk>/ledger/', views.lease_ledger, name='lease-ledger'),
+    path('tenants/<int:tenant_pk>/ledger/', views.tenant_ledger, name='tenant-ledger'),
+    path('payments/import/', views.payment_import, name='payment-import'),
     path('receipts/stats/', views.receipt_stats, name='receipt-stats'),
     path('receipts/', views.receipt_list, name='receipt-list'),
+    path('receipts/export/', views.receipt_export, name='receipt-export'),
     path('receipts/<int:pk>/', views.receipt_detail, name='receipt-detail'),
     path('stripe/webhook/', views.stripe_webhook, name='stripe-webhook'),
     # Charge types
@@ -21,6 +26,10 @@ urlpatterns = [
     # Expenses
     path('properties/<int:property_pk>/expenses/', views.expense_list_create, name='expense-list'),
     path('properties/<int:property_pk>/expenses/<int:pk>/', views.expense_detail, name='expense-detail'),
+    path('properties/<int:property_pk>/expenses/export/', views.expense_export, name='expense-export'),
     # Financial report
+    path('reports/portfolio/', views.portfolio_report, name='portfolio-report'),
+    path('reports/forecast/', views.billing_forecast, name='billing-forecast'),
+    path('reports/aging/', views.arrears_aging, name='arrears-aging'),
     path('reports/<int:property_pk>/', views.financial_report, name='financial-report'),
 ]
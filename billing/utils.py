@@ -1,13 +1,66 @@
+import threading
+from contextlib import nullcontext
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
 from django.utils import timezone
 
 
+# SQLite stand-in for the row lock: its writers fail fast ("table is locked") rather than
+# queueing, so allocations in one process are serialized here instead.
+_sqlite_allocation_lock = threading.Lock()
+
+
+def _receipt_prefix(month):
+    return f"RCP-{month.strftime('%Y%m')}-"
+
+
+def _ensure_receipt_counter(month):
+    """Create the month's counter on first use, seeded past any receipt numbered before it existed."""
+    from .models import Receipt, ReceiptNumberCounter
+
+    if ReceiptNumberCounter.objects.filter(month=month).exists():
+        return
+    prefix = _receipt_prefix(month)
+    last = (
+        Receipt.objects.filter(receipt_number__startswith=prefix)
+        .order_by('-receipt_number').values_list('receipt_number', flat=True).first()
+    )
+    try:
+        with transaction.atomic():
+            ReceiptNumberCounter.objects.create(
+                month=month, last_value=int(last.split('-')[-1]) if last else 0,
+            )
+    except IntegrityError:
+        pass  # another worker created it first
+
+
+def allocate_receipt_numbers(count=1, now=None):
+    """
+    Reserve `count` consecutive receipt numbers for the current month and return them in order.
+
+    The month's `ReceiptNumberCounter` row is advanced with one `UPDATE ... SET last_value =
+    last_value + count`, so concurrent callers queue on that row lock instead of racing on
+    `MAX(receipt_number)` and retrying on IntegrityError. Bulk callers reserve a whole block in
+    one round trip. Like a database sequence, numbers reserved by a transaction that later rolls
+    back are not reused.
+    """
+    from .models import ReceiptNumberCounter
+
+    if count < 1:
+        raise ValueError('count must be at least 1.')
+    month = (now or timezone.now()).date().replace(day=1)
+    with _sqlite_allocation_lock if connection.vendor == 'sqlite' else nullcontext():
+        _ensure_receipt_counter(month)
+        with transaction.atomic():
+            ReceiptNumberCounter.objects.filter(month=month).update(last_value=F('last_value') + count)
+            last = ReceiptNumberCounter.objects.filter(month=month).values_list('last_value', flat=True).get()
+    prefix = _receipt_prefix(month)
+    return [f"{prefix}{seq:04d}" for seq in range(last - count + 1, last + 1)]
+
+
 def generate_receipt_number():
-    from .models import Receipt
-    now = timezone.now()
-    prefix = f"RCP-{now.strftime('%Y%m')}-"
-    last = Receipt.objects.filter(receipt_number__startswith=prefix).order_by('-receipt_number').first()
-    seq = int(last.receipt_number.split('-')[-1]) + 1 if last else 1
-    return f"{prefix}{seq:04d}"
+    return allocate_receipt_numbers(1)[0]
 
 
 def generate_invoice_number(pk):
@@ -1,4 +1,3 @@
-import calendar
 import json
 import uuid
 import stripe
@@ -6,6 +5,7 @@ from datetime import date, timedelta
 
 from django.conf import settings
 from django.utils import timezone
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -20,7 +20,15 @@ from django.db import IntegrityError, transaction
 from django.db.models import Sum, Count, Q, Exists, OuterRef
 
 from property.models import Property, Unit, Lease
-from property.views import is_admin, is_landlord, is_agent_for
+from property.views import is_admin, is_agent, is_landlord, is_agent_for
+from property.occupancy import (
+    GRANULARITIES,
+    MONTHLY,
+    OccupancyTimeline,
+    occupancy_pct,
+    period_label as occupancy_period_label,
+    periods as occupancy_periods,
+)
 from .models import (
     BillingConfig,
     Invoice,
@@ -38,13 +46,47 @@ from .serializers import (
     ChargeTypeSerializer, AdditionalIncomeSerializer, ExpenseSerializer,
 )
 from .utils import generate_receipt_number
-from .pagination import ReceiptListPagination
+from .pagination import (
+    InvoiceCursorPagination,
+    LedgerCursorPagination,
+    ReceiptCursorPagination,
+    ReceiptListPagination,
+    wants_cursor_pagination,
+)
 from .receipt_filters import (
     validate_receipt_list_query_params,
     validate_receipt_stats_query_params,
     apply_receipt_list_filters,
 )
-from .receipt_stats import build_receipt_stats_payload
+from .receipt_stats import cached_receipt_stats_payload
+from .financial_rollup import INVOICE_STATUSES, combine_financials, monthly_financials, next_month
+from .portfolio_report import build_portfolio_figures
+from .stripe_events import HANDLED_EVENT_TYPES, enqueue_event
+from .forecast import (
+    DEFAULT_FORECAST_MONTHS,
+    MAX_FORECAST_MONTHS,
+    build_billing_forecast,
+    forecast_months,
+    next_invoice_generation_on_or_after,
+    rent_due_date,
+)
+from .exports import (
+    CONTENT_TYPES,
+    CSV,
+    EXPENSE_COLUMNS,
+    FILE_FORMATS,
+    INVOICE_COLUMNS,
+    PDF,
+    RECEIPT_COLUMNS,
+    XLSX,
+    download_filename,
+    export_response,
+    render_text_pdf,
+    stream_csv,
+    streaming_response,
+)
+from .aging import AGING_BUCKET_KEYS, aging_rows, sum_aging_buckets
+from .ledger import LEDGER_HEADER, Ledger, ledger_pdf_lines, ledger_rows
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -67,39 +109,99 @@ def _receipt_base_queryset():
     )
 
 
-def _units_reporting_qs(prop):
-    return Unit.objects.filter(property=prop, deleted_at__isnull=True)
+def _occupancy_payload(occupied, total):
+    """Occupancy of non-deleted units; percent is two decimal places (None without units)."""
+    return {
+        'occupied_units': occupied if total else 0,
+        'total_units': total,
+        'occupancy_pct': occupancy_pct(occupied, total),
+    }
 
 
-def _occupancy_for_period(prop, period_start, period_end):
-    """
-    Units with a lease overlapping [period_start, period_end] (inclusive),
-    over non-deleted units on the property. Percent is two decimal places.
-    """
-    total = _units_reporting_qs(prop).count()
-    if total == 0:
-        return {
-            'occupied_units': 0,
-            'total_units': 0,
-            'occupancy_pct': None,
-        }
-    occupied = (
-        Lease.objects.filter(
-            unit__property=prop,
-            unit__deleted_at__isnull=True,
-            start_date__lte=period_end,
-        )
-        .filter(Q(end_date__isnull=True) | Q(end_date__gte=period_start))
-        .count()
-    )
-    pct = (Decimal(occupied) / Decimal(total) * Decimal('100')).quantize(Decimal('0.01'))
+def _money(value):
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def _average_pct(pcts):
+    """Mean of two-decimal percentage strings, ignoring None (None when there are none)."""
+    pcts = [Decimal(p) for p in pcts if p is not None]
+    if not pcts:
+        return None
+    return str((sum(pcts) / Decimal(len(pcts))).quantize(Decimal('0.01')))
+
+
+def _financials_payload(figures):
+    """Income / expenses / net / invoice-count sections of a financial report for summed rollup figures."""
+    total_income = figures.collected + figures.additional_income
     return {
-        'occupied_units': occupied,
-        'total_units': total,
-        'occupancy_pct': str(pct),
+        'income': {
+            'rent_invoiced': _money(figures.rent_invoiced),
+            'late_fees_invoiced': _money(figures.late_fees_invoiced),
+            'total_invoiced': _money(figures.rent_invoiced + figures.late_fees_invoiced),
+            'total_collected': _money(figures.collected),
+            'additional_income': _money(figures.additional_income),
+            'additional_income_by_type': figures.additional_income_by_type,
+            'total_income': _money(total_income),
+        },
+        'expenses': {
+            'total': _money(figures.expenses),
+            'by_category': figures.expenses_by_category,
+        },
+        'net_income': _money(total_income - figures.expenses),
+        'invoices': {s: getattr(figures, f'invoices_{s}') for s in INVOICE_STATUSES},
     }
 
 
+def _financial_report_properties(user):
+    """Every property `financial_report` would let `user` see (admin, owner or appointed agent)."""
+    if is_admin(user):
+        return Property.objects.all()
+    visible = Q(owner=user)
+    if is_agent(user):
+        from property.models import PropertyAgent
+        visible |= Q(pk__in=PropertyAgent.objects.filter(agent=user).values('property_id'))
+    return Property.objects.filter(visible)
+
+
+def _report_period(params, allow_quarter=False):
+    """
+    (months, label) for the year / month (/ quarter) query parameters: the first day of
+    every month in the range and its label ("2024", "2024-03", "2024-Q1").
+    Raises ValueError with the client-facing message on bad input.
+    """
+    year_param = params.get('year')
+    month_param = params.get('month')
+    quarter_param = params.get('quarter') if allow_quarter else None
+
+    if not year_param:
+        raise ValueError('year query parameter is required.')
+    try:
+        year = int(year_param)
+    except ValueError:
+        raise ValueError('year must be an integer.')
+    if month_param and quarter_param:
+        raise ValueError('month and quarter cannot be combined.')
+
+    if month_param:
+        try:
+            month = int(month_param)
+            if not (1 <= month <= 12):
+                raise ValueError
+        except ValueError:
+            raise ValueError('month must be an integer between 1 and 12.')
+        return [date(year, month, 1)], f"{year}-{month:02d}"
+    if quarter_param:
+        try:
+            quarter = int(quarter_param)
+            if not (1 <= quarter <= 4):
+                raise ValueError
+        except ValueError:
+            raise ValueError('quarter must be an integer between 1 and 4.')
+        first = 3 * (quarter - 1) + 1
+        return [date(year, m, 1) for m in range(first, first + 3)], f"{year}-Q{quarter}"
+    return [date(year, m, 1) for m in range(1, 13)], str(year)
+
+
 def _property_sends_receipt_on_payment(prop):
     try:
         return prop.billing_notification_settings.send_receipt_on_payment
@@ -128,25 +230,6 @@ def _notify_tenant_payment_received(invoice, amount, receipt_number):
     )
 
 
-def _billing_clamp_due_day(due_day, year, month):
-    return min(due_day, calendar.monthrange(year, month)[1])
-
-
-def _next_invoice_generation_on_or_after(start, rent_due_day, lead_days):
-    for i in range(370):
-        d = start + timedelta(days=i)
-        cd = _billing_clamp_due_day(rent_due_day, d.year, d.month)
-        gen_d = max(1, cd - lead_days)
-        if d.day == gen_d:
-            return d
-    return None
-
-
-def _next_rent_anchor_from_gen(gen_date, rent_due_day):
-    cd = _billing_clamp_due_day(rent_due_day, gen_date.year, gen_date.month)
-    return date(gen_date.year, gen_date.month, cd)
-
-
 # ── Billing Config ─────────────────────────────────────────────────────────────
 
 @extend_schema(methods=['GET'], summary="Get billing config for a property")
@@ -229,7 +312,54 @@ def billing_config(request, property_id):
 
 # ── Invoices ───────────────────────────────────────────────────────────────────
 
-@extend_schema(methods=['GET'], summary="List invoices")
+def _invoice_list_scoped_queryset(user):
+    if is_admin(user):
+        return Invoice.objects.select_related('lease__unit__property').all()
+    if is_landlord(user):
+        return Invoice.objects.filter(lease__unit__property__owner=user)
+    if is_agent(user):
+        from property.models import PropertyAgent
+        assigned_ids = PropertyAgent.objects.filter(agent=user).values_list('property_id', flat=True)
+        return Invoice.objects.filter(lease__unit__property_id__in=assigned_ids)
+    # Tenant sees their own invoices
+    return Invoice.objects.filter(lease__tenant=user)
+
+
+@extend_schema(
+    methods=['GET'],
+    summary="List invoices",
+    description=(
+        'Plain list by default. With `cursor` the list is keyset-paginated on (created_at, id), '
+        'newest first, and wrapped as `{next, next_cursor, results}`.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description=(
+                'Switches to keyset pagination (newest first): pass an empty value for the first page, '
+                'then the `next_cursor` of the previous response. The response is '
+                '`{next, next_cursor, results}`.'
+            ),
+        ),
+        OpenApiParameter(
+            name='include_count',
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Cursor mode only: also return `count` (an extra COUNT query). Default: false.',
+        ),
+        OpenApiParameter(
+            name='page_size',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Cursor mode only: items per page. Default: 20. Maximum: 100.',
+        ),
+    ],
+)
 @extend_schema(
     methods=['POST'],
     summary="Create invoice manually",
@@ -253,17 +383,12 @@ def invoice_list(request):
     user = request.user
 
     if request.method == 'GET':
-        if is_admin(user):
-            invoices = Invoice.objects.select_related('lease__unit__property').all()
-        elif is_landlord(user):
-            invoices = Invoice.objects.filter(lease__unit__property__owner=user)
-        elif hasattr(user, 'role') and user.role.name == 'Agent':
-            from property.models import PropertyAgent
-            assigned_ids = PropertyAgent.objects.filter(agent=user).values_list('property_id', flat=True)
-            invoices = Invoice.objects.filter(lease__unit__property_id__in=assigned_ids)
-        else:
-            # Tenant sees their own invoices
-            invoices = Invoice.objects.filter(lease__tenant=user)
+        invoices = _invoice_list_scoped_queryset(user)
+
+        if wants_cursor_pagination(request):
+            paginator = InvoiceCursorPagination()
+            page = paginator.paginate_queryset(invoices, request)
+            return paginator.get_paginated_response(InvoiceSerializer(page, many=True).data)
 
         serializer = InvoiceSerializer(invoices, many=True)
         return Response(serializer.data)
@@ -441,7 +566,7 @@ def invoice_payments(request, pk):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     amount = serializer.validated_data['amount']
-    remaining = invoice.total_amount - invoice.amount_paid()
+    remaining = invoice.balance_due
     if remaining <= 0:
         return Response(
             {'detail': 'Invoice balance is already fully paid.'},
@@ -458,6 +583,8 @@ def invoice_payments(request, pk):
     tx_ref = serializer.validated_data.get('transaction_reference')
 
     manual_ref = f'manual-{uuid.uuid4().hex}'
+    # Allocated outside the atomic block so the month's counter row is not locked for its duration.
+    receipt_number = generate_receipt_number()
     try:
         with transaction.atomic():
             payment = Payment.objects.create(
@@ -471,10 +598,7 @@ def invoice_payments(request, pk):
                 paid_at=timezone.now(),
             )
             invoice.update_status()
-            receipt = Receipt.objects.create(
-                payment=payment,
-                receipt_number=generate_receipt_number(),
-            )
+            receipt = Receipt.objects.create(payment=payment, receipt_number=receipt_number)
             _notify_tenant_payment_received(invoice, amount, receipt.receipt_number)
     except IntegrityError:
         return Response(
@@ -491,6 +615,93 @@ def invoice_payments(request, pk):
     )
 
 
+@extend_schema(
+    methods=['POST'],
+    summary="Import a statement of payments (M-Pesa / bank) in bulk",
+    description=(
+        'Multipart `file` (`.csv` with a header row, or `.json`) or a JSON body `{"rows": [...]}`. '
+        'Columns: `transaction_reference` and `amount` (required), `paid_at` (ISO date/datetime, default now), '
+        '`invoice_number`, `account` (M-Pesa account reference), `property` (property id). Rows match an invoice '
+        'by `invoice_number`, by an `account` equal to an invoice number, or by an `account` that is a unit name, '
+        'or starts with one followed by a space or punctuation, on a property whose billing config sets '
+        '`mpesa_account_label` (oldest open invoice first). An account naming units on several properties is '
+        '`unmatched` unless the row or request gives the property. References already '
+        'recorded are reported as `duplicate`. Only invoices on properties the caller manages are matched. '
+        'Form fields: `payment_method` (default `mpesa`), `dry_run` (`true` reports matches without writing), '
+        '`property` (restrict matching to one property). Payments and receipts are written in chunks, one '
+        'transaction each; the response has a per-row report.'
+    ),
+    examples=[
+        OpenApiExample(
+            "JSON rows",
+            request_only=True,
+            value={
+                'payment_method': 'mpesa',
+                'rows': [
+                    {'transaction_reference': 'QHJ7K2MN01', 'amount': '25000.00', 'account': 'A12 0712345678'},
+                    {'transaction_reference': 'QHJ7K2MN02', 'amount': '45000.00', 'invoice_number': 'INV-0035'},
+                ],
+            },
+        ),
+        OpenApiExample(
+            "Import report",
+            response_only=True,
+            value={
+                'summary': {'total': 2, 'created': 1, 'matched': 0, 'duplicate': 0, 'unmatched': 1, 'error': 0},
+                'rows': [
+                    {
+                        'row': 1, 'transaction_reference': 'QHJ7K2MN01', 'status': 'created',
+                        'invoice': 35, 'invoice_number': 'INV-0035', 'payment': 812,
+                        'receipt_number': 'RCP-202604-0113', 'detail': '',
+                    },
+                    {
+                        'row': 2, 'transaction_reference': 'QHJ7K2MN02', 'status': 'unmatched',
+                        'invoice': None, 'invoice_number': None, 'payment': None,
+                        'receipt_number': None, 'detail': 'No invoice matches this row.',
+                    },
+                ],
+            },
+        ),
+    ],
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def payment_import(request):
+    from .payment_import import StatementError, import_payments, parse_statement
+
+    user = request.user
+    if not (is_admin(user) or is_landlord(user) or is_agent(user)):
+        return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+    method = str(request.data.get('payment_method') or Payment.PAYMENT_METHOD_MPESA).strip().lower()
+    allowed_methods = {c[0] for c in Payment.PAYMENT_METHOD_CHOICES}
+    if method not in allowed_methods:
+        return Response(
+            {'payment_method': [f'Invalid method. Must be one of: {", ".join(sorted(allowed_methods))}.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    properties = _financial_report_properties(user)
+    property_param = request.data.get('property')
+    if property_param not in (None, ''):
+        try:
+            properties = properties.filter(pk=int(property_param))
+        except (TypeError, ValueError):
+            return Response({'property': ['property must be an integer.']}, status=status.HTTP_400_BAD_REQUEST)
+        if not properties.exists():
+            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        rows = parse_statement(upload=request.FILES.get('file'), rows=request.data.get('rows'))
+    except StatementError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+    invoices = Invoice.objects.filter(lease__unit__property__in=properties)
+    report = import_payments(invoices, rows, payment_method=method, dry_run=dry_run)
+    return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+
 # ── Stripe Webhook ─────────────────────────────────────────────────────────────
 
 @extend_schema(exclude=True)
@@ -498,6 +709,11 @@ def invoice_payments(request, pk):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def stripe_webhook(request):
+    """
+    Verify the event and queue it in the StripeWebhookEvent inbox; the payment, receipt and
+    tenant notification are applied by `process_stripe_events`, so Stripe is acknowledged
+    without waiting on them. Redelivered events (same event id) are dropped.
+    """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
@@ -508,49 +724,12 @@ def stripe_webhook(request):
     except (ValueError, stripe.error.SignatureVerificationError):
         return Response({'detail': 'Invalid payload or signature.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if event['type'] == 'payment_intent.succeeded':
-        intent = event['data']['object']
-        _handle_payment_success(intent)
-
-    elif event['type'] == 'payment_intent.payment_failed':
-        intent = event['data']['object']
-        _handle_payment_failure(intent)
+    if event['type'] in HANDLED_EVENT_TYPES:
+        enqueue_event(event)
 
     return Response({'status': 'ok'})
 
 
-def _handle_payment_success(intent):
-    try:
-        payment = Payment.objects.get(stripe_payment_intent_id=intent['id'])
-    except Payment.DoesNotExist:
-        return
-
-    payment.status = 'completed'
-    payment.paid_at = timezone.now()
-    payment.stripe_charge_id = intent.get('latest_charge', '')
-    payment.save()
-
-    payment.invoice.update_status()
-
-    # Auto-generate receipt
-    if not hasattr(payment, 'receipt'):
-        receipt = Receipt.objects.create(
-            payment=payment,
-            receipt_number=generate_receipt_number(),
-        )
-        _notify_tenant_payment_received(payment.invoice, payment.amount, receipt.receipt_number)
-
-
-def _handle_payment_failure(intent):
-    try:
-        payment = Payment.objects.get(stripe_payment_intent_id=intent['id'])
-    except Payment.DoesNotExist:
-        return
-
-    payment.status = 'failed'
-    payment.save()
-
-
 # ── Receipts ───────────────────────────────────────────────────────────────────
 
 def _receipt_list_scoped_queryset(user):
@@ -631,7 +810,7 @@ def receipt_stats(request):
 
     qs = _receipt_list_scoped_queryset(request.user)
     qs = apply_receipt_list_filters(qs, parsed)
-    payload = build_receipt_stats_payload(qs)
+    payload = cached_receipt_stats_payload(request.user, parsed, qs)
     serializer = ReceiptStatsSerializer(instance=payload)
     return Response(serializer.data)
 
@@ -702,6 +881,24 @@ def receipt_stats(request):
                 'Items per page. Default: 20. Maximum: 100 (DRF clamps larger values to the max).'
             ),
         ),
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description=(
+                'Switches to keyset pagination (newest first): pass an empty value for the first page, '
+                'then the `next_cursor` of the previous response. The response is '
+                '`{next, next_cursor, results}`.'
+            ),
+        ),
+        OpenApiParameter(
+            name='include_count',
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Cursor mode only: also return `count` (an extra COUNT query). Default: false.',
+        ),
     ],
     responses={200: ReceiptListPaginatedSerializer},
     examples=[
@@ -757,7 +954,7 @@ def receipt_list(request):
     receipts = apply_receipt_list_filters(receipts, parsed)
     receipts = receipts.order_by('-issued_at', '-id')
 
-    paginator = ReceiptListPagination()
+    paginator = ReceiptCursorPagination() if wants_cursor_pagination(request) else ReceiptListPagination()
     page = paginator.paginate_queryset(receipts, request)
     serializer = ReceiptSerializer(page, many=True)
     return paginator.get_paginated_response(serializer.data)
@@ -1150,11 +1347,8 @@ def billing_preview(request, property_pk):
             'estimated_monthly_rent_total': str(rent_total),
         })
 
-    next_gen = _next_invoice_generation_on_or_after(today, config.rent_due_day, config.invoice_lead_days)
-    next_due = None
-    if next_gen:
-        anchor = _next_rent_anchor_from_gen(next_gen, config.rent_due_day)
-        next_due = anchor + timedelta(days=config.grace_period_days)
+    next_gen = next_invoice_generation_on_or_after(today, config.rent_due_day, config.invoice_lead_days)
+    next_due = rent_due_date(next_gen.year, next_gen.month, config.rent_due_day, config.grace_period_days)
 
     return Response({
         'configured': True,
@@ -1169,11 +1363,165 @@ def billing_preview(request, property_pk):
     })
 
 
+def _forecast_month_count(params):
+    raw = params.get('months')
+    if raw in (None, ''):
+        return DEFAULT_FORECAST_MONTHS
+    try:
+        count = int(raw)
+        if not (1 <= count <= MAX_FORECAST_MONTHS):
+            raise ValueError
+    except ValueError:
+        raise ValueError(f'months must be an integer between 1 and {MAX_FORECAST_MONTHS}.')
+    return count
+
+
+@extend_schema(
+    methods=['GET'],
+    summary="Forecast invoice dates and expected rent for the next N months across the portfolio",
+    description=(
+        'Covers the current calendar month and the following `months - 1`. Generation and due '
+        'dates follow each property\'s billing config (null when it has none). Expected rent per '
+        'month counts active leases that have started by the end of the month and whose end '
+        'date, if any, is not before its first day. `expiring_leases` lists active leases ending '
+        'between today and the end of the horizon.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='months', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False,
+            description=f'Months to forecast, 1–{MAX_FORECAST_MONTHS} (default {DEFAULT_FORECAST_MONTHS}).',
+        ),
+        OpenApiParameter(
+            name='property', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False,
+            description='Restrict the forecast to one property.',
+        ),
+    ],
+    examples=[
+        OpenApiExample("Forecast", value={
+            "months": ["2026-04", "2026-05"],
+            "properties": [
+                {
+                    "property": 1,
+                    "name": "Sunrise Apartments",
+                    "configured": True,
+                    "schedule": [
+                        {
+                            "month": "2026-04",
+                            "invoice_generation_date": "2026-04-03",
+                            "due_date": "2026-04-08",
+                            "lease_count": 4,
+                            "expected_rent": "180000.00",
+                        },
+                        {
+                            "month": "2026-05",
+                            "invoice_generation_date": "2026-05-03",
+                            "due_date": "2026-05-08",
+                            "lease_count": 3,
+                            "expected_rent": "135000.00",
+                        },
+                    ],
+                    "expected_rent_total": "315000.00",
+                    "expiring_leases": [
+                        {
+                            "lease": 12, "unit": "A4", "tenant": "Jane Doe",
+                            "rent_amount": "45000.00", "end_date": "2026-04-30",
+                        },
+                    ],
+                },
+            ],
+            "totals": {
+                "by_month": [
+                    {"month": "2026-04", "lease_count": 4, "expected_rent": "180000.00"},
+                    {"month": "2026-05", "lease_count": 3, "expected_rent": "135000.00"},
+                ],
+                "expected_rent": "315000.00",
+                "expiring_lease_count": 1,
+            },
+        }),
+    ],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def billing_forecast(request):
+    user = request.user
+    if not (is_admin(user) or is_landlord(user) or is_agent(user)):
+        return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        count = _forecast_month_count(request.query_params)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    properties = _financial_report_properties(user)
+    property_param = request.query_params.get('property')
+    if property_param:
+        try:
+            properties = properties.filter(pk=int(property_param))
+        except ValueError:
+            return Response({'detail': 'property must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    properties = list(properties.order_by('name', 'pk').values_list('pk', 'name'))
+
+    today = timezone.now().date()
+    months = forecast_months(today, count)
+    forecast = build_billing_forecast([pk for pk, _ in properties], today, months)
+
+    month_totals = [[0, Decimal('0')] for _ in months]
+    results = []
+    expiring_count = 0
+    for pk, name in properties:
+        entry = forecast[pk]
+        schedule = []
+        for i, (month, generation, due, lease_count, rent) in enumerate(entry['months']):
+            month_totals[i][0] += lease_count
+            month_totals[i][1] += rent
+            schedule.append({
+                'month': f'{month:%Y-%m}',
+                'invoice_generation_date': generation,
+                'due_date': due,
+                'lease_count': lease_count,
+                'expected_rent': _money(rent),
+            })
+        expiring_count += len(entry['expiring'])
+        results.append({
+            'property': pk,
+            'name': name,
+            'configured': entry['config'] is not None,
+            'schedule': schedule,
+            'expected_rent_total': _money(sum((rent for *_, rent in entry['months']), Decimal('0'))),
+            'expiring_leases': [
+                {**lease, 'rent_amount': _money(lease['rent_amount'])} for lease in entry['expiring']
+            ],
+        })
+
+    return Response({
+        'months': [f'{month:%Y-%m}' for month in months],
+        'properties': results,
+        'totals': {
+            'by_month': [
+                {'month': f'{month:%Y-%m}', 'lease_count': leases, 'expected_rent': _money(rent)}
+                for month, (leases, rent) in zip(months, month_totals)
+            ],
+            'expected_rent': _money(sum((rent for _, rent in month_totals), Decimal('0'))),
+            'expiring_lease_count': expiring_count,
+        },
+    })
+
+
 # ── Financial Report ────────────────────────────────────────────────────────────
 
 @extend_schema(
     methods=['GET'],
     summary="Financial report for a property",
+    parameters=[
+        OpenApiParameter(
+            name='granularity',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            enum=list(GRANULARITIES),
+            description='Bucket size of occupancy_series (default monthly).',
+        ),
+    ],
     examples=[
         OpenApiExample("Monthly report", value={
             "property": 1,
@@ -1222,123 +1570,468 @@ def financial_report(request, property_pk):
     if not (is_admin(user) or prop.owner == user or is_agent_for(user, prop)):
         return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
 
-    year_param = request.query_params.get('year')
-    month_param = request.query_params.get('month')
+    try:
+        months, period_label = _report_period(request.query_params)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    granularity = request.query_params.get('granularity', MONTHLY)
+    if granularity not in GRANULARITIES:
+        return Response(
+            {'detail': f'granularity must be one of: {", ".join(GRANULARITIES)}.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    rows = monthly_financials(prop, months)
+
+    if granularity == MONTHLY:
+        series = [(r.month, r.occupied_units, r.total_units) for r in rows]
+    else:
+        period_list = occupancy_periods(months[0], next_month(months[-1]) - timedelta(days=1), granularity)
+        series = [
+            (start, occupied, total)
+            for (start, _), (occupied, total) in zip(
+                period_list, OccupancyTimeline([prop.pk]).series(period_list),
+            )
+        ]
+    occupancy_series = [
+        {'period': occupancy_period_label(start, granularity), **_occupancy_payload(occupied, total)}
+        for start, occupied, total in series
+    ]
+    occupancy_avg_pct = _average_pct(row['occupancy_pct'] for row in occupancy_series)
+    occupancy = None
+    if len(months) == 1:
+        occupancy = _occupancy_payload(rows[0].occupied_units, rows[0].total_units)
+
+    payload = {
+        'property': property_pk,
+        'period': period_label,
+        **_financials_payload(combine_financials(rows)),
+        'occupancy': occupancy,
+        'occupancy_series': occupancy_series,
+        'occupancy_avg_pct': occupancy_avg_pct,
+    }
+    return Response(payload)
 
-    if not year_param:
-        return Response({'detail': 'year query parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+@extend_schema(
+    methods=['GET'],
+    summary="Financial report across every property the caller can see",
+    description=(
+        'Same income / expense / invoice / occupancy breakdown as `GET /api/billing/reports/{property}/`, '
+        'for every property the caller may view there (admin: all; landlord: owned; agent: owned or '
+        'appointed), plus portfolio totals. Exactly one of month or quarter may narrow the year.'
+    ),
+    parameters=[
+        OpenApiParameter(name='year', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=True),
+        OpenApiParameter(
+            name='month', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False,
+            description='1-12.',
+        ),
+        OpenApiParameter(
+            name='quarter', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False,
+            description='1-4 (Q1 = January-March).',
+        ),
+    ],
+    examples=[
+        OpenApiExample("Quarterly portfolio", value={
+            "period": "2024-Q1",
+            "properties": [
+                {
+                    "property": 1,
+                    "name": "Sunrise Apartments",
+                    "income": {
+                        "rent_invoiced": "405000.00",
+                        "late_fees_invoiced": "6750.00",
+                        "total_invoiced": "411750.00",
+                        "total_collected": "390000.00",
+                        "additional_income": "13500.00",
+                        "additional_income_by_type": {"Water": "4500.00", "Electricity": "9000.00"},
+                        "total_income": "403500.00",
+                    },
+                    "expenses": {"total": "42000.00", "by_category": {"maintenance": "42000.00"}},
+                    "net_income": "361500.00",
+                    "invoices": {"paid": 8, "pending": 0, "overdue": 1, "partial": 0, "cancelled": 0},
+                    "occupancy_avg_pct": "80.00",
+                },
+            ],
+            "totals": {
+                "income": {
+                    "rent_invoiced": "405000.00",
+                    "late_fees_invoiced": "6750.00",
+                    "total_invoiced": "411750.00",
+                    "total_collected": "390000.00",
+                    "additional_income": "13500.00",
+                    "additional_income_by_type": {"Water": "4500.00", "Electricity": "9000.00"},
+                    "total_income": "403500.00",
+                },
+                "expenses": {"total": "42000.00", "by_category": {"maintenance": "42000.00"}},
+                "net_income": "361500.00",
+                "invoices": {"paid": 8, "pending": 0, "overdue": 1, "partial": 0, "cancelled": 0},
+                "occupancy_avg_pct": "80.00",
+            },
+        }),
+    ],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def portfolio_report(request):
+    user = request.user
+    if not (is_admin(user) or is_landlord(user) or is_agent(user)):
+        return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
 
     try:
-        year = int(year_param)
-    except ValueError:
-        return Response({'detail': 'year must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        months, period_label = _report_period(request.query_params, allow_quarter=True)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    month = None
-    if month_param:
+    properties = list(_financial_report_properties(user).order_by('name', 'pk').values_list('pk', 'name'))
+    property_ids = [pk for pk, _ in properties]
+    figures, occupancy = build_portfolio_figures(property_ids, months)
+
+    results = [
+        {
+            'property': pk,
+            'name': name,
+            **_financials_payload(figures[pk]),
+            'occupancy_avg_pct': _average_pct(
+                occupancy_pct(occupied, total) for occupied, total in occupancy[pk]
+            ),
+        }
+        for pk, name in properties
+    ]
+    # Portfolio occupancy per month is units-weighted (all occupied over all units), then averaged.
+    monthly_counts = zip(*(occupancy[pk] for pk in property_ids)) if property_ids else []
+    portfolio_pcts = [
+        occupancy_pct(sum(o for o, _ in counts), sum(t for _, t in counts))
+        for counts in monthly_counts
+    ]
+    payload = {
+        'period': period_label,
+        'properties': results,
+        'totals': {
+            **_financials_payload(combine_financials(figures.values())),
+            'occupancy_avg_pct': _average_pct(portfolio_pcts),
+        },
+    }
+    return Response(payload)
+
+
+def _aging_payload(row):
+    return {
+        **{key: _money(row[key]) for key in (*AGING_BUCKET_KEYS, 'total')},
+        'invoice_count': row['invoice_count'],
+    }
+
+
+@extend_schema(
+    methods=['GET'],
+    summary="Arrears aging by property, unit and tenant",
+    description=(
+        'Outstanding balance (`total_amount - amount_paid`) of pending, partial and overdue '
+        'invoices past their due date, bucketed by days past due: 1–30, 31–60, 61–90 and over 90. '
+        'Sees the same invoices as `GET /api/billing/invoices/`.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='property', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False,
+            description='Restrict the report to one property.',
+        ),
+    ],
+    examples=[
+        OpenApiExample("Aging", value={
+            "as_of": "2026-04-15",
+            "rows": [
+                {
+                    "property": 1, "property_name": "Sunrise Apartments",
+                    "unit": 4, "unit_name": "A4", "tenant": 12, "tenant_name": "Jane Doe",
+                    "days_0_30": "45000.00", "days_31_60": "5000.00", "days_61_90": "0.00",
+                    "days_90_plus": "0.00", "total": "50000.00", "invoice_count": 2,
+                },
+            ],
+            "properties": [
+                {
+                    "property": 1, "name": "Sunrise Apartments",
+                    "days_0_30": "45000.00", "days_31_60": "5000.00", "days_61_90": "0.00",
+                    "days_90_plus": "0.00", "total": "50000.00", "invoice_count": 2,
+                },
+            ],
+            "totals": {
+                "days_0_30": "45000.00", "days_31_60": "5000.00", "days_61_90": "0.00",
+                "days_90_plus": "0.00", "total": "50000.00", "invoice_count": 2,
+            },
+        }),
+    ],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def arrears_aging(request):
+    invoices = _invoice_list_scoped_queryset(request.user)
+    property_param = request.query_params.get('property')
+    if property_param:
         try:
-            month = int(month_param)
-            if not (1 <= month <= 12):
-                raise ValueError
+            invoices = invoices.filter(lease__unit__property_id=int(property_param))
         except ValueError:
-            return Response({'detail': 'month must be an integer between 1 and 12.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'property must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    period_label = f"{year}-{month:02d}" if month else str(year)
+    today = timezone.now().date()
+    rows = aging_rows(invoices, today)
 
-    # Build filters
-    if month:
-        inv_f = {'period_start__year': year, 'period_start__month': month}
-        pay_f = {'paid_at__year': year, 'paid_at__month': month}
-        ai_f = {'date__year': year, 'date__month': month}
-        exp_f = {'date__year': year, 'date__month': month}
-    else:
-        inv_f = {'period_start__year': year}
-        pay_f = {'paid_at__year': year}
-        ai_f = {'date__year': year}
-        exp_f = {'date__year': year}
-
-    # Invoices for the period
-    invoices_qs = Invoice.objects.filter(lease__unit__property=prop, **inv_f)
-    rent_invoiced = invoices_qs.aggregate(t=Sum('rent_amount'))['t'] or Decimal('0')
-    late_fees_invoiced = invoices_qs.aggregate(t=Sum('late_fee_amount'))['t'] or Decimal('0')
-    invoice_counts = {
-        item['status']: item['c']
-        for item in invoices_qs.values('status').annotate(c=Count('id'))
-    }
+    by_property = {}
+    for row in rows:
+        by_property.setdefault((row['property'], row['property_name']), []).append(row)
 
-    # Rent payments received in the period
-    total_collected = (
-        Payment.objects.filter(status='completed', invoice__lease__unit__property=prop, **pay_f)
-        .aggregate(t=Sum('amount'))['t'] or Decimal('0')
+    return Response({
+        'as_of': today,
+        'rows': [
+            {**{key: row[key] for key in (
+                'property', 'property_name', 'unit', 'unit_name', 'tenant', 'tenant_name',
+            )}, **_aging_payload(row)}
+            for row in rows
+        ],
+        'properties': [
+            {'property': pk, 'name': name, **_aging_payload(sum_aging_buckets(property_rows))}
+            for (pk, name), property_rows in by_property.items()
+        ],
+        'totals': _aging_payload(sum_aging_buckets(rows)),
+    })
+
+
+# ── Exports ─────────────────────────────────────────────────────────────────────
+
+_EXPORT_FORMAT_PARAMETER = OpenApiParameter(
+    name='file_format',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    required=False,
+    enum=list(FILE_FORMATS),
+    description='`csv` (default) or `xlsx`.',
+)
+
+
+def _export_format(params):
+    """Requested export format; raises ValueError with the client message on bad input."""
+    file_format = (params.get('file_format') or CSV).strip().lower()
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f'file_format must be one of: {", ".join(FILE_FORMATS)}.')
+    return file_format
+
+
+@extend_schema(
+    methods=['GET'],
+    summary="Download receipts as CSV / XLSX",
+    description=(
+        'Every receipt `GET /api/billing/receipts/` would return for the same `property`, `method`, '
+        '`month` and `search` filters, newest first, streamed as one file (no pagination).'
+    ),
+    parameters=[
+        _EXPORT_FORMAT_PARAMETER,
+        OpenApiParameter(name='property', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False),
+        OpenApiParameter(
+            name='method', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+            enum=_PAYMENT_METHOD_QUERY_ENUM,
+        ),
+        OpenApiParameter(
+            name='month', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+            description='`YYYY-MM`.',
+        ),
+        OpenApiParameter(name='search', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False),
+    ],
+    responses={(200, 'text/csv'): OpenApiTypes.BINARY, (200, CONTENT_TYPES[XLSX]): OpenApiTypes.BINARY},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def receipt_export(request):
+    try:
+        file_format = _export_format(request.query_params)
+    except ValueError as e:
+        return Response({'file_format': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+    allowed_methods = {c[0] for c in Payment.PAYMENT_METHOD_CHOICES}
+    errors, parsed = validate_receipt_list_query_params(request.query_params, allowed_methods)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    receipts = apply_receipt_list_filters(_receipt_list_scoped_queryset(request.user), parsed)
+    return export_response(
+        request, receipts.order_by('-issued_at', '-id'), RECEIPT_COLUMNS, file_format=file_format, filename='receipts',
     )
 
-    # Additional income
-    ai_qs = AdditionalIncome.objects.filter(unit__property=prop, **ai_f)
-    additional_total = ai_qs.aggregate(t=Sum('amount'))['t'] or Decimal('0')
-    ai_by_type = {
-        row['charge_type__name']: str(row['t'])
-        for row in ai_qs.values('charge_type__name').annotate(t=Sum('amount'))
-    }
 
-    # Expenses
-    exp_qs = Expense.objects.filter(property=prop, **exp_f)
-    expense_total = exp_qs.aggregate(t=Sum('amount'))['t'] or Decimal('0')
-    exp_by_cat = {
-        row['category']: str(row['t'])
-        for row in exp_qs.values('category').annotate(t=Sum('amount'))
+@extend_schema(
+    methods=['GET'],
+    summary="Download invoices as CSV / XLSX",
+    description='Every invoice `GET /api/billing/invoices/` would return, newest first, streamed as one file.',
+    parameters=[_EXPORT_FORMAT_PARAMETER],
+    responses={(200, 'text/csv'): OpenApiTypes.BINARY, (200, CONTENT_TYPES[XLSX]): OpenApiTypes.BINARY},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def invoice_export(request):
+    try:
+        file_format = _export_format(request.query_params)
+    except ValueError as e:
+        return Response({'file_format': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+    invoices = _invoice_list_scoped_queryset(request.user).order_by('-created_at', '-id')
+    return export_response(request, invoices, INVOICE_COLUMNS, file_format=file_format, filename='invoices')
+
+
+@extend_schema(
+    methods=['GET'],
+    summary="Download a property's expenses as CSV / XLSX",
+    description='Same access rules as `GET /api/billing/properties/{property_pk}/expenses/`; newest first.',
+    parameters=[_EXPORT_FORMAT_PARAMETER],
+    responses={(200, 'text/csv'): OpenApiTypes.BINARY, (200, CONTENT_TYPES[XLSX]): OpenApiTypes.BINARY},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def expense_export(request, property_pk):
+    try:
+        prop = Property.objects.get(pk=property_pk)
+    except Property.DoesNotExist:
+        return Response({'detail': 'Property not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    user = request.user
+    if not (is_admin(user) or prop.owner == user or is_agent_for(user, prop)):
+        return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        file_format = _export_format(request.query_params)
+    except ValueError as e:
+        return Response({'file_format': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+    expenses = Expense.objects.filter(property=prop).order_by('-date', '-id')
+    return export_response(
+        request, expenses, EXPENSE_COLUMNS, file_format=file_format, filename=f'expenses-property-{prop.pk}',
+    )
+
+
+# ── Tenant ledger ───────────────────────────────────────────────────────────────
+
+LEDGER_FILE_FORMATS = (CSV, PDF)
+
+
+def _ledger_payload(entry):
+    return {
+        'date': entry['date'],
+        'kind': entry['kind'],
+        'description': entry['description'],
+        'reference': entry['reference'],
+        'lease': entry['lease'],
+        'source_id': entry['source_id'],
+        'debit': _money(entry['debit']),
+        'credit': _money(entry['credit']),
+        'balance': _money(entry['balance']),
     }
 
-    total_income = total_collected + additional_total
-    net_income = total_income - expense_total
 
-    if month:
-        p_start = date(year, month, 1)
-        p_end = date(year, month, calendar.monthrange(year, month)[1])
-        occupancy = _occupancy_for_period(prop, p_start, p_end)
-        occupancy_series = [{'period': period_label, **occupancy}]
-        occupancy_avg_pct = occupancy['occupancy_pct']
+def _ledger_response(request, ledger, title, filename):
+    """Cursor page of `ledger`, or the whole statement when `file_format` is csv / pdf."""
+    file_format = request.query_params.get('file_format')
+    if file_format is None:
+        paginator = LedgerCursorPagination()
+        page = paginator.paginate_queryset(ledger, request)
+        return paginator.get_paginated_response([_ledger_payload(entry) for entry in page])
+
+    file_format = file_format.strip().lower()
+    if file_format not in LEDGER_FILE_FORMATS:
+        return Response(
+            {'file_format': [f'file_format must be one of: {", ".join(LEDGER_FILE_FORMATS)}.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    entries = ledger.entries()
+    if file_format == PDF:
+        response = HttpResponse(render_text_pdf(ledger_pdf_lines(title, entries)), content_type=CONTENT_TYPES[PDF])
     else:
-        occupancy = None
-        occupancy_series = []
-        month_pcts = []
-        for m in range(1, 13):
-            p_start = date(year, m, 1)
-            p_end = date(year, m, calendar.monthrange(year, m)[1])
-            row = _occupancy_for_period(prop, p_start, p_end)
-            occupancy_series.append({'period': f'{year}-{m:02d}', **row})
-            if row['occupancy_pct'] is not None:
-                month_pcts.append(Decimal(row['occupancy_pct']))
-        occupancy_avg_pct = None
-        if month_pcts:
-            occupancy_avg_pct = str(
-                (sum(month_pcts) / Decimal(len(month_pcts))).quantize(Decimal('0.01'))
-            )
+        response = streaming_response(request, stream_csv(LEDGER_HEADER, ledger_rows(entries)), CONTENT_TYPES[CSV])
+    response['Content-Disposition'] = download_filename(filename, file_format)
+    return response
 
-    payload = {
-        'property': property_pk,
-        'period': period_label,
-        'income': {
-            'rent_invoiced': str(rent_invoiced),
-            'late_fees_invoiced': str(late_fees_invoiced),
-            'total_invoiced': str(rent_invoiced + late_fees_invoiced),
-            'total_collected': str(total_collected),
-            'additional_income': str(additional_total),
-            'additional_income_by_type': ai_by_type,
-            'total_income': str(total_income),
-        },
-        'expenses': {
-            'total': str(expense_total),
-            'by_category': exp_by_cat,
+
+_LEDGER_PARAMETERS = [
+    OpenApiParameter(
+        name='cursor', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+        description='Opaque `next_cursor` from the previous page.',
+    ),
+    OpenApiParameter(name='page_size', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False),
+    OpenApiParameter(name='include_count', type=OpenApiTypes.BOOL, location=OpenApiParameter.QUERY, required=False),
+    OpenApiParameter(
+        name='file_format', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+        enum=list(LEDGER_FILE_FORMATS),
+        description='Download the whole statement as `csv` or `pdf` instead of a JSON page.',
+    ),
+]
+
+_LEDGER_EXAMPLE = OpenApiExample("Ledger page", response_only=True, value={
+    "next": None,
+    "next_cursor": None,
+    "results": [
+        {
+            "date": "2026-03-01", "kind": "rent", "description": "Rent 2026-03", "reference": "INV-0042",
+            "lease": 7, "source_id": 42, "debit": "45000.00", "credit": "0.00", "balance": "45000.00",
         },
-        'net_income': str(net_income),
-        'invoices': {
-            'paid': invoice_counts.get('paid', 0),
-            'pending': invoice_counts.get('pending', 0),
-            'overdue': invoice_counts.get('overdue', 0),
-            'partial': invoice_counts.get('partial', 0),
-            'cancelled': invoice_counts.get('cancelled', 0),
+        {
+            "date": "2026-03-04", "kind": "payment", "description": "Payment (M-Pesa)", "reference": "RCP-202603-0012",
+            "lease": 7, "source_id": 88, "debit": "0.00", "credit": "40000.00", "balance": "5000.00",
         },
-        'occupancy': occupancy,
-        'occupancy_series': occupancy_series,
-        'occupancy_avg_pct': occupancy_avg_pct,
-    }
-    return Response(payload)
+    ],
+})
+
+_LEDGER_DESCRIPTION = (
+    'Rent and late fees from invoices (cancelled invoices excluded), unit charges recorded as '
+    'additional income during the lease, and completed payments, oldest first with a running '
+    '`balance` (debits minus credits). Cursor-paginated; `file_format=csv|pdf` downloads the '
+    'whole statement.'
+)
+
+
+@extend_schema(
+    methods=['GET'],
+    summary="Ledger (statement) of one lease",
+    description=_LEDGER_DESCRIPTION,
+    parameters=_LEDGER_PARAMETERS,
+    examples=[_LEDGER_EXAMPLE],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def lease_ledger(request, lease_pk):
+    try:
+        lease = Lease.objects.select_related('unit__property', 'tenant').get(pk=lease_pk)
+    except Lease.DoesNotExist:
+        return Response({'detail': 'Lease not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    user = request.user
+    prop = lease.unit.property
+    if not (lease.tenant_id == user.id or is_admin(user) or prop.owner_id == user.id or is_agent_for(user, prop)):
+        return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+    tenant = lease.tenant
+    title = f'Statement: {tenant.get_full_name() or tenant.username} - {prop.name}, {lease.unit.name}'
+    return _ledger_response(request, Ledger([lease.pk]), title, f'ledger-lease-{lease.pk}')
+
+
+@extend_schema(
+    methods=['GET'],
+    summary="Ledger (statement) across a tenant's leases",
+    description=(
+        _LEDGER_DESCRIPTION + ' Landlords and agents only see the leases on properties they manage; '
+        'tenants may only request their own ledger.'
+    ),
+    parameters=_LEDGER_PARAMETERS,
+    examples=[_LEDGER_EXAMPLE],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def tenant_ledger(request, tenant_pk):
+    user = request.user
+    leases = Lease.objects.filter(tenant_id=tenant_pk)
+    if user.pk != tenant_pk and not is_admin(user):
+        leases = leases.filter(unit__property__in=_financial_report_properties(user))
+    leases = list(leases.select_related('tenant').order_by('pk'))
+    if not leases:
+        return Response({'detail': 'Tenant not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    tenant = leases[0].tenant
+    title = f'Statement: {tenant.get_full_name() or tenant.username}'
+    return _ledger_response(request, Ledger(lease.pk for lease in leases), title, f'ledger-tenant-{tenant_pk}')
@@ -333,6 +333,27 @@ class DisputeMessageTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(len(resp.data), 2)
 
+    def _post_message_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.tenant_token.key}')
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.post(
+                f'/api/disputes/{self.dispute.pk}/messages/', {'body': 'Fan-out.'}, format='json',
+            )
+        self.assertEqual(resp.status_code, 201)
+        return len(queries)
+
+    def test_post_message_query_count_independent_of_agents(self):
+        from notifications.models import Notification
+        few = self._post_message_queries()
+        for i in range(5):
+            agent, _ = make_user(f'agent_m{i}', Role.AGENT)
+            PropertyAgent.objects.create(property=self.property, agent=agent, appointed_by=self.landlord)
+        many = self._post_message_queries()
+        self.assertEqual(few, many)
+        self.assertEqual(Notification.objects.filter(notification_type='dispute').count(), 1 + 6)
+
     def test_non_participant_cannot_post(self):
         self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.outsider_token.key}')
         resp = self.client.post(
@@ -260,20 +260,19 @@ def dispute_message_list_create(request, pk):
         serializer = DisputeMessageSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save(dispute=dispute, sender=request.user)
-            from notifications.utils import create_notification
+            from notifications.utils import create_notifications
             sender_name = request.user.get_full_name() or request.user.username
             participants = {dispute.created_by, dispute.property.owner}
             for pa in PropertyAgent.objects.filter(property=dispute.property).select_related('agent'):
                 participants.add(pa.agent)
-            for participant in participants:
-                if participant != request.user:
-                    create_notification(
-                        participant,
-                        'dispute',
-                        'New Message on Dispute',
-                        f"{sender_name} posted a message on dispute '{dispute.title}'.",
-                        action_url=f'/api/disputes/{dispute.pk}/',
-                        email_pref_key='dispute_new_message',
-                    )
+            participants.discard(request.user)
+            create_notifications(
+                participants,
+                'dispute',
+                'New Message on Dispute',
+                f"{sender_name} posted a message on dispute '{dispute.title}'.",
+                action_url=f'/api/disputes/{dispute.pk}/',
+                email_pref_key='dispute_new_message',
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -7,6 +7,11 @@ until pg_isready -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER"; do
 done
 echo "Postgres is ready."
 
+# Worker services (see docker-compose.yml) pass their own command; the web service migrates and serves.
+if [ "$#" -gt 0 ]; then
+  exec "$@"
+fi
+
 echo "Pending migration plan:"
 python manage.py showmigrations --plan
 
@@ -19,6 +24,8 @@ python manage.py showmigrations
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# The REST API runs on WSGI; the notification event stream has its own ASGI service
+# (`events` in docker-compose.yml, see treeHouse/asgi.py).
 echo "Starting server..."
 exec gunicorn treeHouse.wsgi:application \
     --bind 0.0.0.0:8000 \
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from messaging.models import Conversation
+from messaging.summaries import refresh_conversation_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute each conversation\'s last message and every participant\'s unread count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conversation',
+            type=int,
+            action='append',
+            dest='conversation_ids',
+            help='Only refresh this conversation id (repeatable). Default: every conversation.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Conversations per transaction (default 1000).',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        conversations = Conversation.objects.order_by('pk')
+        if options['conversation_ids']:
+            conversations = conversations.filter(pk__in=options['conversation_ids'])
+        conversation_ids = list(conversations.values_list('pk', flat=True))
+        if options['conversation_ids']:
+            missing = set(options['conversation_ids']) - set(conversation_ids)
+            if missing:
+                raise CommandError(f'Unknown conversation id(s): {", ".join(map(str, sorted(missing)))}')
+
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        refreshed = 0
+        for i in range(0, len(conversation_ids), batch_size):
+            # Short transactions, so live message sends wait on at most one batch of rows.
+            with transaction.atomic():
+                refreshed += refresh_conversation_summaries(conversation_ids[i:i + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'  Refreshed {refreshed} conversation{"s" if refreshed != 1 else ""} '
+            f'in {time.monotonic() - started:.2f}s'
+        ))
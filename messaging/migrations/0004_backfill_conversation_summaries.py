@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_summaries(apps, schema_editor):
+    """Same recompute as messaging.summaries.refresh_conversation_summaries, on historical models."""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    Message = apps.get_model('messaging', 'Message')
+
+    latest = Message.objects.filter(conversation_id=OuterRef('pk')).order_by('-created_at', '-id')
+    Conversation.objects.update(
+        last_message=Subquery(latest.values('id')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+    )
+
+    def unread(since_last_read):
+        messages = Message.objects.filter(conversation_id=OuterRef('conversation_id')).exclude(
+            sender_id=OuterRef('user_id'),
+        )
+        if since_last_read:
+            messages = messages.filter(created_at__gt=OuterRef('last_read_at'))
+        counts = messages.order_by().values('conversation_id').annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    participants = ConversationParticipant.objects.all()
+    participants.filter(last_read_at__isnull=True).update(unread_count=unread(since_last_read=False))
+    participants.filter(last_read_at__isnull=False).update(unread_count=unread(since_last_read=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_conversation_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
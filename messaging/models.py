@@ -19,6 +19,15 @@ class Conversation(models.Model):
         related_name='created_conversations',
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized from Message by messaging.signals (rebuild: manage.py backfill_conversation_summaries).
+    last_message = models.ForeignKey(
+        'Message',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Conversation({self.id}: {self.subject or 'No subject'})"
@@ -37,6 +46,8 @@ class ConversationParticipant(models.Model):
     )
     last_read_at = models.DateTimeField(null=True, blank=True)
     joined_at = models.DateTimeField(auto_now_add=True)
+    # Messages from other participants since last_read_at, kept by messaging.signals.
+    unread_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('conversation', 'user')
@@ -61,6 +72,10 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pages of one conversation (after_id / before_id in message_list_create).
+            models.Index(fields=['conversation', 'created_at', 'id'], name='msg_conv_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} in Conversation({self.conversation_id})"
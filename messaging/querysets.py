@@ -7,39 +7,22 @@ Migration notes (FE):
 - last_message.sender is the sender's user id (aligned with GET .../messages/ rows).
 - last_message.sender_username holds the old string that used to live under sender.
 """
-from django.db.models import (
-    CharField,
-    Count,
-    DateTimeField,
-    F,
-    OuterRef,
-    Prefetch,
-    Q,
-    Subquery,
-    Value,
-)
-from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+from django.db.models import DateTimeField, F, Prefetch
+from django.db.models.functions import Coalesce
 
-from .models import Conversation, ConversationParticipant, Message
+from .models import Conversation, ConversationParticipant
 
 
 def conversations_queryset_for_user(user):
     """
-    Single-query friendly Conversation queryset: unread_count and last_message
-    fields are annotated; participants are prefetched with user + role.
+    Conversation queryset for list/detail: the viewer's unread_count and the last message
+    (with its sender) come from the denormalized columns (see messaging.summaries) through
+    the viewer's participant row, so there is no per-conversation subquery or aggregate;
+    participants are prefetched with user + role.
     """
-    user_last_read = Subquery(
-        ConversationParticipant.objects.filter(
-            conversation_id=OuterRef('pk'),
-            user_id=user.pk,
-        ).values('last_read_at')[:1]
-    )
-
-    latest_base = Message.objects.filter(conversation_id=OuterRef('pk')).order_by('-created_at')
-
-    qs = (
+    return (
         Conversation.objects.filter(participants__user=user)
-        .select_related('created_by', 'created_by__role', 'property')
+        .select_related('created_by', 'created_by__role', 'property', 'last_message__sender')
         .prefetch_related(
             Prefetch(
                 'participants',
@@ -48,50 +31,13 @@ def conversations_queryset_for_user(user):
                 ).order_by('id'),
             ),
         )
-        .distinct()
-        .annotate(_user_last_read=user_last_read)
-        .annotate(
-            _unread_count=Count(
-                'messages',
-                filter=Q(messages__created_at__gt=F('_user_last_read'))
-                | Q(_user_last_read__isnull=True),
-            )
+        # Same join as the filter above: the viewer's own participant row.
+        .annotate(_unread_count=F('participants__unread_count'))
+        .order_by(
+            Coalesce('last_message_at', 'created_at', output_field=DateTimeField()).desc(),
+            '-id',
         )
-        .annotate(
-            _lm_id=Subquery(latest_base.values('id')[:1]),
-            _lm_body=Subquery(latest_base.values('body')[:1]),
-            _lm_created_at=Subquery(latest_base.values('created_at')[:1]),
-            _lm_sender_id=Subquery(latest_base.values('sender_id')[:1]),
-            _lm_sender_username=Subquery(
-                latest_base.values('sender__username')[:1], output_field=CharField()
-            ),
-            _lm_sender_name=Subquery(
-                Message.objects.filter(conversation_id=OuterRef('pk'))
-                .order_by('-created_at')
-                .annotate(
-                    _sn=Coalesce(
-                        NullIf(
-                            Trim(
-                                Concat(
-                                    F('sender__first_name'),
-                                    Value(' '),
-                                    F('sender__last_name'),
-                                )
-                            ),
-                            Value(''),
-                        ),
-                        F('sender__username'),
-                    )
-                )
-                .values('_sn')[:1],
-                output_field=CharField(),
-            ),
-        )
-    )
-    qs = qs.annotate(
-        _sort_ts=Coalesce(F('_lm_created_at'), F('created_at'), output_field=DateTimeField()),
     )
-    return qs.order_by(F('_sort_ts').desc(nulls_last=True), '-id')
 
 
 def get_conversation_for_user(*, user, pk):
@@ -245,32 +245,13 @@ class ConversationSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return 0
-        user = request.user
-        try:
-            participant = obj.participants.get(user=user)
-        except ConversationParticipant.DoesNotExist:
-            return 0
-        last_read = participant.last_read_at
-        if last_read is None:
-            return obj.messages.count()
-        return obj.messages.filter(created_at__gt=last_read).count()
+        for participant in obj.participants.all():
+            if participant.user_id == request.user.id:
+                return participant.unread_count
+        return 0
 
     def get_last_message(self, obj):
-        lm_id = getattr(obj, '_lm_id', None)
-        if lm_id is not None:
-            sender_id = getattr(obj, '_lm_sender_id', None)
-            sender_name = getattr(obj, '_lm_sender_name', None) or ''
-            sender_username = getattr(obj, '_lm_sender_username', None) or ''
-            return {
-                'id': lm_id,
-                'sender': sender_id,
-                'sender_id': sender_id,
-                'sender_username': sender_username,
-                'sender_name': sender_name,
-                'body': getattr(obj, '_lm_body', None),
-                'created_at': getattr(obj, '_lm_created_at', None),
-            }
-        last = obj.messages.order_by('-created_at').select_related('sender').first()
+        last = obj.last_message
         if last is None:
             return None
         sender_name = (
@@ -0,0 +1,36 @@
+"""Keep the denormalized conversation summaries (messaging.summaries) current."""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Conversation, Message
+from .summaries import record_new_message, refresh_conversation_summaries
+
+
+@receiver(post_save, sender=Message, dispatch_uid='conversation_summary_message_sent')
+def _message_sent(sender, instance, created, **kwargs):
+    if created:
+        record_new_message(instance)
+
+
+def _deleting_conversations(origin):
+    """True when the delete() call that cascaded here removes conversations themselves."""
+    if isinstance(origin, Conversation):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Conversation
+
+
+@receiver(post_delete, sender=Message, dispatch_uid='conversation_summary_message_deleted')
+def _message_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_conversations(origin):
+        return
+    # post_delete fires per message once the whole batch is gone, so one refresh per
+    # conversation covers every message the same delete() call removed from it.
+    refreshed = getattr(origin, '_conversation_summaries_refreshed', None)
+    if refreshed is None:
+        refreshed = set()
+        if origin is not None:
+            origin._conversation_summaries_refreshed = refreshed
+    if instance.conversation_id not in refreshed:
+        refreshed.add(instance.conversation_id)
+        refresh_conversation_summaries([instance.conversation_id])
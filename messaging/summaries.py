@@ -0,0 +1,55 @@
+"""
+Denormalized conversation summaries: Conversation.last_message / last_message_at and
+ConversationParticipant.unread_count.
+
+`record_new_message` keeps them current as messages are sent (see messaging.signals), so
+the conversation list reads them straight off the rows. `refresh_conversation_summaries`
+recomputes them from the messages table, for the backfill command and after deletes.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Conversation, ConversationParticipant, Message
+
+
+def record_new_message(message):
+    """Make `message` its conversation's last message and count it unread for everyone but the sender."""
+    newer_or_first = Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at)
+    Conversation.objects.filter(newer_or_first, pk=message.conversation_id).update(
+        last_message=message,
+        last_message_at=message.created_at,
+    )
+    ConversationParticipant.objects.filter(conversation_id=message.conversation_id).exclude(
+        user_id=message.sender_id,
+    ).update(unread_count=F('unread_count') + 1)
+
+
+def _unread_messages(since_last_read):
+    messages = Message.objects.filter(conversation_id=OuterRef('conversation_id')).exclude(
+        sender_id=OuterRef('user_id'),
+    )
+    if since_last_read:
+        messages = messages.filter(created_at__gt=OuterRef('last_read_at'))
+    counts = messages.order_by().values('conversation_id').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def refresh_conversation_summaries(conversation_ids=None):
+    """
+    Recompute last message and unread counts from the messages table, for the given
+    conversations or all of them. Three UPDATE statements. Returns the conversations updated.
+    """
+    conversations = Conversation.objects.all()
+    participants = ConversationParticipant.objects.all()
+    if conversation_ids is not None:
+        conversations = conversations.filter(pk__in=conversation_ids)
+        participants = participants.filter(conversation_id__in=conversation_ids)
+
+    latest = Message.objects.filter(conversation_id=OuterRef('pk')).order_by('-created_at', '-id')
+    updated = conversations.update(
+        last_message=Subquery(latest.values('id')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+    )
+    participants.filter(last_read_at__isnull=True).update(unread_count=_unread_messages(since_last_read=False))
+    participants.filter(last_read_at__isnull=False).update(unread_count=_unread_messages(since_last_read=True))
+    return updated
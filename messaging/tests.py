@@ -63,6 +63,23 @@ class ConversationListCreateTests(APITestCase):
         self.assertIn(self.landlord.id, participant_user_ids)
         self.assertIn(self.tenant.id, participant_user_ids)
 
+    def _create_conversation_queries(self, participants):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.landlord_token.key}')
+        data = {'subject': 'Fan-out', 'participant_ids': [u.id for u in participants]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.list_url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['participants']), len(participants) + 1)
+        return len(queries)
+
+    def test_create_conversation_query_count_independent_of_participants(self):
+        few = self._create_conversation_queries([self.tenant])
+        others = [make_user(f'fanout{i}', Role.TENANT)[0] for i in range(5)]
+        many = self._create_conversation_queries([self.tenant, self.tenant2, *others])
+        self.assertEqual(few, many)
+
     def test_create_conversation_no_participants(self):
         self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.landlord_token.key}')
         data = {'subject': 'Empty conversation', 'participant_ids': []}
@@ -177,6 +194,91 @@ class MessageTests(APITestCase):
         response = self.client.post(self._messages_url(99999), {'body': 'hello'}, format='json')
         self.assertEqual(response.status_code, 404)
 
+    def test_message_notifies_other_participants_with_constant_query_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from notifications.models import Notification
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.tenant_token.key}')
+        url = self._messages_url(self.conversation.pk)
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(url, {'body': 'One recipient'}, format='json')
+        for i in range(4):
+            user, _ = make_user(f'participant{i}', Role.TENANT)
+            ConversationParticipant.objects.create(conversation=self.conversation, user=user)
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(url, {'body': 'Five recipients'}, format='json')
+
+        notified = Notification.objects.filter(notification_type='message', body='Five recipients')
+        self.assertEqual(notified.count(), 5)
+        self.assertFalse(notified.filter(user=self.tenant).exists())
+        self.assertEqual(len(many), len(few))
+
+    def _thread(self, count):
+        first = Message.objects.get(conversation=self.conversation)
+        return [first] + [
+            Message.objects.create(conversation=self.conversation, sender=self.tenant, body=f'Reply {i}')
+            for i in range(count)
+        ]
+
+    def test_after_id_returns_only_newer_messages(self):
+        thread = self._thread(4)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.landlord_token.key}')
+        url = self._messages_url(self.conversation.pk)
+        response = self.client.get(url, {'after_id': thread[1].pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.data], [m.pk for m in thread[2:]])
+        response = self.client.get(url, {'after_id': thread[1].pk, 'limit': 2})
+        self.assertEqual([m['id'] for m in response.data], [thread[2].pk, thread[3].pk])
+        response = self.client.get(url, {'after_id': thread[-1].pk})
+        self.assertEqual(response.data, [])
+
+    def test_before_id_and_limit_page_back_from_latest(self):
+        thread = self._thread(4)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.landlord_token.key}')
+        url = self._messages_url(self.conversation.pk)
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual([m['id'] for m in response.data], [thread[3].pk, thread[4].pk])
+        response = self.client.get(url, {'before_id': thread[3].pk, 'limit': 2})
+        self.assertEqual([m['id'] for m in response.data], [thread[1].pk, thread[2].pk])
+        response = self.client.get(url, {'before_id': thread[1].pk, 'limit': 2})
+        self.assertEqual([m['id'] for m in response.data], [thread[0].pk])
+
+    def test_invalid_keyset_parameters_rejected(self):
+        other = Conversation.objects.create(subject='Other', created_by=self.outsider)
+        foreign = Message.objects.create(conversation=other, sender=self.outsider, body='Elsewhere')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.landlord_token.key}')
+        url = self._messages_url(self.conversation.pk)
+        for params, field in (
+            ({'after_id': foreign.pk}, 'after_id'),
+            ({'before_id': 'abc'}, 'before_id'),
+            ({'limit': 0}, 'limit'),
+            ({'after_id': 1, 'before_id': 2}, 'after_id'),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(field, response.data)
+
+    def test_message_published_to_participant_event_streams(self):
+        from asgiref.sync import async_to_sync
+        from notifications.events import get_event_broker
+        get_event_broker.cache_clear()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.tenant_token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self._messages_url(self.conversation.pk), {'body': 'Pushed'}, format='json')
+
+        broker = get_event_broker()
+        landlord_events = async_to_sync(broker.listen)(self.landlord.pk, '0', 0.01)
+        self.assertEqual(
+            [(e.type, e.data.get('body')) for e in landlord_events],
+            [('notification', 'Pushed'), ('message', 'Pushed')],
+        )
+        self.assertEqual(landlord_events[1].data['id'], response.data['id'])
+        tenant_events = async_to_sync(broker.listen)(self.tenant.pk, '0', 0.01)
+        self.assertEqual([e.type for e in tenant_events], ['message'])
+        self.assertEqual(async_to_sync(broker.listen)(self.outsider.pk, '0', 0.01), [])
+
 
 class ConversationMarkReadTests(APITestCase):
 
@@ -231,6 +333,141 @@ class ConversationMarkReadTests(APITestCase):
         self.assertEqual(response.status_code, 403)
 
 
+class ConversationSummaryTests(APITestCase):
+    """Denormalized last_message / unread_count (messaging.summaries)."""
+
+    def setUp(self):
+        self.landlord, self.landlord_token = make_user('summary_ll', Role.LANDLORD)
+        self.tenant, self.tenant_token = make_user('summary_tt', Role.TENANT)
+        self.conversation = self._conversation('Summary')
+
+    def _conversation(self, subject):
+        conversation = Conversation.objects.create(subject=subject, created_by=self.landlord)
+        ConversationParticipant.objects.create(conversation=conversation, user=self.landlord)
+        ConversationParticipant.objects.create(conversation=conversation, user=self.tenant)
+        return conversation
+
+    def _send(self, token, body):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return self.client.post(
+            reverse('message-list-create', args=[self.conversation.pk]), {'body': body}, format='json',
+        )
+
+    def _row(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get(reverse('conversation-list-create'))
+        return next(r for r in response.data if r['id'] == self.conversation.pk)
+
+    def _unread(self, user):
+        return ConversationParticipant.objects.get(conversation=self.conversation, user=user).unread_count
+
+    def test_sending_updates_last_message_and_unread_counts(self):
+        self._send(self.tenant_token, 'First')
+        last = self._send(self.tenant_token, 'Second').data
+        self.assertEqual((self._unread(self.landlord), self._unread(self.tenant)), (2, 0))
+
+        row = self._row(self.landlord_token)
+        self.assertEqual(row['unread_count'], 2)
+        self.assertEqual(row['last_message']['id'], last['id'])
+        self.assertEqual(row['last_message']['body'], 'Second')
+        self.assertEqual(row['last_message']['sender_username'], 'summary_tt')
+
+        self.client.post(reverse('conversation-mark-read', args=[self.conversation.pk]))
+        self.assertEqual(self._row(self.landlord_token)['unread_count'], 0)
+        self._send(self.tenant_token, 'Third')
+        self.assertEqual(self._row(self.landlord_token)['unread_count'], 1)
+
+    def test_list_query_count_independent_of_message_volume(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._send(self.tenant_token, 'Hello')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.landlord_token.key}')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('conversation-list-create'))
+
+        for i in range(3):
+            other = self._conversation(f'More {i}')
+            for j in range(5):
+                Message.objects.create(conversation=other, sender=self.tenant, body=f'Message {j}')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('conversation-list-create'))
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]['last_message']['body'], 'Message 4')
+        self.assertEqual(response.data[0]['unread_count'], 5)
+        self.assertEqual(len(many), len(few))
+
+    def test_deleting_last_message_falls_back_to_previous(self):
+        first = self._send(self.tenant_token, 'First').data
+        last = self._send(self.tenant_token, 'Second').data
+        Message.objects.get(pk=last['id']).delete()
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, first['id'])
+        self.assertEqual(self._unread(self.landlord), 1)
+
+    def _summary_updates(self, delete):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            delete()
+        # Refreshes read the messages table; the collector's SET_NULL of last_message does not.
+        return [
+            q for q in queries
+            if q['sql'].startswith('UPDATE "messaging_conversation"') and 'messaging_message' in q['sql']
+        ]
+
+    def test_deleting_conversation_skips_summary_refresh(self):
+        for i in range(5):
+            Message.objects.create(conversation=self.conversation, sender=self.tenant, body=f'Message {i}')
+        self.assertEqual(self._summary_updates(self.conversation.delete), [])
+        self.assertFalse(Message.objects.exists())
+
+    def test_bulk_message_delete_refreshes_each_conversation_once(self):
+        other = self._conversation('Other')
+        for conversation in (self.conversation, other):
+            for i in range(4):
+                Message.objects.create(conversation=conversation, sender=self.tenant, body=f'Message {i}')
+        updates = self._summary_updates(Message.objects.all().delete)
+        self.assertEqual(len(updates), 2)  # one last_message refresh per conversation
+        self.conversation.refresh_from_db()
+        self.assertIsNone(self.conversation.last_message)
+        self.assertEqual(self._unread(self.landlord), 0)
+
+    def test_backfill_command_recomputes_summaries(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        Message.objects.create(conversation=self.conversation, sender=self.landlord, body='Before read')
+        ConversationParticipant.objects.filter(user=self.tenant).update(last_read_at=timezone.now())
+        Message.objects.create(conversation=self.conversation, sender=self.landlord, body='After read')
+        Message.objects.create(conversation=self.conversation, sender=self.tenant, body='Reply')
+        empty = self._conversation('Empty')
+        Conversation.objects.update(last_message=None, last_message_at=None)
+        ConversationParticipant.objects.update(unread_count=0)
+
+        out = StringIO()
+        call_command('backfill_conversation_summaries', stdout=out)
+        self.assertIn('Refreshed 2 conversations', out.getvalue())
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message.body, 'Reply')
+        self.assertEqual((self._unread(self.landlord), self._unread(self.tenant)), (1, 1))
+        self.assertEqual(self._row(self.tenant_token)['last_message']['body'], 'Reply')
+        self.assertIsNone(Conversation.objects.get(pk=empty.pk).last_message)
+
+    def test_migration_backfills_existing_conversations(self):
+        from importlib import import_module
+        from django.apps import apps
+        migration = import_module('messaging.migrations.0004_backfill_conversation_summaries')
+        Message.objects.create(conversation=self.conversation, sender=self.landlord, body='Hello')
+        Message.objects.create(conversation=self.conversation, sender=self.tenant, body='Hi back')
+        Conversation.objects.update(last_message=None, last_message_at=None)
+        ConversationParticipant.objects.update(unread_count=0)
+
+        migration.backfill_summaries(apps, None)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message.body, 'Hi back')
+        self.assertEqual((self._unread(self.landlord), self._unread(self.tenant)), (1, 1))
+
+
 class ConversationParticipantPayloadTests(APITestCase):
     """Schema + primary_recipient + last_message shape; backward-compatible keys."""
 
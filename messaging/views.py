@@ -1,4 +1,4 @@
-from django.db.models import Prefetch
+from django.db.models import Prefetch, Q
 from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
@@ -92,31 +92,22 @@ def conversation_list_create(request):
         property=prop,
     )
 
-    # Add creator as participant
-    ConversationParticipant.objects.create(conversation=conversation, user=user)
+    # Creator plus every existing user in participant_ids (unknown ids are skipped), in one INSERT.
+    recipients = list(CustomUser.objects.filter(pk__in=participant_ids).exclude(pk=user.pk))
+    ConversationParticipant.objects.bulk_create([
+        ConversationParticipant(conversation=conversation, user=participant)
+        for participant in [user, *recipients]
+    ])
 
-    # Add additional participants
-    for uid in participant_ids:
-        try:
-            participant_user = CustomUser.objects.get(pk=uid)
-            ConversationParticipant.objects.get_or_create(
-                conversation=conversation,
-                user=participant_user,
-            )
-        except CustomUser.DoesNotExist:
-            pass
-
-    from notifications.utils import create_notification
+    from notifications.utils import create_notifications
     creator_name = user.get_full_name() or user.username
-    for cp in conversation.participants.select_related('user').all():
-        if cp.user != user:
-            create_notification(
-                cp.user,
-                'message',
-                'New Conversation',
-                f"{creator_name} started a conversation: {conversation.subject or '(no subject)'}",
-                action_url=f'/api/messaging/conversations/{conversation.pk}/',
-            )
+    create_notifications(
+        recipients,
+        'message',
+        'New Conversation',
+        f"{creator_name} started a conversation: {conversation.subject or '(no subject)'}",
+        action_url=f'/api/messaging/conversations/{conversation.pk}/',
+    )
 
     conversation = get_conversation_for_user(user=user, pk=conversation.pk)
     serializer = ConversationSerializer(conversation, context={'request': request})
@@ -149,9 +140,82 @@ def conversation_detail(request, pk):
 
 # ── Messages ─────────────────────────────────────────────────────────────────────
 
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+MESSAGE_PAGE_PARAMS = ('after_id', 'before_id', 'limit')
+
+
+def _positive_int_param(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = int(raw)
+        if value < 1:
+            raise ValueError
+    except ValueError:
+        raise ValueError(name, f'{name} must be a positive integer.')
+    return value
+
+
+def _message_page(messages, params):
+    """
+    One keyset page of a conversation's `messages`, oldest first, on (created_at, id):
+    the `limit` messages after `after_id`, the `limit` before `before_id`, or else the latest.
+    Raises ValueError(param, message) for a bad parameter.
+    """
+    limit = min(_positive_int_param(params, 'limit') or MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE)
+    after_id = _positive_int_param(params, 'after_id')
+    before_id = _positive_int_param(params, 'before_id')
+    if after_id is not None and before_id is not None:
+        raise ValueError('after_id', 'Pass either after_id or before_id, not both.')
+
+    anchor_param, anchor_id = ('after_id', after_id) if after_id is not None else ('before_id', before_id)
+    if anchor_id is None:
+        return list(messages.order_by('-created_at', '-id')[:limit])[::-1]
+
+    anchor = messages.filter(pk=anchor_id).values_list('created_at', 'id').first()
+    if anchor is None:
+        raise ValueError(anchor_param, 'Message not found in this conversation.')
+    created_at, pk = anchor
+    if after_id is not None:
+        newer = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        return list(messages.filter(newer).order_by('created_at', 'id')[:limit])
+    older = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+    return list(messages.filter(older).order_by('-created_at', '-id')[:limit])[::-1]
+
+
 @extend_schema(
     methods=['GET'],
     summary="List messages in a conversation",
+    description=(
+        'Full history, oldest first, unless one of `after_id`, `before_id` or `limit` is given: '
+        'then one keyset page on (created_at, id), still oldest first. Poll with `after_id` set to '
+        'the newest message already shown; scroll back with `before_id` set to the oldest.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='after_id',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Only messages sent after this message of the conversation.',
+        ),
+        OpenApiParameter(
+            name='before_id',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Only the messages sent just before this message of the conversation.',
+        ),
+        OpenApiParameter(
+            name='limit',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description=f'Page size. Default: {MESSAGE_PAGE_SIZE}. Maximum: {MAX_MESSAGE_PAGE_SIZE}.',
+        ),
+    ],
 )
 @extend_schema(
     methods=['POST'],
@@ -181,7 +245,15 @@ def message_list_create(request, pk):
         return Response({'detail': 'You are not a participant in this conversation.'}, status=status.HTTP_403_FORBIDDEN)
 
     if request.method == 'GET':
-        messages = conversation.messages.select_related('sender').order_by('created_at')
+        messages = conversation.messages.select_related('sender')
+        if any(param in request.query_params for param in MESSAGE_PAGE_PARAMS):
+            try:
+                messages = _message_page(messages, request.query_params)
+            except ValueError as e:
+                param, message = e.args
+                return Response({param: [message]}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            messages = messages.order_by('created_at')
         serializer = MessageSerializer(messages, many=True)
         return Response(serializer.data)
 
@@ -196,19 +268,19 @@ def message_list_create(request, pk):
         body=body,
     )
 
-    from notifications.utils import create_notification
+    from notifications.utils import create_notifications
     sender_name = request.user.get_full_name() or request.user.username
-    for cp in conversation.participants.select_related('user').all():
-        if cp.user != request.user:
-            create_notification(
-                cp.user,
-                'message',
-                f'New Message from {sender_name}',
-                body[:200],
-                action_url=f'/api/messaging/conversations/{conversation.pk}/',
-            )
+    create_notifications(
+        [cp.user for cp in conversation.participants.select_related('user').exclude(user=request.user)],
+        'message',
+        f'New Message from {sender_name}',
+        body[:200],
+        action_url=f'/api/messaging/conversations/{conversation.pk}/',
+    )
 
     serializer = MessageSerializer(message)
+    from notifications.events import EVENT_MESSAGE, publish_events
+    publish_events((cp.user_id, EVENT_MESSAGE, serializer.data) for cp in conversation.participants.all())
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -334,7 +406,8 @@ def conversation_mark_read(request, pk):
         return Response({'detail': 'You are not a participant in this conversation.'}, status=status.HTTP_403_FORBIDDEN)
 
     participant.last_read_at = timezone.now()
-    participant.save(update_fields=['last_read_at'])
+    participant.unread_count = 0
+    participant.save(update_fields=['last_read_at', 'unread_count'])
 
     # After marking read, unread_count is 0 (no messages after now)
     return Response({'unread_count': 0})
@@ -74,19 +74,18 @@ class Command(BaseCommand):
 
     def _notify_admins(self, rule, triggered_value, alert):
         from authentication.models import CustomUser
-        from notifications.utils import create_notification
+        from notifications.utils import create_notifications
 
         admins = CustomUser.objects.filter(is_staff=True, is_active=True)
         severity_label = rule.severity.upper()
 
-        for admin in admins:
-            create_notification(
-                user=admin,
-                notification_type='account',
-                title=f'[{severity_label}] {rule.name}',
-                body=(
-                    f'{rule.get_metric_type_display()} is {triggered_value} '
-                    f'(threshold: {rule.get_condition_display().lower()} {rule.threshold_value})'
-                ),
-                action_url=f'/api/monitoring/alerts/{alert.pk}/',
-            )
+        create_notifications(
+            admins,
+            notification_type='account',
+            title=f'[{severity_label}] {rule.name}',
+            body=(
+                f'{rule.get_metric_type_display()} is {triggered_value} '
+                f'(threshold: {rule.get_condition_display().lower()} {rule.threshold_value})'
+            ),
+            action_url=f'/api/monitoring/alerts/{alert.pk}/',
+        )
@@ -9,9 +9,11 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         from monitoring.models import SystemMetric
         from billing.models import Invoice, Payment
-        from property.models import Unit, TenantApplication
+        from property.models import TenantApplication
+        from property.occupancy import OccupancyTimeline
         from maintenance.models import MaintenanceRequest
         from disputes.models import Dispute
+        from notifications.outbox import queue_depth
 
         now = timezone.now()
         month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -29,9 +31,9 @@ class Command(BaseCommand):
         )
         metrics.append(('monthly_revenue', monthly_revenue))
 
-        # Platform-wide occupancy rate
-        total_units = Unit.objects.count()
-        occupied_units = Unit.objects.filter(is_occupied=True).count()
+        # Platform-wide occupancy rate (leases covering today over non-deleted units)
+        today = timezone.localdate()
+        [(occupied_units, total_units)] = OccupancyTimeline().series([(today, today)])
         occupancy_rate = round((occupied_units / total_units * 100), 2) if total_units > 0 else 0
         metrics.append(('occupancy_rate', occupancy_rate))
 
@@ -62,6 +64,9 @@ class Command(BaseCommand):
         )
         metrics.append(('payment_success_rate', success_rate))
 
+        # Emails waiting in the notification outbox
+        metrics.append(('email_outbox_depth', queue_depth()))
+
         SystemMetric.objects.bulk_create([
             SystemMetric(metric_type=mt, value=val) for mt, val in metrics
         ])
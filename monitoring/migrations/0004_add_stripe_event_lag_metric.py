@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+METRIC_TYPE_CHOICES = [
+    ('overdue_invoice_count', 'Overdue Invoice Count'),
+    ('monthly_revenue', 'Monthly Revenue'),
+    ('occupancy_rate', 'Occupancy Rate (%)'),
+    ('open_maintenance_count', 'Open Maintenance Count'),
+    ('open_dispute_count', 'Open Dispute Count'),
+    ('pending_application_count', 'Pending Application Count'),
+    ('payment_success_rate', 'Payment Success Rate (%)'),
+    ('stripe_event_lag_seconds', 'Stripe Event-to-Receipt Lag (s)'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0003_add_impersonation_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='systemmetric',
+            name='metric_type',
+            field=models.CharField(max_length=50, choices=METRIC_TYPE_CHOICES),
+        ),
+        migrations.AlterField(
+            model_name='alertrule',
+            name='metric_type',
+            field=models.CharField(max_length=50, choices=METRIC_TYPE_CHOICES),
+        ),
+    ]
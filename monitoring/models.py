@@ -10,6 +10,8 @@ METRIC_TYPES = [
     ('open_dispute_count', 'Open Dispute Count'),
     ('pending_application_count', 'Pending Application Count'),
     ('payment_success_rate', 'Payment Success Rate (%)'),
+    ('stripe_event_lag_seconds', 'Stripe Event-to-Receipt Lag (s)'),
+    ('email_outbox_depth', 'Pending Outbox Emails'),
 ]
 
 
@@ -480,3 +480,31 @@ class ImpersonationLogListTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['target_username'], self.tenant.username)
+
+
+class CheckAlertRulesNotificationTestCase(TestCase):
+    def setUp(self):
+        self.admin = make_admin('admin_car')
+        self.rule = make_rule(self.admin, threshold_value=5)
+        SystemMetric.objects.create(metric_type='overdue_invoice_count', value=12)
+
+    def _run(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            call_command('check_alert_rules', stdout=StringIO())
+        return len(queries)
+
+    def test_admins_notified_with_constant_query_count(self):
+        from notifications.models import Notification
+        few = self._run()
+        self.assertEqual(Notification.objects.filter(user=self.admin, title='[WARNING] Test Rule').count(), 1)
+
+        AlertInstance.objects.all().delete()
+        for i in range(4):
+            make_admin(f'admin_car_{i}')
+        many = self._run()
+        self.assertEqual(Notification.objects.filter(title='[WARNING] Test Rule').count(), 6)
+        self.assertEqual(many, few)
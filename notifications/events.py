@@ -0,0 +1,205 @@
+"""
+Per-user event feed behind GET /api/notifications/stream/ (see notifications.stream).
+
+`publish_events` is called from request / command code once the transaction that created
+the Notification or Message commits; the stream view waits on `broker.listen`. The broker
+is chosen by settings.NOTIFICATION_EVENTS_BACKEND:
+
+- `LocalEventBroker` (default): in-process, for development, tests and single-process
+  ASGI servers. Events published by another process (a worker, a cron command) are not
+  seen.
+- `RedisEventBroker`: one Redis stream per user, shared by every process. It needs the
+  `redis` package and settings.NOTIFICATION_EVENTS_REDIS_URL.
+
+Both keep the last NOTIFICATION_EVENTS_REPLAY events per user so a reconnecting client can
+resume from its `Last-Event-ID`. A client that was away longer should refetch the
+notification list with `after_id=`.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple('Event', ['id', 'type', 'data'])
+
+EVENT_NOTIFICATION = 'notification'
+EVENT_MESSAGE = 'message'
+
+DEFAULT_REPLAY = 100
+
+
+class LocalEventBroker:
+    """
+    In-process broker: a bounded history per user and an asyncio.Event per waiting stream.
+
+    Event ids are `<epoch>-<n>`, the epoch being the broker's start time in milliseconds,
+    so ids from before a restart are recognised instead of being compared with the new
+    sequence (see `resume_id`).
+    """
+
+    def __init__(self, replay=DEFAULT_REPLAY):
+        self._lock = threading.Lock()
+        self._epoch = int(time.time() * 1000)
+        self._ids = itertools.count(1)
+        self._last_seq = 0
+        self._history = defaultdict(lambda: deque(maxlen=replay))
+        self._waiters = defaultdict(set)
+
+    def _sequence(self, event_id):
+        """n of an `<epoch>-<n>` id from this broker, else None."""
+        epoch, _, seq = str(event_id).partition('-')
+        if epoch != str(self._epoch) or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, user_id, event_type, data):
+        with self._lock:
+            self._last_seq = next(self._ids)
+            event = Event(f'{self._epoch}-{self._last_seq}', event_type, data)
+            self._history[user_id].append(event)
+            waiters = list(self._waiters[user_id])
+        # Publishers run in request threads; wake each stream on its own event loop.
+        for loop, wake in waiters:
+            loop.call_soon_threadsafe(wake.set)
+        return event.id
+
+    async def latest_id(self, user_id):
+        with self._lock:
+            history = self._history.get(user_id)
+            return history[-1].id if history else f'{self._epoch}-{self._last_seq}'
+
+    async def resume_id(self, user_id, last_id):
+        """
+        Where a stream reconnecting with `last_id` starts. An id this broker did not issue
+        (another epoch, i.e. before a restart, or above the newest published) or none at all
+        replays from the latest event.
+        """
+        seq = self._sequence(last_id) if last_id else None
+        if seq is None or seq > self._last_seq:
+            return await self.latest_id(user_id)
+        return last_id
+
+    def _after(self, user_id, last_id):
+        last = self._sequence(last_id) or 0
+        with self._lock:
+            return [event for event in self._history.get(user_id, ()) if self._sequence(event.id) > last]
+
+    async def listen(self, user_id, last_id, timeout):
+        """Events after `last_id`, waiting up to `timeout` seconds for one; [] on timeout."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters[user_id].add(waiter)
+        try:
+            events = self._after(user_id, last_id)
+            if events:
+                return events
+            try:
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+            return self._after(user_id, last_id)
+        finally:
+            with self._lock:
+                self._waiters[user_id].discard(waiter)
+                if not self._waiters[user_id]:
+                    del self._waiters[user_id]
+
+
+class RedisEventBroker:
+    """One capped Redis stream per user (XADD / XREAD BLOCK); event ids are the stream ids."""
+
+    KEY = 'notifications:events:{}'
+    ID_PATTERN = re.compile(r'\d+-\d+')
+    # Idle streams expire so users who never reconnect do not keep their history forever.
+    KEY_TTL_SECONDS = 24 * 60 * 60
+
+    def __init__(self, url=None, replay=DEFAULT_REPLAY):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured('RedisEventBroker requires the "redis" package.')
+        url = url or getattr(settings, 'NOTIFICATION_EVENTS_REDIS_URL', '')
+        if not url:
+            raise ImproperlyConfigured('RedisEventBroker requires NOTIFICATION_EVENTS_REDIS_URL.')
+        self.replay = replay
+        self._redis = redis.Redis.from_url(url)
+        self._async_redis = redis.asyncio.Redis.from_url(url)
+
+    def publish(self, user_id, event_type, data):
+        key = self.KEY.format(user_id)
+        with self._redis.pipeline() as pipe:
+            pipe.xadd(
+                key,
+                {'type': event_type, 'data': json.dumps(data, cls=DjangoJSONEncoder)},
+                maxlen=self.replay,
+                approximate=True,
+            )
+            pipe.expire(key, self.KEY_TTL_SECONDS)
+            event_id, _ = pipe.execute()
+        return event_id.decode()
+
+    async def latest_id(self, user_id):
+        entries = await self._async_redis.xrevrange(self.KEY.format(user_id), count=1)
+        return entries[0][0].decode() if entries else '0-0'
+
+    async def resume_id(self, user_id, last_id):
+        """`last_id` when it is a stream id no newer than the user's latest entry, else the latest."""
+        latest = await self.latest_id(user_id)
+        if not last_id or not self.ID_PATTERN.fullmatch(last_id):
+            return latest
+        ms, seq = map(int, last_id.split('-'))
+        latest_ms, latest_seq = map(int, latest.split('-'))
+        return latest if (ms, seq) > (latest_ms, latest_seq) else last_id
+
+    async def listen(self, user_id, last_id, timeout):
+        streams = await self._async_redis.xread(
+            {self.KEY.format(user_id): last_id or '0-0'},
+            count=self.replay,
+            block=max(1, int(timeout * 1000)),
+        )
+        return [
+            Event(entry_id.decode(), fields[b'type'].decode(), json.loads(fields[b'data']))
+            for _, entries in streams
+            for entry_id, fields in entries
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_event_broker():
+    backend = getattr(settings, 'NOTIFICATION_EVENTS_BACKEND', 'notifications.events.LocalEventBroker')
+    replay = getattr(settings, 'NOTIFICATION_EVENTS_REPLAY', DEFAULT_REPLAY)
+    return import_string(backend)(replay=replay)
+
+
+def publish_events(events):
+    """
+    Publish `(user_id, event_type, data)` tuples once the current transaction commits. The
+    rows are already saved by then, so a broker outage is logged rather than raised.
+    """
+    events = list(events)
+    if not events:
+        return
+
+    def publish():
+        broker = get_event_broker()
+        try:
+            for user_id, event_type, data in events:
+                broker.publish(user_id, event_type, data)
+        except Exception:
+            logger.exception('Could not publish %d notification stream event(s)', len(events))
+
+    transaction.on_commit(publish)
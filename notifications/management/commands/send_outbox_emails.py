@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import MAX_ATTEMPTS, deliver_pending_emails, queue_depth
+
+
+class Command(BaseCommand):
+    help = 'Send queued notification emails from the outbox over a single mail connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails per batch (default 100).')
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f'Failures before an email is parked as failed (default {MAX_ATTEMPTS}).',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new emails instead of exiting once the outbox is drained.',
+        )
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            self._drain(options['batch_size'], options['max_attempts'])
+            self._record_depth()
+            if not options['loop']:
+                return
+            time.sleep(options['sleep'])
+
+    def _drain(self, batch_size, max_attempts):
+        """Run batches until one comes back short."""
+        while True:
+            stats = deliver_pending_emails(batch_size=batch_size, max_attempts=max_attempts)
+            handled = stats['sent'] + stats['retried'] + stats['failed']
+            if handled:
+                self.stdout.write(self.style.SUCCESS(
+                    f"  Sent {stats['sent']}, retrying {stats['retried']}, failed {stats['failed']}"
+                ))
+            if handled < batch_size:
+                return
+
+    def _record_depth(self):
+        from monitoring.models import SystemMetric
+
+        depth = queue_depth()
+        SystemMetric.objects.create(metric_type='email_outbox_depth', value=depth)
+        self.stdout.write(f'  {depth} emails pending')
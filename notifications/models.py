@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class Notification(models.Model):
@@ -30,6 +31,50 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the unread counter and the unread list (user, is_read), newest first.
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notif_user_read_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.notification_type}: {self.title} → {self.user.username}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Email outbox. Rows are written in the same transaction as the Notification they belong
+    to and delivered by `manage.py send_outbox_emails` (see notifications.outbox).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    notification = models.ForeignKey(
+        Notification,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='emails',
+    )
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notif_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Email to {self.to_email}: {self.subject} ({self.status})"
@@ -0,0 +1,95 @@
+"""
+Email outbox delivery.
+
+`create_notification` and `queue_notification_emails` only insert `OutboundEmail` rows,
+in the caller's transaction, so a request or billing batch never waits on the mail
+provider and an email is only ever sent for a notification that was committed.
+`send_outbox_emails` drains the table: each batch is locked with SKIP LOCKED (so several
+workers can run), sent over one mail connection, and failures are retried with
+exponential backoff until they are parked as `failed` (the dead letters).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 6 * 60 * 60
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failure: 60s, 120s, 240s, ... capped at six hours."""
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def queue_depth():
+    return OutboundEmail.objects.filter(status=OutboundEmail.STATUS_PENDING).count()
+
+
+def deliver_pending_emails(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Send up to `batch_size` due outbox rows, oldest first, over a single connection.
+    Returns {'sent': n, 'retried': n, 'failed': n}.
+    """
+    stats = {'sent': 0, 'retried': 0, 'failed': 0}
+    with transaction.atomic():
+        now = timezone.now()
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if not emails:
+            return stats
+
+        try:
+            connection = get_connection()
+            connection.open()
+        except Exception as exc:
+            # Provider unreachable: the whole batch counts as one failed attempt.
+            for email in emails:
+                stats[_record_failure(email, exc, max_attempts, now)] += 1
+            OutboundEmail.objects.bulk_update(emails, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+            return stats
+
+        try:
+            for email in emails:
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[email.to_email],
+                    connection=connection,
+                )
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    stats[_record_failure(email, exc, max_attempts, now)] += 1
+                    continue
+                email.attempts += 1
+                email.status = OutboundEmail.STATUS_SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                stats['sent'] += 1
+        finally:
+            connection.close()
+        OutboundEmail.objects.bulk_update(
+            emails, ['attempts', 'last_error', 'status', 'next_attempt_at', 'sent_at'],
+        )
+    return stats
+
+
+def _record_failure(email, exc, max_attempts, now):
+    """Update `email` in memory after a failed send; returns the stats key it counts towards."""
+    email.attempts += 1
+    email.last_error = f'{type(exc).__name__}: {exc}'[:2000]
+    if email.attempts >= max_attempts:
+        email.status = OutboundEmail.STATUS_FAILED
+        return 'failed'
+    email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+    return 'retried'
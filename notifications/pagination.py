@@ -0,0 +1,5 @@
+from billing.pagination import KeysetPagination
+
+
+class NotificationCursorPagination(KeysetPagination):
+    ordering_field = 'created_at'
@@ -0,0 +1,111 @@
+"""
+Cached NotificationPreference lookups, keyed by user id.
+
+Two layers: a small process-local dict in front of the shared Django cache (Redis when
+settings.CACHE_REDIS_URL is set), which is in front of the database. A user without a preferences row is cached too (as "no row"), so
+the email gate does not query again for users who never opened their settings. Saving or
+deleting a NotificationPreference (or creating / deleting the user) invalidates both
+layers through `notifications.signals`; other processes drop their local copy when its
+short TTL runs out. Without a shared cache backend the "shared" layer is per process too and
+another process can keep a stale entry for PREFERENCE_CACHE_SECONDS. `QuerySet.update()` sends no signals, so call
+`invalidate_notification_preferences` after bulk updates.
+
+Cached instances are shared between callers: read them, never save them.
+"""
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+PREFERENCE_CACHE_SECONDS = 300
+LOCAL_CACHE_SECONDS = 10
+LOCAL_CACHE_MAX_ENTRIES = 10000
+_KEY = 'notifications:prefs:{}'
+_NO_ROW = 'none'
+
+_local = {}
+_stats = Counter()
+
+
+def _key(user_id):
+    return _KEY.format(user_id)
+
+
+def _remember_locally(user_id, value):
+    if len(_local) >= LOCAL_CACHE_MAX_ENTRIES:
+        _local.clear()
+    _local[user_id] = (time.monotonic() + LOCAL_CACHE_SECONDS, value)
+
+
+def _from_local(user_id):
+    entry = _local.get(user_id)
+    if entry is None:
+        return None
+    expires, value = entry
+    if expires <= time.monotonic():
+        _local.pop(user_id, None)
+        return None
+    return value
+
+
+def get_notification_preferences_many(user_ids):
+    """{user_id: NotificationPreference} for the users in `user_ids` that have a row."""
+    from authentication.models import NotificationPreference
+
+    found = {}
+    remaining = []
+    for user_id in set(user_ids):
+        value = _from_local(user_id)
+        if value is None:
+            remaining.append(user_id)
+        else:
+            _stats['local_hits'] += 1
+            found[user_id] = value
+
+    if remaining:
+        shared = cache.get_many([_key(user_id) for user_id in remaining])
+        missing = []
+        for user_id in remaining:
+            value = shared.get(_key(user_id))
+            if value is None:
+                missing.append(user_id)
+            else:
+                _stats['shared_hits'] += 1
+                _remember_locally(user_id, value)
+                found[user_id] = value
+
+        if missing:
+            _stats['misses'] += len(missing)
+            loaded = {prefs.user_id: prefs for prefs in NotificationPreference.objects.filter(user_id__in=missing)}
+            values = {user_id: loaded.get(user_id, _NO_ROW) for user_id in missing}
+            cache.set_many({_key(user_id): value for user_id, value in values.items()}, PREFERENCE_CACHE_SECONDS)
+            for user_id, value in values.items():
+                _remember_locally(user_id, value)
+            found.update(values)
+
+    return {user_id: value for user_id, value in found.items() if value != _NO_ROW}
+
+
+def get_notification_preferences(user_id):
+    """The user's NotificationPreference, or None when they have no row yet."""
+    return get_notification_preferences_many([user_id]).get(user_id)
+
+
+def invalidate_notification_preferences(user_id):
+    _local.pop(user_id, None)
+    cache.delete(_key(user_id))
+
+
+def clear_local_preference_cache():
+    _local.clear()
+
+
+def preference_cache_stats():
+    """Lookups served by this process since it started: local / shared hits and database misses."""
+    local_hits, shared_hits, misses = _stats['local_hits'], _stats['shared_hits'], _stats['misses']
+    return {
+        'local_hits': local_hits,
+        'shared_hits': shared_hits,
+        'hits': local_hits + shared_hits,
+        'misses': misses,
+    }
@@ -0,0 +1,26 @@
+"""Keep the notification preference cache (notifications.preferences) current."""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from authentication.models import NotificationPreference
+from .preferences import invalidate_notification_preferences
+
+
+def _invalidate(user_id):
+    invalidate_notification_preferences(user_id)
+    # Again once committed, in case another process cached the old row in between.
+    transaction.on_commit(lambda: invalidate_notification_preferences(user_id))
+
+
+@receiver([post_save, post_delete], sender=NotificationPreference, dispatch_uid='notification_prefs_changed')
+def _preferences_changed(sender, instance, **kwargs):
+    _invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='notification_prefs_user_created')
+def _user_created(sender, instance, created, **kwargs):
+    # A new user id must not pick up a cached "no row" (or row) left under a reused id.
+    if created:
+        _invalidate(instance.pk)
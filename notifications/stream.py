@@ -0,0 +1,143 @@
+"""
+GET /api/notifications/stream/ — Server-Sent Events feed of the user's new notifications
+and messages (see notifications.events), replacing client polling of the notification,
+conversation and message lists.
+
+An async view: it must be served by the ASGI application (treeHouse/asgi.py), where a
+connection waiting for events holds no worker thread. Browsers' EventSource cannot send
+headers, so besides `Authorization: Token <key>` the token may be passed as `?token=`.
+On reconnect EventSource sends `Last-Event-ID` and the stream resumes after that event.
+
+Each stream is closed after NOTIFICATION_EVENTS_MAX_SECONDS so no connection lives forever;
+EventSource reconnects on its own and picks up from its `Last-Event-ID`. Django 4.2 does
+not notice a client leaving mid-stream, so treeHouse/asgi.py wraps the application in
+`CancelOnDisconnect`, which cancels the request once the client disconnects.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from monitoring.authentication import ImpersonatingTokenAuthentication, QueryParameterTokenAuthentication
+from .events import get_event_broker
+
+HEARTBEAT_SECONDS = 15
+MAX_STREAM_SECONDS = 5 * 60
+# EventSource waits this long before reconnecting after the connection drops.
+RETRY_MILLISECONDS = 3000
+
+
+def _authenticate(request):
+    """(user, None) or (None, error response), using the API's token authenticators."""
+    drf_request = Request(
+        request,
+        authenticators=[QueryParameterTokenAuthentication(), ImpersonatingTokenAuthentication()],
+    )
+    try:
+        user = drf_request.user
+    except APIException as e:
+        return None, JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+    if not user.is_authenticated:
+        return None, JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    return user, None
+
+
+def format_event(event):
+    data = json.dumps(event.data, cls=DjangoJSONEncoder)
+    return f'id: {event.id}\nevent: {event.type}\ndata: {data}\n\n'
+
+
+async def event_stream(broker, user_id, last_id, heartbeat, max_seconds=MAX_STREAM_SECONDS):
+    """
+    SSE frames for `user_id` after event `last_id`, with a comment line every `heartbeat`
+    seconds idle. Ends after `max_seconds`; the client then reconnects with Last-Event-ID.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        events = await broker.listen(user_id, last_id, timeout=min(heartbeat, remaining))
+        if not events:
+            yield ': heartbeat\n\n'
+            continue
+        for event in events:
+            last_id = event.id
+            yield format_event(event)
+
+
+async def notification_stream(request):
+    # django.views.decorators.http.require_GET does not wrap async views before Django 5.0.
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the endless response would be buffered and pin a worker.
+        return JsonResponse({'detail': 'The event stream is only served over ASGI.'}, status=501)
+
+    user, error = await sync_to_async(_authenticate)(request)
+    if error is not None:
+        return error
+
+    broker = get_event_broker()
+    last_id = await broker.resume_id(
+        user.pk, request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'),
+    )
+    heartbeat = getattr(settings, 'NOTIFICATION_EVENTS_HEARTBEAT_SECONDS', HEARTBEAT_SECONDS)
+    max_seconds = getattr(settings, 'NOTIFICATION_EVENTS_MAX_SECONDS', MAX_STREAM_SECONDS)
+
+    response = StreamingHttpResponse(
+        event_stream(broker, user.pk, last_id, heartbeat, max_seconds),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class CancelOnDisconnect:
+    """
+    ASGI wrapper that cancels an HTTP request's handler when the client disconnects.
+
+    Django 4.2's ASGIHandler stops reading `receive()` once the body is in, and uvicorn's
+    `send()` returns quietly after the client has gone, so a streaming response (this event
+    stream, billing exports) would otherwise run until it ends by itself. Cancelling the
+    handler raises CancelledError inside the response iterator, which releases whatever it
+    is waiting on (a broker waiter, a Redis XREAD). Django 5.0+ does the same itself.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        messages = asyncio.Queue()
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send))
+
+        async def pump():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message['type'] == 'http.disconnect':
+                    handler.cancel()
+                    return
+
+        listener = asyncio.ensure_future(pump())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            # Cancelled by the disconnect: the request is over. Otherwise re-raise.
+            if not (listener.done() and not listener.cancelled()):
+                raise
+        finally:
+            listener.cancel()
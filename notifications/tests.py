@@ -1,13 +1,15 @@
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
 from authentication.models import NotificationPreference, Role
-from .models import Notification
+from .models import Notification, OutboundEmail
 from .utils import create_notification
 
 User = get_user_model()
@@ -69,6 +71,73 @@ class NotificationListTests(APITestCase):
         # Still only sees own 3 notifications
         self.assertEqual(len(response.data), 3)
 
+    def test_cursor_pagination_walks_newest_first(self):
+        url = reverse('notification-list')
+        response = self.client.get(url, {'cursor': '', 'page_size': 2, 'include_count': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([n['title'] for n in response.data['results']], ['Hello', 'Lease expiring'])
+        self.assertIsNotNone(response.data['next_cursor'])
+
+        response = self.client.get(url, {'cursor': response.data['next_cursor'], 'page_size': 2})
+        self.assertEqual([n['title'] for n in response.data['results']], ['Payment due'])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_since_returns_only_newer_notifications(self):
+        newest = Notification.objects.get(title='Hello')
+        newer = Notification.objects.create(
+            user=self.user, notification_type='payment', title='Newer', body='Body.',
+        )
+        Notification.objects.filter(pk=newer.pk).update(created_at=newest.created_at + timedelta(seconds=5))
+        response = self.client.get(reverse('notification-list'), {'since': newest.created_at.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([n['title'] for n in response.data], ['Newer'])
+
+    def test_after_id_returns_rows_committed_late_with_older_timestamps(self):
+        newest = Notification.objects.order_by('-id').first()
+        late = Notification.objects.create(
+            user=self.user, notification_type='payment', title='Late batch', body='Body.',
+        )
+        Notification.objects.filter(pk=late.pk).update(created_at=newest.created_at - timedelta(minutes=5))
+        response = self.client.get(reverse('notification-list'), {'after_id': newest.pk})
+        self.assertEqual([n['title'] for n in response.data], ['Late batch'])
+        response = self.client.get(reverse('notification-list'), {'after_id': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_plain_list_is_capped_and_polls_drain_the_backlog(self):
+        from .views import PLAIN_LIST_LIMIT
+        marker = Notification.objects.order_by('-id').first().pk
+        Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='payment', title=f'Bulk {i}', body='Body.')
+            for i in range(PLAIN_LIST_LIMIT + 5)
+        ])
+        url = reverse('notification-list')
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), PLAIN_LIST_LIMIT)
+        self.assertEqual(response.data[0]['title'], f'Bulk {PLAIN_LIST_LIMIT + 4}')
+
+        seen = []
+        while True:
+            response = self.client.get(url, {'after_id': marker})
+            if not response.data:
+                break
+            self.assertLessEqual(len(response.data), PLAIN_LIST_LIMIT)
+            seen.extend(n['title'] for n in response.data)
+            marker = max(n['id'] for n in response.data)
+        self.assertEqual(sorted(seen), sorted(f'Bulk {i}' for i in range(PLAIN_LIST_LIMIT + 5)))
+
+    def test_invalid_since_is_rejected(self):
+        response = self.client.get(reverse('notification-list'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', response.data)
+
+    def test_unread_count(self):
+        other_user, _ = make_user('landlord-count', 'Landlord')
+        Notification.objects.create(user=other_user, notification_type='lease', title='Other', body='Body.')
+        response = self.client.get(reverse('notification-unread-count'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'unread': 2})
+
     def test_unauthenticated(self):
         self.client.credentials()
         url = reverse('notification-list')
@@ -172,6 +241,11 @@ class CreateNotificationUtilTests(APITestCase):
 
     def setUp(self):
         self.user, _ = make_user('tenant4', 'Tenant')
+        self.user.email = 'tenant4@example.com'
+        self.user.save()
+
+    def assertEmailQueued(self, queued):
+        self.assertEqual(OutboundEmail.objects.filter(to_email=self.user.email).count(), 1 if queued else 0)
 
     def test_create_notification_creates_record(self):
         notification = create_notification(
@@ -190,31 +264,29 @@ class CreateNotificationUtilTests(APITestCase):
         self.assertEqual(db_record.action_url, '/invoices/1/')
 
     def test_create_notification_no_email_when_no_prefs(self):
-        """Without a NotificationPreference record, no email is sent."""
-        with patch('django.core.mail.send_mail') as mock_send:
-            create_notification(
-                user=self.user,
-                notification_type='payment',
-                title='Payment',
-                body='Body.',
-            )
-            mock_send.assert_not_called()
+        """Without a NotificationPreference record, no email is queued."""
+        create_notification(
+            user=self.user,
+            notification_type='payment',
+            title='Payment',
+            body='Body.',
+        )
+        self.assertEmailQueued(False)
 
-    def test_create_notification_sends_email_when_prefs_enabled(self):
-        """Email is sent when email_notifications=True and the type flag is on."""
+    def test_create_notification_queues_email_when_prefs_enabled(self):
+        """Email is queued when email_notifications=True and the type flag is on."""
         NotificationPreference.objects.create(
             user=self.user,
             email_notifications=True,
             payment_received=True,
         )
-        with patch('django.core.mail.send_mail') as mock_send:
-            create_notification(
-                user=self.user,
-                notification_type='payment',
-                title='Payment received',
-                body='Body.',
-            )
-            mock_send.assert_called_once()
+        create_notification(
+            user=self.user,
+            notification_type='payment',
+            title='Payment received',
+            body='Body.',
+        )
+        self.assertEmailQueued(True)
 
     def test_create_notification_respects_email_pref_disabled(self):
         """No email when email_notifications=False."""
@@ -222,14 +294,13 @@ class CreateNotificationUtilTests(APITestCase):
             user=self.user,
             email_notifications=False,
         )
-        with patch('django.core.mail.send_mail') as mock_send:
-            create_notification(
-                user=self.user,
-                notification_type='payment',
-                title='Payment',
-                body='Body.',
-            )
-            mock_send.assert_not_called()
+        create_notification(
+            user=self.user,
+            notification_type='payment',
+            title='Payment',
+            body='Body.',
+        )
+        self.assertEmailQueued(False)
 
     def test_create_notification_respects_type_pref_disabled(self):
         """No email when email_notifications=True but the specific type flag is False."""
@@ -238,14 +309,13 @@ class CreateNotificationUtilTests(APITestCase):
             email_notifications=True,
             maintenance_updates=False,
         )
-        with patch('django.core.mail.send_mail') as mock_send:
-            create_notification(
-                user=self.user,
-                notification_type='maintenance',
-                title='Maintenance update',
-                body='Body.',
-            )
-            mock_send.assert_not_called()
+        create_notification(
+            user=self.user,
+            notification_type='maintenance',
+            title='Maintenance update',
+            body='Body.',
+        )
+        self.assertEmailQueued(False)
 
     def test_create_notification_receipt_uses_payment_receipt_sent(self):
         NotificationPreference.objects.create(
@@ -254,15 +324,14 @@ class CreateNotificationUtilTests(APITestCase):
             payment_received=False,
             payment_receipt_sent=True,
         )
-        with patch('django.core.mail.send_mail') as mock_send:
-            create_notification(
-                user=self.user,
-                notification_type='payment',
-                title='Payment received',
-                body='Body.',
-                email_pref_key='payment_receipt_sent',
-            )
-            mock_send.assert_called_once()
+        create_notification(
+            user=self.user,
+            notification_type='payment',
+            title='Payment received',
+            body='Body.',
+            email_pref_key='payment_receipt_sent',
+        )
+        self.assertEmailQueued(True)
 
     def test_create_notification_message_respects_direct_message_received(self):
         NotificationPreference.objects.create(
@@ -270,14 +339,13 @@ class CreateNotificationUtilTests(APITestCase):
             email_notifications=True,
             direct_message_received=False,
         )
-        with patch('django.core.mail.send_mail') as mock_send:
-            create_notification(
-                user=self.user,
-                notification_type='message',
-                title='Hi',
-                body='Hello.',
-            )
-            mock_send.assert_not_called()
+        create_notification(
+            user=self.user,
+            notification_type='message',
+            title='Hi',
+            body='Hello.',
+        )
+        self.assertEmailQueued(False)
 
     def test_create_notification_default_action_url(self):
         """action_url defaults to empty string."""
@@ -288,3 +356,304 @@ class CreateNotificationUtilTests(APITestCase):
             body='Hello.',
         )
         self.assertEqual(notification.action_url, '')
+
+
+# ── Email outbox ──────────────────────────────────────────────────────────────
+
+class OutboxDeliveryTests(APITestCase):
+
+    def setUp(self):
+        self.users = []
+        for i in range(3):
+            user, _ = make_user(f'outbox{i}', 'Tenant')
+            user.email = f'outbox{i}@example.com'
+            user.save()
+            NotificationPreference.objects.create(user=user, email_notifications=True)
+            self.users.append(user)
+
+    def _notify_all(self):
+        for user in self.users:
+            create_notification(user, 'payment', 'Payment received', 'Body.')
+
+    def test_emails_wait_in_outbox_until_worker_sends_them_on_one_connection(self):
+        from django.core import mail
+        from django.core.mail import get_connection
+        from .outbox import deliver_pending_emails
+
+        self._notify_all()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.STATUS_PENDING).count(), 3)
+
+        with patch('notifications.outbox.get_connection', wraps=get_connection) as connect:
+            stats = deliver_pending_emails()
+        connect.assert_called_once()
+        self.assertEqual(stats, {'sent': 3, 'retried': 0, 'failed': 0})
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [u.email for u in self.users])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+        self.assertEqual(deliver_pending_emails(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    def test_failures_are_retried_then_dead_lettered(self):
+        from django.utils import timezone
+        from .outbox import deliver_pending_emails
+
+        create_notification(self.users[0], 'payment', 'Payment received', 'Body.')
+        email = OutboundEmail.objects.get()
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+            self.assertEqual(deliver_pending_emails(max_attempts=2)['retried'], 1)
+            email.refresh_from_db()
+            self.assertEqual(email.status, OutboundEmail.STATUS_PENDING)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(deliver_pending_emails(max_attempts=2)['retried'], 0)  # not due yet
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(deliver_pending_emails(max_attempts=2)['failed'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.STATUS_FAILED)
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(email.last_error, 'OSError: refused')
+
+    def test_command_drains_outbox_and_records_queue_depth(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from monitoring.models import SystemMetric
+
+        self._notify_all()
+        call_command('send_outbox_emails', batch_size=2, stdout=StringIO())
+        self.assertFalse(OutboundEmail.objects.filter(status=OutboundEmail.STATUS_PENDING).exists())
+        metric = SystemMetric.objects.get(metric_type='email_outbox_depth')
+        self.assertEqual(metric.value, 0)
+
+    def test_email_rolls_back_with_its_notification(self):
+        from django.db import transaction
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                create_notification(self.users[0], 'payment', 'Payment received', 'Body.')
+                raise RuntimeError
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+class CreateNotificationsBulkTests(APITestCase):
+
+    def _recipients(self, count, start=0):
+        users = []
+        for i in range(start, start + count):
+            user, _ = make_user(f'bulk{i}', 'Tenant')
+            user.email = f'bulk{i}@example.com'
+            user.save()
+            NotificationPreference.objects.create(user=user, email_notifications=True, payment_received=i % 2 == 0)
+            users.append(user)
+        return users
+
+    def test_creates_one_notification_per_recipient_and_queues_allowed_emails(self):
+        from .utils import create_notifications
+        users = self._recipients(3)
+        no_prefs, _ = make_user('bulk-noprefs', 'Tenant')
+        notifications = create_notifications(users + [no_prefs], 'payment', 'Paid', 'Body.', action_url='/x/')
+        self.assertEqual(len(notifications), 4)
+        self.assertTrue(all(n.pk for n in notifications))
+        self.assertEqual(Notification.objects.filter(title='Paid', action_url='/x/').count(), 4)
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list('to_email', flat=True)),
+            ['bulk0@example.com', 'bulk2@example.com'],
+        )
+
+    def test_query_count_independent_of_recipient_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .utils import create_notifications
+        few = self._recipients(2)
+        many = self._recipients(6, start=2)
+        with CaptureQueriesContext(connection) as few_queries:
+            create_notifications(few, 'payment', 'Paid', 'Body.')
+        with CaptureQueriesContext(connection) as many_queries:
+            create_notifications(many, 'payment', 'Paid', 'Body.')
+        self.assertEqual(len(many_queries), len(few_queries))
+        self.assertEqual(Notification.objects.count(), 8)
+
+
+class NotificationPreferenceCacheTests(APITestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .preferences import clear_local_preference_cache
+        cache.clear()
+        clear_local_preference_cache()
+        self.user, self.token = make_user('prefcache', 'Tenant')
+        self.user.email = 'prefcache@example.com'
+        self.user.save()
+        NotificationPreference.objects.create(user=self.user, email_notifications=True)
+
+    def _notify(self):
+        create_notification(self.user, 'payment', 'Payment received', 'Body.')
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        from .preferences import preference_cache_stats
+        before = preference_cache_stats()
+        self._notify()
+        with self.assertNumQueries(4):  # savepoint, notification, outbox insert, release; no preference read
+            self._notify()
+        after = preference_cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_shared_cache_serves_other_processes(self):
+        from .preferences import clear_local_preference_cache, get_notification_preferences, preference_cache_stats
+        get_notification_preferences(self.user.pk)
+        clear_local_preference_cache()  # as if another process asked
+        before = preference_cache_stats()
+        with self.assertNumQueries(0):
+            prefs = get_notification_preferences(self.user.pk)
+        self.assertTrue(prefs.email_notifications)
+        self.assertEqual(preference_cache_stats()['shared_hits'] - before['shared_hits'], 1)
+
+    def test_saving_preferences_invalidates_cache(self):
+        self._notify()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.patch(reverse('me-notifications'), {'email_notifications': False}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._notify()
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        self.assertFalse(self.client.get(reverse('me-notifications')).data['email_notifications'])
+
+    def test_missing_row_is_cached_until_created(self):
+        from .preferences import get_notification_preferences
+        other, _ = make_user('prefcache-none', 'Tenant')
+        self.assertIsNone(get_notification_preferences(other.pk))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_notification_preferences(other.pk))
+        NotificationPreference.objects.create(user=other, email_notifications=False)
+        self.assertFalse(get_notification_preferences(other.pk).email_notifications)
+
+
+# ── Event stream ──────────────────────────────────────────────────────────────
+
+@override_settings(NOTIFICATION_EVENTS_HEARTBEAT_SECONDS=0.05)
+class NotificationStreamTests(APITestCase):
+
+    def setUp(self):
+        from .events import get_event_broker
+        get_event_broker.cache_clear()
+        self.user, self.token = make_user('streamer', 'Tenant')
+        self.url = reverse('notification-stream')
+
+    async def _open(self, headers=None):
+        response = await self.async_client.get(self.url, {'token': self.token.key}, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        self.assertTrue((await anext(frames)).startswith(b'retry:'))
+        return response, frames
+
+    def _notify(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_notification(self.user, 'payment', title, 'Body.')
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(self.url, {'token': 'nope'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_not_served_over_wsgi(self):
+        response = self.client.get(self.url, {'token': self.token.key})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_pushes_new_notifications_and_heartbeats(self):
+        from asgiref.sync import sync_to_async
+        response, frames = await self._open()
+        self.assertEqual(await anext(frames), b': heartbeat\n\n')
+
+        notification = await sync_to_async(self._notify)('Rent received')
+        frame = (await anext(frames)).decode()
+        self.assertIn('event: notification\n', frame)
+        self.assertIn(f'"id": {notification.pk}', frame)
+        self.assertIn('"title": "Rent received"', frame)
+        await frames.aclose()
+
+    async def test_resumes_after_last_event_id(self):
+        from asgiref.sync import sync_to_async
+        from .events import EVENT_MESSAGE, get_event_broker
+        broker = get_event_broker()
+        first = broker.publish(self.user.pk, EVENT_MESSAGE, {'body': 'first'})
+        broker.publish(self.user.pk, EVENT_MESSAGE, {'body': 'second'})
+        other, _ = await sync_to_async(make_user)('stream-other', 'Tenant')
+        broker.publish(other.pk, EVENT_MESSAGE, {'body': 'not yours'})
+
+        response, frames = await self._open(headers={'Last-Event-ID': first})
+        frame = (await anext(frames)).decode()
+        self.assertIn('"body": "second"', frame)
+        self.assertEqual(await anext(frames), b': heartbeat\n\n')
+        await frames.aclose()
+
+    async def test_ids_from_before_a_restart_resume_from_latest(self):
+        from .events import EVENT_MESSAGE, LocalEventBroker
+        before = LocalEventBroker()
+        for _ in range(500):
+            stale = before.publish(self.user.pk, EVENT_MESSAGE, {})
+        broker = LocalEventBroker()
+        broker._epoch += 1  # a later boot
+        self.assertEqual(await broker.resume_id(self.user.pk, stale), await broker.latest_id(self.user.pk))
+        latest = await broker.resume_id(self.user.pk, f'{broker._epoch}-99')  # never issued
+        fresh = broker.publish(self.user.pk, EVENT_MESSAGE, {'body': 'after restart'})
+        events = await broker.listen(self.user.pk, latest, timeout=0)
+        self.assertEqual([(e.id, e.data) for e in events], [(fresh, {'body': 'after restart'})])
+        self.assertEqual(await broker.resume_id(self.user.pk, fresh), fresh)
+
+    async def test_stream_closes_after_max_seconds(self):
+        from .events import get_event_broker
+        from .stream import event_stream
+        frames = [frame async for frame in event_stream(get_event_broker(), self.user.pk, None, 0.05, max_seconds=0.12)]
+        self.assertTrue(frames[0].startswith('retry:'))
+        self.assertIn(': heartbeat\n\n', frames)
+
+    async def test_disconnect_cancels_stream_and_releases_waiter(self):
+        import asyncio
+        from .events import get_event_broker
+        from .stream import CancelOnDisconnect, event_stream
+        broker = get_event_broker()
+        sent = []
+
+        async def app(scope, receive, send):
+            await receive()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            async for frame in event_stream(broker, self.user.pk, None, heartbeat=60):
+                await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+
+        incoming = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+
+        async def receive():
+            message = next(incoming, None)
+            if message is not None:
+                return message
+            # The client leaves while the stream is waiting on the broker.
+            while self.user.pk not in broker._waiters:
+                await asyncio.sleep(0.01)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await asyncio.wait_for(CancelOnDisconnect(app)({'type': 'http'}, receive, send), timeout=1)
+        self.assertEqual([m['type'] for m in sent], ['http.response.start', 'http.response.body'])
+        self.assertNotIn(self.user.pk, broker._waiters)
+
+    async def test_asgi_app_serves_only_the_stream(self):
+        import asyncio
+        from treeHouse.asgi import application
+        sent = []
+        incoming = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+
+        async def receive():
+            message = next(incoming, None)
+            if message is None:
+                await asyncio.Event().wait()  # the client stays connected
+            return message
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/notifications/', 'headers': [], 'query_string': b''}
+        await application(scope, receive, send)
+        self.assertEqual(sent[0]['status'], 404)
@@ -1,9 +1,12 @@
 from django.urls import path
 
-from .views import notification_list, notification_mark_read, notification_read_all
+from .stream import notification_stream
+from .views import notification_list, notification_mark_read, notification_read_all, notification_unread_count
 
 urlpatterns = [
     path('', notification_list, name='notification-list'),
     path('read-all/', notification_read_all, name='notification-read-all'),
+    path('stream/', notification_stream, name='notification-stream'),
+    path('unread-count/', notification_unread_count, name='notification-unread-count'),
     path('<int:pk>/read/', notification_mark_read, name='notification-mark-read'),
 ]
@@ -1,3 +1,6 @@
+from django.db import transaction
+
+
 def create_notification(
     user,
     notification_type,
@@ -9,7 +12,8 @@ def create_notification(
 ):
     """
     Creates an in-app Notification record.
-    Also sends an email if the user's NotificationPreference allows it.
+    Also queues an email (see notifications.outbox) if the user's NotificationPreference
+    allows it; the email row is written in the same transaction as the notification.
 
     notification_type must be one of the Notification.NOTIFICATION_TYPES values (e.g. message, maintenance, payment, payment_reminder, lease, dispute, application, …).
 
@@ -18,50 +22,145 @@ def create_notification(
     notification_type.
     """
     from .models import Notification
-    notification = Notification.objects.create(
-        user=user,
-        notification_type=notification_type,
-        title=title,
-        body=body,
-        action_url=action_url,
-    )
-    _maybe_send_email(user, notification_type, title, body, email_pref_key=email_pref_key)
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            user=user,
+            notification_type=notification_type,
+            title=title,
+            body=body,
+            action_url=action_url,
+        )
+        _maybe_queue_email(notification, email_pref_key=email_pref_key)
+        _publish_notification_events([notification])
     return notification
 
 
-def _maybe_send_email(user, notification_type, title, body, *, email_pref_key=None):
-    """Send email if user's NotificationPreference allows it for this type."""
-    from authentication.models import NotificationPreference
-    from django.core.mail import send_mail
-    from django.conf import settings
+def create_notifications(
+    recipients,
+    notification_type,
+    title,
+    body,
+    action_url='',
+    *,
+    email_pref_key=None,
+):
+    """
+    Fan-out version of `create_notification`: the same notification for every user in
+    `recipients`, saved with one bulk INSERT, and emails queued with one preference query
+    and one outbox INSERT. Returns the saved Notification objects.
+    """
+    from .models import Notification
+    return save_notifications(
+        [
+            Notification(
+                user=user,
+                notification_type=notification_type,
+                title=title,
+                body=body,
+                action_url=action_url,
+            )
+            for user in recipients
+        ],
+        email_pref_key=email_pref_key,
+    )
+
+
+def save_notifications(notifications, *, email_pref_key=None):
+    """
+    `bulk_create` unsaved Notification objects (which may differ per recipient) and queue
+    their emails in the same transaction. Returns `notifications`.
+    """
+    from .models import Notification
+    if not notifications:
+        return notifications
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications)
+        queue_notification_emails(notifications, email_pref_key=email_pref_key)
+        _publish_notification_events(notifications)
+    return notifications
+
+
+def _publish_notification_events(notifications):
+    """Push saved notifications to their recipients' event streams once committed."""
+    from .events import EVENT_NOTIFICATION, publish_events
+    from .serializers import NotificationSerializer
+    publish_events(
+        (notification.user_id, EVENT_NOTIFICATION, NotificationSerializer(notification).data)
+        for notification in notifications
+    )
+
+
+def queue_notification_emails(notifications, *, email_pref_key=None):
+    """
+    Queue an email for every notification whose recipient's NotificationPreference allows
+    it: preferences come from the preference cache and the whole batch is one outbox
+    insert. Call it in the transaction that saves `notifications`. Returns the number queued.
+    """
+    from .models import OutboundEmail
+    from .preferences import get_notification_preferences_many
+
+    prefs_by_user = get_notification_preferences_many(n.user_id for n in notifications)
+    emails_by_user = _recipient_emails([n for n in notifications if n.user_id in prefs_by_user])
+    emails = []
+    for notification in notifications:
+        prefs = prefs_by_user.get(notification.user_id)
+        to_email = emails_by_user.get(notification.user_id)
+        if prefs is None or not to_email:
+            continue
+        if not _email_allowed(prefs, notification.notification_type, email_pref_key):
+            continue
+        emails.append(_outbound_email(notification, to_email))
+    OutboundEmail.objects.bulk_create(emails)
+    return len(emails)
+
+
+def _recipient_emails(notifications):
+    """{user_id: email}, from the users already loaded on the notifications plus one query for the rest."""
+    from authentication.models import CustomUser
+    from .models import Notification
+
+    emails = {}
+    unloaded = set()
+    for notification in notifications:
+        if Notification.user.is_cached(notification):
+            emails[notification.user_id] = notification.user.email
+        else:
+            unloaded.add(notification.user_id)
+    if unloaded - emails.keys():
+        emails.update(CustomUser.objects.filter(pk__in=unloaded - emails.keys()).values_list('pk', 'email'))
+    return emails
+
 
-    try:
-        prefs = NotificationPreference.objects.get(user=user)
-    except NotificationPreference.DoesNotExist:
+def _outbound_email(notification, to_email):
+    from .models import OutboundEmail
+    return OutboundEmail(
+        notification=notification,
+        to_email=to_email,
+        subject=notification.title,
+        body=notification.body,
+    )
+
+
+def _maybe_queue_email(notification, *, email_pref_key=None):
+    """Queue an email if the recipient's NotificationPreference allows it for this type."""
+    from .preferences import get_notification_preferences
+
+    prefs = get_notification_preferences(notification.user_id)
+    if prefs is None:
         # No prefs record yet — require explicit opt-in, so skip email
         return
 
-    if not prefs.email_notifications:
+    if not notification.user.email or not _email_allowed(prefs, notification.notification_type, email_pref_key):
         return
+    _outbound_email(notification, notification.user.email).save()
 
-    if email_pref_key is not None:
-        should_send = getattr(prefs, email_pref_key, True)
-    else:
-        should_send = _default_email_allowed(prefs, notification_type)
 
-    if not should_send:
-        return
-
-    try:
-        send_mail(
-            subject=title,
-            message=body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=True,
-        )
-    except Exception:
-        pass  # never let email failures break the request
+def _email_allowed(prefs, notification_type, email_pref_key=None):
+    if not prefs.email_notifications:
+        return False
+    if email_pref_key is not None:
+        return getattr(prefs, email_pref_key, True)
+    return _default_email_allowed(prefs, notification_type)
 
 
 def _default_email_allowed(prefs, notification_type):
@@ -1,3 +1,5 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -5,15 +7,37 @@ from rest_framework import status
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
+from billing.pagination import wants_cursor_pagination
 from .models import Notification
+from .pagination import NotificationCursorPagination
 from .serializers import NotificationSerializer
 
 
 # ── Notification list ────────────────────────────────────────────────────────
 
+# Most rows the plain (non-cursor) list returns; older ones need `cursor`.
+PLAIN_LIST_LIMIT = NotificationCursorPagination.max_page_size
+
+def _parse_since(raw):
+    """Aware datetime from an ISO 8601 `since` value (naive values are in the current timezone)."""
+    since = parse_datetime(raw)
+    if since is None:
+        raise ValueError('since must be an ISO 8601 datetime.')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
 @extend_schema(
     methods=['GET'],
     summary="List own notifications",
+    description=(
+        f'Plain list by default, newest first and capped at {PLAIN_LIST_LIMIT} rows: the newest ones, or '
+        'with `after_id` / `since` the oldest ones past that point, so a poll that gets a full list '
+        'should poll again from the highest `id` it received. With `cursor` the list is '
+        'keyset-paginated on (created_at, id), newest first, and wrapped as '
+        '`{next, next_cursor, results}`.'
+    ),
     parameters=[
         OpenApiParameter(
             name='unread',
@@ -22,20 +46,117 @@ from .serializers import NotificationSerializer
             description='Filter to unread notifications only. Pass "true" to filter.',
             required=False,
         ),
+        OpenApiParameter(
+            name='after_id',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description=(
+                'Only notifications with a higher id, for polling: pass the highest `id` already shown. '
+                'Preferred over `since`. Ids are allocated at insert, so a row from a transaction that '
+                'was still open at the previous poll can arrive below that id; clients that must see '
+                'every row should pass an id a little lower and skip ids they already have.'
+            ),
+        ),
+        OpenApiParameter(
+            name='since',
+            type=OpenApiTypes.DATETIME,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description=(
+                'Only notifications created after this ISO 8601 datetime. `created_at` is set when '
+                'the row is written, not when its transaction commits, so a notification from a long '
+                'batch can appear later with an older timestamp; poll with `after_id` instead.'
+            ),
+        ),
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description=(
+                'Switches to keyset pagination (newest first): pass an empty value for the first page, '
+                'then the `next_cursor` of the previous response. The response is '
+                '`{next, next_cursor, results}`.'
+            ),
+        ),
+        OpenApiParameter(
+            name='include_count',
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Cursor mode only: also return `count` (an extra COUNT query). Default: false.',
+        ),
+        OpenApiParameter(
+            name='page_size',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Cursor mode only: items per page. Default: 20. Maximum: 100.',
+        ),
     ],
     responses={200: NotificationSerializer(many=True)},
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def notification_list(request):
-    """Return all notifications for the authenticated user, optionally filtered to unread."""
-    qs = Notification.objects.select_related('user').filter(user=request.user)
+    """
+    Return the authenticated user's notifications, optionally unread only or newer than
+    `after_id` / `since`: a capped plain list, or keyset pages with `cursor`.
+    """
+    qs = Notification.objects.filter(user=request.user)
     if request.query_params.get('unread', '').lower() == 'true':
         qs = qs.filter(is_read=False)
-    serializer = NotificationSerializer(qs, many=True)
+    if request.query_params.get('after_id'):
+        try:
+            qs = qs.filter(id__gt=int(request.query_params['after_id']))
+        except ValueError:
+            return Response({'after_id': ['after_id must be an integer.']}, status=status.HTTP_400_BAD_REQUEST)
+    if request.query_params.get('since'):
+        try:
+            qs = qs.filter(created_at__gt=_parse_since(request.query_params['since']))
+        except ValueError as e:
+            return Response({'since': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+    if wants_cursor_pagination(request):
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(qs, request)
+        return paginator.get_paginated_response(NotificationSerializer(page, many=True).data)
+
+    # Polls take the rows just past their marker so a backlog drains over successive polls.
+    if request.query_params.get('after_id'):
+        window = qs.order_by('id')
+    elif request.query_params.get('since'):
+        window = qs.order_by('created_at', 'id')
+    else:
+        window = qs.order_by('-created_at', '-id')
+    rows = sorted(window[:PLAIN_LIST_LIMIT], key=lambda n: (n.created_at, n.id), reverse=True)
+    serializer = NotificationSerializer(rows, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+# ── Unread counter ────────────────────────────────────────────────────────────
+
+@extend_schema(
+    methods=['GET'],
+    summary="Count own unread notifications",
+    responses={200: {'type': 'object', 'properties': {'unread': {'type': 'integer'}}}},
+    examples=[
+        OpenApiExample(
+            "Unread count response",
+            response_only=True,
+            value={"unread": 3},
+        ),
+    ],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_unread_count(request):
+    """Number of unread notifications (an index-only count on (user, is_read))."""
+    unread = Notification.objects.filter(user=request.user, is_read=False).count()
+    return Response({'unread': unread}, status=status.HTTP_200_OK)
+
+
 # ── Mark single notification read ────────────────────────────────────────────
 
 @extend_schema(
@@ -0,0 +1,150 @@
+"""
+Lease-interval occupancy engine.
+
+Occupancy of a period is the number of non-deleted units with a lease that overlaps it
+(inclusive of both ends) over the number of non-deleted units. Past periods go by the lease
+dates alone, so a lease that has since ended and been deactivated still counts for the
+months it ran; periods reaching today or later count only leases still `is_active`. `OccupancyTimeline` loads
+the lease intervals for a set of properties once and answers any list of periods from
+sorted start and end dates, so a series costs the same two queries however long it is.
+"""
+import calendar
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Lease, Unit
+
+DAILY = 'daily'
+MONTHLY = 'monthly'
+QUARTERLY = 'quarterly'
+GRANULARITIES = (DAILY, MONTHLY, QUARTERLY)
+
+
+def _period_end(day, granularity):
+    if granularity == DAILY:
+        return day
+    if granularity == MONTHLY:
+        return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    last_month = 3 * ((day.month - 1) // 3) + 3
+    return day.replace(month=last_month, day=calendar.monthrange(day.year, last_month)[1])
+
+
+def periods(start, end, granularity=MONTHLY):
+    """
+    Consecutive inclusive (period_start, period_end) pairs covering [start, end], split on
+    day / calendar month / calendar quarter boundaries. The first and last periods are
+    clipped to `start` and `end`.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'granularity must be one of: {", ".join(GRANULARITIES)}.')
+    result = []
+    day = start
+    while day <= end:
+        period_end = min(_period_end(day, granularity), end)
+        result.append((day, period_end))
+        day = period_end + timedelta(days=1)
+    return result
+
+
+def period_label(period_start, granularity=MONTHLY):
+    if granularity == DAILY:
+        return period_start.isoformat()
+    if granularity == MONTHLY:
+        return f'{period_start:%Y-%m}'
+    return f'{period_start.year}-Q{(period_start.month - 1) // 3 + 1}'
+
+
+def occupancy_pct(occupied, total):
+    """Two-decimal percentage string, None when there are no units."""
+    if not total:
+        return None
+    return str((Decimal(occupied) / Decimal(total) * Decimal('100')).quantize(Decimal('0.01')))
+
+
+class OccupancyTimeline:
+    """
+    Lease intervals and unit counts for `property_ids` (None = every property), loaded
+    with one query each. A lease overlaps [period_start, period_end] when it started on or
+    before period_end and did not end before period_start; both counts are binary searches
+    over the per-property sorted start and end dates. Deactivated leases are kept in a second
+    pair of lists and subtracted for periods that reach today. A unit holds at most one lease
+    (`Lease.unit` is one-to-one), so leases are units; the count is still capped at the
+    unit total so occupancy never reads above 100%.
+    """
+
+    def __init__(self, property_ids=None):
+        units = Unit.objects.filter(deleted_at__isnull=True)
+        leases = Lease.objects.filter(unit__deleted_at__isnull=True)
+        if property_ids is not None:
+            property_ids = list(property_ids)
+            units = units.filter(property_id__in=property_ids)
+            leases = leases.filter(unit__property_id__in=property_ids)
+
+        self.total_units = dict(
+            units.values('property_id').annotate(c=Count('id')).order_by()
+            .values_list('property_id', 'c')
+        )
+        self._starts = defaultdict(list)
+        self._ends = defaultdict(list)
+        self._inactive_starts = defaultdict(list)
+        self._inactive_ends = defaultdict(list)
+        for property_id, start_date, end_date, is_active in leases.values_list(
+            'unit__property_id', 'start_date', 'end_date', 'is_active',
+        ).iterator():
+            self._starts[property_id].append(start_date)
+            if end_date is not None:
+                self._ends[property_id].append(end_date)
+            if not is_active:
+                self._inactive_starts[property_id].append(start_date)
+                if end_date is not None:
+                    self._inactive_ends[property_id].append(end_date)
+        for dates in (
+            *self._starts.values(), *self._ends.values(),
+            *self._inactive_starts.values(), *self._inactive_ends.values(),
+        ):
+            dates.sort()
+        self.today = timezone.localdate()
+
+        self.property_ids = property_ids if property_ids is not None else sorted(self.total_units)
+
+    @staticmethod
+    def _overlapping(starts, ends, period_start, period_end):
+        return bisect_right(starts, period_end) - bisect_left(ends, period_start)
+
+    def occupied(self, property_id, period_start, period_end):
+        count = self._overlapping(
+            self._starts.get(property_id, ()), self._ends.get(property_id, ()), period_start, period_end,
+        )
+        if period_end >= self.today:
+            count -= self._overlapping(
+                self._inactive_starts.get(property_id, ()), self._inactive_ends.get(property_id, ()),
+                period_start, period_end,
+            )
+        return min(count, self.total_units.get(property_id, 0))
+
+    def by_property(self, period_list):
+        """{property_id: [(occupied, total_units), ...]} aligned with `period_list`."""
+        return {
+            pid: [
+                (self.occupied(pid, start, end), self.total_units.get(pid, 0))
+                for start, end in period_list
+            ]
+            for pid in self.property_ids
+        }
+
+    def series(self, period_list, property_id=None):
+        """
+        [(occupied, total_units), ...] aligned with `period_list` for one property, or summed
+        over every loaded property when `property_id` is None (units-weighted).
+        """
+        pids = self.property_ids if property_id is None else [property_id]
+        total = sum(self.total_units.get(pid, 0) for pid in pids)
+        return [
+            (sum(self.occupied(pid, start, end) for pid in pids), total)
+            for start, end in period_list
+        ]
@@ -1,7 +1,10 @@
+import shutil
+import tempfile
 from datetime import date, timedelta
 from unittest.mock import patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APITestCase
@@ -543,7 +546,105 @@ class LandlordDashboardTests(APITestCase):
         self.assertEqual(perf['by_property'][0]['name'], self.prop.name)
 
 
+    def test_occupancy_counts_leases_covering_today(self):
+        make_lease(self.unit, self.tenant)
+        other = make_unit(self.prop, self.landlord)
+        other.deleted_at = timezone.now()
+        other.save()
+        self.auth(self.landlord_token)
+        response = self.client.get(reverse('landlord-dashboard'))
+        self.assertEqual(response.data['properties']['total_units'], 1)
+        self.assertEqual(response.data['properties']['occupied_units'], 1)
+        self.assertEqual(response.data['performance']['by_property'][0]['occupancy_rate'], '100.0%')
+
+
+class OccupancyTimelineTests(APITestCase):
+    def setUp(self):
+        self.landlord, _ = make_user('landlord1', 'Landlord')
+        self.tenant, _ = make_user('tenant1', 'Tenant')
+        self.prop = make_property(self.landlord)
+        self.units = [make_unit(self.prop, self.landlord) for _ in range(2)]
+        Lease.objects.create(
+            unit=self.units[0], tenant=self.tenant, start_date=date(2024, 1, 15),
+            end_date=date(2024, 3, 31), rent_amount='45000',
+        )
+        Lease.objects.create(
+            unit=self.units[1], tenant=self.tenant, start_date=date(2024, 3, 1),
+            end_date=None, rent_amount='45000',
+        )
+
+    def test_periods_by_granularity(self):
+        from .occupancy import periods, period_label
+        months = periods(date(2024, 1, 10), date(2024, 3, 5), 'monthly')
+        self.assertEqual(months, [
+            (date(2024, 1, 10), date(2024, 1, 31)),
+            (date(2024, 2, 1), date(2024, 2, 29)),
+            (date(2024, 3, 1), date(2024, 3, 5)),
+        ])
+        quarters = periods(date(2024, 1, 1), date(2024, 12, 31), 'quarterly')
+        self.assertEqual([period_label(start, 'quarterly') for start, _ in quarters], [
+            '2024-Q1', '2024-Q2', '2024-Q3', '2024-Q4',
+        ])
+        self.assertEqual(len(periods(date(2024, 2, 1), date(2024, 2, 29), 'daily')), 29)
+        with self.assertRaises(ValueError):
+            periods(date(2024, 1, 1), date(2024, 1, 2), 'weekly')
+
+    def test_overlap_counts(self):
+        from .occupancy import OccupancyTimeline, periods
+        timeline = OccupancyTimeline([self.prop.id])
+        series = timeline.series(periods(date(2024, 1, 1), date(2024, 4, 30), 'monthly'))
+        self.assertEqual(series, [(1, 2), (1, 2), (2, 2), (1, 2)])
+        self.assertEqual(timeline.occupied(self.prop.id, date(2024, 1, 14), date(2024, 1, 14)), 0)
+        self.assertEqual(timeline.occupied(self.prop.id, date(2024, 3, 31), date(2024, 3, 31)), 2)
+        self.assertEqual(timeline.occupied(self.prop.id, date(2024, 4, 1), date(2024, 4, 1)), 1)
+
+    def test_inactive_leases_count_only_in_past_periods(self):
+        from .occupancy import OccupancyTimeline
+        today = date.today()
+        current = [(today.replace(day=1), today)]
+        self.assertEqual(OccupancyTimeline([self.prop.id]).series(current), [(1, 2)])
+        Lease.objects.filter(unit=self.units[1]).update(is_active=False)
+        timeline = OccupancyTimeline([self.prop.id])
+        # The lease ran in March 2024 even though it has been deactivated since.
+        self.assertEqual(timeline.series([(date(2024, 3, 1), date(2024, 3, 31))]), [(2, 2)])
+        self.assertEqual(timeline.series(current), [(0, 2)])
+
+    def test_occupied_never_exceeds_unit_count(self):
+        from .occupancy import OccupancyTimeline
+        self.units[1].deleted_at = timezone.now()
+        self.units[1].save()
+        timeline = OccupancyTimeline([self.prop.id])
+        # Simulate leases loaded for a unit set that has since shrunk.
+        timeline._starts[self.prop.id].append(date(2024, 1, 1))
+        self.assertEqual(timeline.occupied(self.prop.id, date(2024, 3, 1), date(2024, 3, 31)), 1)
+
+    def test_yearly_daily_series_costs_two_queries(self):
+        from .occupancy import OccupancyTimeline, periods
+        with self.assertNumQueries(2):
+            timeline = OccupancyTimeline([self.prop.id])
+            series = timeline.series(periods(date(2024, 1, 1), date(2024, 12, 31), 'daily'))
+        self.assertEqual(len(series), 366)
+
+    def test_portfolio_series_sums_properties(self):
+        from .occupancy import OccupancyTimeline
+        other = make_property(self.landlord)
+        make_unit(other, self.landlord)
+        timeline = OccupancyTimeline()
+        self.assertEqual(timeline.series([(date(2024, 3, 1), date(2024, 3, 31))]), [(2, 3)])
+        self.assertEqual(timeline.by_property([(date(2024, 3, 1), date(2024, 3, 31))])[other.id], [(0, 1)])
+
+
+# Uploaded lease documents are written here instead of the project's media/ directory.
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix='treehouse-test-media-')
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class LeaseDocumentTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.landlord, self.landlord_token = make_user('landlord1', 'Landlord')
         self.tenant, self.tenant_token = make_user('tenant1', 'Tenant')
@@ -1082,6 +1183,30 @@ class SavedSearchTests(APITestCase):
         )
         self.assertFalse(Notification.objects.filter(user=self.tenant, notification_type='new_listing').exists())
 
+    def test_saved_search_matches_notified_with_constant_query_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from notifications.models import Notification
+        from property.models import SavedSearch
+        from property.utils import notify_saved_search_matches
+        prop = make_property(self.landlord)
+        unit = make_unit(prop, self.landlord)
+        SavedSearch.objects.create(user=self.tenant, name='First', filters={})
+
+        with CaptureQueriesContext(connection) as few:
+            notify_saved_search_matches(unit)
+        for i in range(4):
+            user, _ = make_user(f'ss_many_{i}', 'Tenant')
+            SavedSearch.objects.create(user=user, name=f'Search {i}', filters={})
+        SavedSearch.objects.create(user=self.landlord, name='Own listing', filters={})
+        with CaptureQueriesContext(connection) as many:
+            notify_saved_search_matches(unit)
+
+        self.assertEqual(Notification.objects.filter(notification_type='new_listing').count(), 6)
+        self.assertFalse(Notification.objects.filter(user=self.landlord).exists())
+        self.assertEqual(len(many), len(few))
+
+
 
 class TenantInvitationTests(APITestCase):
     def setUp(self):
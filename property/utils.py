@@ -4,13 +4,15 @@ from .models import SavedSearch
 
 def notify_saved_search_matches(unit):
     """Find all matching saved searches and notify their owners when a unit is published."""
-    from notifications.utils import create_notification
+    from notifications.models import Notification
+    from notifications.utils import save_notifications
 
     prop = unit.property
     searches = SavedSearch.objects.filter(notify_on_match=True).select_related('user')
 
+    notifications = []
     for search in searches:
-        if search.user == prop.owner:
+        if search.user_id == prop.owner_id:
             continue  # don't notify the property owner about their own listing
 
         f = search.filters
@@ -40,10 +42,12 @@ def notify_saved_search_matches(unit):
             if distance_km > radius_km:
                 continue
 
-        create_notification(
+        notifications.append(Notification(
             user=search.user,
             notification_type='new_listing',
             title=f'New match: {unit.name}',
             body=f'{unit.name} at {prop.name} matches your saved search "{search.name}".',
             action_url=f'/property/units/{unit.id}/',
-        )
+        ))
+
+    save_notifications(notifications)
@@ -42,6 +42,7 @@ from .tenant_invite import (
     send_tenant_invitation_email,
     send_existing_tenant_lease_email,
 )
+from .occupancy import OccupancyTimeline
 from authentication.models import Role, TenantProfile, CustomUser
 from monitoring.authentication import ImpersonatingTokenAuthentication, QueryParameterTokenAuthentication
 from rest_framework.authtoken.models import Token
@@ -55,6 +56,10 @@ def is_admin(user):
     return user.is_staff or (hasattr(user, 'role') and user.role.name == 'Admin')
 
 
+def is_agent(user):
+    return user.is_authenticated and hasattr(user, 'role') and user.role.name == Role.AGENT
+
+
 def is_agent_for(user, property):
     return (
         user.is_authenticated
@@ -655,13 +660,15 @@ def landlord_dashboard(request):
 
     # ── Properties & units ───────────────────────────────────────────────────
     if is_admin(user):
-        properties = Property.objects.prefetch_related('units').all()
+        properties = Property.objects.all()
     else:
-        properties = Property.objects.filter(owner=user).prefetch_related('units')
+        properties = Property.objects.filter(owner=user)
 
     prop_ids = [p.id for p in properties]
-    total_units = sum(p.units.count() for p in properties)
-    occupied_units = sum(p.units.filter(is_occupied=True).count() for p in properties)
+    # Leases covering today over non-deleted units, all properties in one pass.
+    occupancy_today = OccupancyTimeline(prop_ids).by_property([(today, today)])
+    total_units = sum(total for [(_, total)] in occupancy_today.values())
+    occupied_units = sum(occupied for [(occupied, _)] in occupancy_today.values())
     vacant_units = total_units - occupied_units
     occupancy_rate = f"{(occupied_units / total_units * 100):.1f}%" if total_units else "0%"
 
@@ -741,8 +748,7 @@ def landlord_dashboard(request):
             property=prop, date__year=year, date__month=month,
         ).aggregate(t=Sum('amount'))['t'] or Decimal('0')
 
-        p_units = prop.units.count()
-        p_occupied = prop.units.filter(is_occupied=True).count()
+        [(p_occupied, p_units)] = occupancy_today[prop.id]
         net = p_collected + p_ai - p_exp
 
         perf.append({
@@ -3,6 +3,13 @@ ASGI config for treeHouse project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Only the Server-Sent Events feed at /api/notifications/stream/ (notifications.stream) is
+served from here, by the uvicorn `events` service in docker-compose.yml, so open streams
+hold no worker thread each. The REST API stays on gunicorn with the WSGI app
+(entrypoint.sh), keeping persistent database connections and its request timeout; other
+paths answer 404 here. Streams are cancelled when the client disconnects
+(notifications.stream.CancelOnDisconnect) and end after NOTIFICATION_EVENTS_MAX_SECONDS.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -13,4 +20,27 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'treeHouse.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready.
+from notifications.stream import CancelOnDisconnect  # noqa: E402
+
+ASGI_PATHS = ('/api/notifications/stream/',)
+
+
+async def _not_found(scope, receive, send):
+    await send({
+        'type': 'http.response.start',
+        'status': 404,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': b'{"detail": "Not served by the event stream service."}'})
+
+
+async def _stream_only(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ASGI_PATHS:
+        return await _not_found(scope, receive, send)
+    return await django_application(scope, receive, send)
+
+
+application = CancelOnDisconnect(_stream_only)
@@ -117,7 +117,7 @@ WSGI_APPLICATION = 'treeHouse.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default=f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}",
-		conn_max_age=600
+		conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '600')),
     )
 }
 
@@ -174,6 +174,25 @@ STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', 'whsec_placeholder')
 
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@treehouse.com')
 
+# Shared cache (notification preferences, receipt stats). Web workers, process_billing shards
+# and the worker commands each invalidate entries on save, so production must point every
+# process at one Redis; without CACHE_REDIS_URL each process gets its own in-memory cache.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '').strip()
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+
+# Notification / message event stream (notifications.events). The local broker only sees
+# events published in the same process; run several ASGI workers with the Redis broker.
+NOTIFICATION_EVENTS_BACKEND = os.getenv('NOTIFICATION_EVENTS_BACKEND', 'notifications.events.LocalEventBroker')
+NOTIFICATION_EVENTS_REDIS_URL = os.getenv('NOTIFICATION_EVENTS_REDIS_URL', '').strip()
+# Streams are closed after this long and EventSource reconnects with its Last-Event-ID.
+NOTIFICATION_EVENTS_MAX_SECONDS = int(os.getenv('NOTIFICATION_EVENTS_MAX_SECONDS', '300'))
+
 # Email: Mailgun (production) when MAILGUN_API_KEY + MAILGUN_SENDER_DOMAIN are set; else console (dev).
 MAILGUN_API_KEY = os.getenv('MAILGUN_API_KEY', '').strip()
 MAILGUN_SENDER_DOMAIN = os.getenv('MAILGUN_SENDER_DOMAIN', '').strip()